@@ -1,9 +1,26 @@
-﻿from fastapi import FastAPI, HTTPException, Depends
+﻿from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from models import Investment, Purchase, UpdatePurchase, UserCreate, UserLogin, UserResponse, UserUpdate, Token, ForgotPasswordRequest, ResetPasswordRequest, ChangePasswordRequest, PasswordResetResponse
-from services.finance_api import get_current_price, search_stocks, get_stock_suggestions
+from services.finance_api import get_current_price, search_stocks, search_local_instruments, get_stock_suggestions
 from services.analytics import calculate_profit
+from services.quote_cache import quote_cache
+from services.http_client import http_client
+from services.circuit_breaker import get_breaker_states
+from services.rate_limiter import get_rate_limit_stats
+from services.price_refresher import price_refresher, PRICE_REFRESHER_ENABLED
+from services.single_flight import get_single_flight_stats
+from services.price_snapshots import price_snapshot_writer, load_price_snapshots, PRICE_SNAPSHOTS_ENABLED
+from services.history_store import get_history, INTERVALS
+from services.history_backfill import history_backfill, HISTORY_BACKFILL_RESUME_ON_STARTUP
+from services.price_stream import price_stream, load_positions
+from services.ticker_index import ticker_index
+from services.instrument_master import instrument_master
+from services.search_cache import search_cache
+from services.currency_converter import exchange_rates, detect_currency_from_ticker, get_exchange_rate, DEFAULT_REPORTING_CURRENCY, REPORTING_CURRENCIES
+from services.fx_history import fx_history
 from services.investment_aggregator import (
     get_all_investment_summaries, 
     get_investment_summary, 
@@ -26,8 +43,8 @@ from services.admin_service import (
 )
 from database import get_db, InvestmentDB, UserDB
 from sqlalchemy.orm import Session
-from typing import List, Dict
-from datetime import timedelta
+from typing import List, Optional
+from datetime import date, timedelta
 import os
 from datetime import datetime
 
@@ -54,6 +71,33 @@ app.add_middleware(
     allow_headers=['*'],
 )
 
+@app.on_event('startup')
+def start_background_tasks():
+    if PRICE_SNAPSHOTS_ENABLED:
+        # Serve the last known prices right away, before any upstream call completes
+        try:
+            load_price_snapshots()
+        except Exception as e:
+            print(f"Warning: Could not load price snapshots: {e}")
+        price_snapshot_writer.start()
+    if PRICE_REFRESHER_ENABLED:
+        price_refresher.start()
+    price_stream.start()
+    ticker_index.start()
+    instrument_master.start()
+    exchange_rates.start()
+    fx_history.start()
+    if HISTORY_BACKFILL_RESUME_ON_STARTUP and history_backfill.is_interrupted():
+        history_backfill.start()
+
+@app.on_event('shutdown')
+def stop_background_tasks():
+    price_refresher.stop()
+    exchange_rates.stop()
+    fx_history.stop()
+    if PRICE_SNAPSHOTS_ENABLED:
+        price_snapshot_writer.stop()
+
 @app.get('/')
 def read_root():
     return {'status': 'Investment Tracker API running', 'version': '1.0.0'}
@@ -229,6 +273,7 @@ def get_user_profile(credentials: HTTPAuthorizationCredentials = Depends(securit
         last_name=user.last_name,
         phone=user.phone,
         country=user.country,
+        reporting_currency=user.reporting_currency or DEFAULT_REPORTING_CURRENCY,
         is_admin=user.is_admin,
         created_at=user.created_at
     )
@@ -263,6 +308,11 @@ def update_user_profile(user_update: UserUpdate, credentials: HTTPAuthorizationC
         user.phone = user_update.phone
     if user_update.country is not None:
         user.country = user_update.country
+    if user_update.reporting_currency is not None:
+        reporting_currency = user_update.reporting_currency.upper().strip()
+        if reporting_currency not in REPORTING_CURRENCIES:
+            raise HTTPException(status_code=400, detail=f"Unsupported reporting currency, choose one of {', '.join(REPORTING_CURRENCIES)}")
+        user.reporting_currency = reporting_currency
     
     # Update the updated_at timestamp
     user.updated_at = datetime.utcnow()
@@ -280,6 +330,7 @@ def update_user_profile(user_update: UserUpdate, credentials: HTTPAuthorizationC
             last_name=user.last_name,
             phone=user.phone,
             country=user.country,
+            reporting_currency=user.reporting_currency or DEFAULT_REPORTING_CURRENCY,
             is_admin=user.is_admin,
             created_at=user.created_at
         )
@@ -416,6 +467,29 @@ def get_investment_summary_endpoint(ticker: str, credentials: HTTPAuthorizationC
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get('/stream/prices')
+async def stream_prices(request: Request, token: str):
+    """
+    Server-Sent Events stream of the user's positions: a 'snapshot' event, then
+    'delta' events carrying only positions whose price changed. EventSource
+    cannot send headers, so the access token is passed as a query parameter.
+    """
+    user = await run_in_threadpool(get_current_user, token)
+    if not user:
+        raise HTTPException(status_code=401, detail='Invalid token')
+    
+    currency = user.reporting_currency or DEFAULT_REPORTING_CURRENCY
+    # May refresh the FX table over the network, so not on the event loop
+    eur_rate = await run_in_threadpool(get_exchange_rate, 'EUR', currency)
+    if eur_rate is None:
+        raise HTTPException(status_code=503, detail=f'Exchange rate to {currency} unavailable')
+    positions = await run_in_threadpool(load_positions, user.id, currency)
+    return StreamingResponse(
+        price_stream.stream(user.id, positions, request.is_disconnected, currency, eur_rate),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.delete('/purchase/{purchase_id}')
 def delete_purchase_endpoint(purchase_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)):
     user = get_current_user(credentials.credentials)
@@ -465,8 +539,8 @@ def search_investments(query: str):
         return {'results': results}
     except Exception as e:
         print(f'Search error for query \'{query}\': {e}')
-        # Return fallback results instead of error
-        fallback_results = _get_fallback_search_results(query)
+        # Return local instrument matches instead of error
+        fallback_results = search_local_instruments(query, limit=10)
         return {'results': fallback_results}
 
 @app.get('/suggestions')
@@ -477,6 +551,36 @@ def get_suggestions(query: str):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get('/currency/{ticker}')
+def get_ticker_currency(ticker: str):
+    """Currency a ticker trades in, which purchase prices are entered in"""
+    ticker = ticker.upper().strip()
+    return {'ticker': ticker, 'currency': detect_currency_from_ticker(ticker)}
+
+@app.get('/history/{ticker}')
+def get_price_history(ticker: str, start: Optional[date] = None, end: Optional[date] = None, interval: str = '1d',
+                      credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get daily, weekly or monthly OHLC bars for a ticker from the local history store"""
+    user = get_current_user(credentials.credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail='Invalid token')
+    
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f'Interval must be one of {", ".join(INTERVALS)}')
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail='start must not be after end')
+    
+    try:
+        history = get_history(ticker, start, end, interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f'History error for {ticker}: {e}')
+        raise HTTPException(status_code=502, detail=f'Could not load history for {ticker}')
+    if not history['bars'] and start is None and end is None:
+        raise HTTPException(status_code=404, detail=f'No history found for {ticker}')
+    return history
+
 @app.get('/test-stock-price/{ticker}')
 def test_stock_price(ticker: str):
     """Test endpoint to get current stock price"""
@@ -537,47 +641,6 @@ def debug_stock_prices():
     except Exception as e:
         return {'error': f'General error: {str(e)}'}
 
-def _get_fallback_search_results(query: str) -> List[Dict]:
-    """Fallback search results when external APIs fail"""
-    query_lower = query.lower()
-    
-    # Common stocks and ETFs database
-    stock_database = [
-        {'ticker': 'AAPL', 'name': 'Apple Inc.', 'type': 'Stock'},
-        {'ticker': 'MSFT', 'name': 'Microsoft Corporation', 'type': 'Stock'},
-        {'ticker': 'GOOGL', 'name': 'Alphabet Inc.', 'type': 'Stock'},
-        {'ticker': 'AMZN', 'name': 'Amazon.com Inc.', 'type': 'Stock'},
-        {'ticker': 'TSLA', 'name': 'Tesla Inc.', 'type': 'Stock'},
-        {'ticker': 'META', 'name': 'Meta Platforms Inc.', 'type': 'Stock'},
-        {'ticker': 'NVDA', 'name': 'NVIDIA Corporation', 'type': 'Stock'},
-        {'ticker': 'NFLX', 'name': 'Netflix Inc.', 'type': 'Stock'},
-        {'ticker': 'ASML.AS', 'name': 'ASML Holding N.V.', 'type': 'Stock'},
-        {'ticker': 'SAP.DE', 'name': 'SAP SE', 'type': 'Stock'},
-        {'ticker': 'LVMH.PA', 'name': 'LVMH Moët Hennessy Louis Vuitton', 'type': 'Stock'},
-        {'ticker': 'KBC.BR', 'name': 'KBC Group NV', 'type': 'Stock'},
-        {'ticker': 'INGA.AS', 'name': 'ING Groep N.V.', 'type': 'Stock'},
-        {'ticker': 'ABI.BR', 'name': 'Anheuser-Busch InBev SA/NV', 'type': 'Stock'},
-        {'ticker': 'SPY', 'name': 'SPDR S&P 500 ETF Trust', 'type': 'ETF'},
-        {'ticker': 'QQQ', 'name': 'Invesco QQQ Trust', 'type': 'ETF'},
-        {'ticker': 'VTI', 'name': 'Vanguard Total Stock Market ETF', 'type': 'ETF'},
-        {'ticker': 'VXUS', 'name': 'Vanguard Total International Stock ETF', 'type': 'ETF'},
-        {'ticker': 'BND', 'name': 'Vanguard Total Bond Market ETF', 'type': 'ETF'},
-        {'ticker': 'GLD', 'name': 'SPDR Gold Shares', 'type': 'ETF'},
-        {'ticker': 'VWRL.L', 'name': 'Vanguard FTSE All-World UCITS ETF', 'type': 'ETF'},
-        {'ticker': 'IWDA.L', 'name': 'iShares Core MSCI World UCITS ETF', 'type': 'ETF'},
-        {'ticker': 'BEL.BR', 'name': 'BEL 20 Index', 'type': 'Index'},
-        {'ticker': 'BIRG.IE', 'name': 'Bank of Ireland Group PLC', 'type': 'Stock'},
-    ]
-    
-    # Filter results based on query
-    results = []
-    for stock in stock_database:
-        if (query_lower in stock['ticker'].lower() or 
-            query_lower in stock['name'].lower()):
-            results.append(stock)
-    
-    return results[:10]  # Return top 10 results
-
 # Admin endpoints
 def check_admin_permissions(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Check if user has admin permissions"""
@@ -648,6 +711,48 @@ def get_stock_analytics_admin(admin_user = Depends(check_admin_permissions)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get('/admin/cache-stats')
+def get_cache_stats_admin(admin_user = Depends(check_admin_permissions)):
+    """Get quote cache counters, price refresher status and coalesced call counts (admin only)"""
+    return {
+        'quote_cache': quote_cache.stats(),
+        'price_refresher': price_refresher.stats(),
+        'single_flight': get_single_flight_stats(),
+        'price_snapshots': price_snapshot_writer.stats(),
+        'price_stream': price_stream.stats(),
+        'ticker_index': ticker_index.stats(),
+        'instrument_master': instrument_master.stats(),
+        'search_cache': search_cache.stats(),
+        'fx_rates': exchange_rates.stats(),
+        'fx_history': fx_history.stats()
+    }
+
+@app.get('/admin/http-stats')
+def get_http_stats_admin(admin_user = Depends(check_admin_permissions)):
+    """Get outbound HTTP connection reuse metrics (admin only)"""
+    return http_client.stats()
+
+@app.get('/admin/circuit-breakers')
+def get_circuit_breakers_admin(admin_user = Depends(check_admin_permissions)):
+    """Get circuit breaker state and health of every upstream provider (admin only)"""
+    return {'breakers': get_breaker_states()}
+
+@app.get('/admin/rate-limits')
+def get_rate_limits_admin(admin_user = Depends(check_admin_permissions)):
+    """Get token bucket usage of every rate limited upstream provider (admin only)"""
+    return {'rate_limits': get_rate_limit_stats()}
+
+@app.post('/admin/history/backfill')
+def start_history_backfill_admin(restart: bool = False, admin_user = Depends(check_admin_permissions)):
+    """Top up stored price history for every held ticker in the background (admin only)"""
+    started = history_backfill.start(resume=not restart)
+    return {'started': started, 'status': history_backfill.status()}
+
+@app.get('/admin/history/backfill')
+def get_history_backfill_admin(admin_user = Depends(check_admin_permissions)):
+    """Get progress of the current or last history backfill (admin only)"""
+    return history_backfill.status()
+
 @app.post('/admin/users/{user_id}/make-admin')
 def make_user_admin_endpoint(user_id: str, admin_user = Depends(check_admin_permissions)):
     """Make a user an admin (admin only)"""
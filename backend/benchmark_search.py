@@ -0,0 +1,116 @@
+"""
+Search latency benchmark for the local instrument master.
+
+Builds a synthetic universe (the bundled instruments plus generated ones),
+then times typo'd, prefix and exact queries through the full search path and
+through the trigram index alone:
+
+    python benchmark_search.py --instruments 100000 --queries 2000 --budget-ms 5
+
+Exits non-zero when the p95 of the fuzzy queries is over the budget.
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from typing import Callable, Dict, List
+
+from services.instrument_master import INSTRUMENTS_CSV_PATH, Instrument, InstrumentMaster, _Index, _parse_csv, normalize
+
+_SYLLABLES = ['al', 'be', 'cor', 'da', 'en', 'fi', 'gen', 'hol', 'in', 'jo', 'ka', 'lum', 'mar', 'no', 'or', 'pan',
+              'qui', 'ro', 'sa', 'tec', 'un', 'vi', 'wes', 'xa', 'yor', 'zen', 'tra', 'ston', 'berg', 'ville']
+_WORDS = ['Capital', 'Energy', 'Pharma', 'Holdings', 'Technologies', 'Bank', 'Industries', 'Resources', 'Foods',
+          'Systems', 'Global', 'Mining', 'Insurance', 'Media', 'Motors', 'Realty', 'Therapeutics', 'Logistics']
+_FORMS = ['Inc.', 'Corp.', 'PLC', 'AG', 'SA', 'NV', 'SE', 'Group', 'Ltd', 'UCITS ETF']
+_SUFFIXES = ['', '', '', '.L', '.DE', '.PA', '.AS', '.BR', '.SW', '.MC']
+
+def _synthetic_universe(count: int, rng: random.Random) -> List[Instrument]:
+    instruments = _parse_csv(open(INSTRUMENTS_CSV_PATH, encoding='utf-8').read())
+    symbols = {instrument.symbol for instrument in instruments}
+    while len(instruments) < count:
+        stem = ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        words = [stem] + rng.sample(_WORDS, rng.randint(0, 2)) + [rng.choice(_FORMS)]
+        symbol = ''.join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 5))) + rng.choice(_SUFFIXES)
+        if symbol in symbols:
+            continue
+        symbols.add(symbol)
+        instruments.append(Instrument(symbol, ' '.join(words), None, 'ETF' if 'ETF' in words[-1] else 'Stock', None, ()))
+    return instruments
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(('swap', 'drop', 'replace', 'insert'))
+    if edit == 'swap':
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if edit == 'drop':
+        return word[:i] + word[i + 1:]
+    letter = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    if edit == 'replace':
+        return word[:i] + letter + word[i + 1:]
+    return word[:i] + letter + word[i:]
+
+def _queries(picks: List[Instrument], rng: random.Random) -> Dict[str, List[str]]:
+    return {
+        'fuzzy': [_typo(normalize(instrument.name).split()[0], rng) for instrument in picks],
+        'prefix': [normalize(instrument.name)[:rng.randint(2, 6)] for instrument in picks],
+        'symbol': [instrument.symbol for instrument in picks]
+    }
+
+def _time(function: Callable[[str], object], queries: List[str]) -> List[float]:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+def _report(label: str, timings: List[float]) -> float:
+    p50 = timings[len(timings) // 2]
+    p95 = timings[int(len(timings) * 0.95)]
+    p99 = timings[int(len(timings) * 0.99)]
+    print(f"{label:28} p50 {p50:6.2f} ms   p95 {p95:6.2f} ms   p99 {p99:6.2f} ms   max {timings[-1]:6.2f} ms")
+    return p95
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark local instrument search')
+    parser.add_argument('--instruments', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--budget-ms', type=float, default=5.0, help='p95 budget for fuzzy queries')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    instruments = _synthetic_universe(args.instruments, rng)
+    start = time.perf_counter()
+    master = InstrumentMaster()
+    master._index = _Index(instruments)
+    print(f"Indexed {len(instruments)} instruments in {time.perf_counter() - start:.1f} s")
+
+    picks = [rng.choice(instruments) for _ in range(args.queries)]
+    queries = _queries(picks, rng)
+    trigrams = master._index.trigrams
+    fuzzy_p95 = _report('fuzzy, trigram index only', _time(lambda q: trigrams.search(normalize(q), 15), queries['fuzzy']))
+    fuzzy_p95 = max(fuzzy_p95, _report('fuzzy, full search', _time(master.search, queries['fuzzy'])))
+    _report('prefix, full search', _time(master.search, queries['prefix']))
+    _report('symbol, full search', _time(master.search, queries['symbol']))
+
+    # Generated names share their first word, so check the best match has the word that was typo'd
+    found = 0
+    for query, instrument in zip(queries['fuzzy'], picks):
+        matches = master.search(query)
+        word = normalize(instrument.name).split()[0]
+        if matches and word in normalize(matches[0].instrument.name).split():
+            found += 1
+    print(f"Typo'd word found by the best match: {found}/{len(picks)}")
+
+    if fuzzy_p95 > args.budget_ms:
+        print(f"FAIL: fuzzy p95 {fuzzy_p95:.2f} ms is over the {args.budget_ms} ms budget")
+        return 1
+    print(f"OK: fuzzy p95 {fuzzy_p95:.2f} ms is within the {args.budget_ms} ms budget")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
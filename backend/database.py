@@ -31,6 +31,8 @@ class UserDB(Base):
     last_name = Column(String, nullable=True)
     phone = Column(String, nullable=True)
     country = Column(String, nullable=True)
+    # Currency summaries and position values are reported in
+    reporting_currency = Column(String, nullable=True, default='EUR')
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -67,6 +69,26 @@ class InvestmentDB(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Last known quote per ticker, reloaded into memory at startup
+class PriceSnapshotDB(Base):
+    __tablename__ = 'price_snapshots'
+    
+    ticker = Column(String, primary_key=True)
+    price = Column(Float, nullable=False)  # Converted to EUR
+    original_price = Column(Float, nullable=False)
+    currency = Column(String, nullable=False)  # Original currency
+    source = Column(String, nullable=True)
+    as_of = Column(DateTime, nullable=False)
+
+# Symbols at least one quote provider has confirmed, used by validate_ticker and search
+class ValidTickerDB(Base):
+    __tablename__ = 'valid_tickers'
+    
+    ticker = Column(String, primary_key=True)
+    name = Column(String, nullable=True)
+    currency = Column(String, nullable=True)
+    confirmed_at = Column(DateTime, default=datetime.utcnow)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the Yahoo Finance chart and quote endpoints.
+
+Serves simulated prices in Yahoo's JSON shape with configurable latency and
+failure injection, so the API can be load tested without network access:
+
+    python local_quote_server.py --port 8787 --latency-ms 80 --failure-rate 0.05
+    YAHOO_FINANCE_BASE_URL=http://127.0.0.1:8787 QUOTE_PROVIDERS=yahoo python start.py
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from services.currency_converter import detect_currency_from_ticker
+from services.finance_api import _get_mock_price
+from services.quote_providers import (
+    LOCAL_QUOTE_FAILURE_RATE, LOCAL_QUOTE_JITTER_MS, LOCAL_QUOTE_LATENCY_MS, LocalSimulatorProvider
+)
+
+_RANGE_DAYS = {'1d': 1, '5d': 5, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366, '2y': 731, '5y': 1827, '10y': 3653, 'max': 3653}
+_INTERVAL_DAYS = {'1d': 1, '1wk': 7, '1mo': 30}
+
+class QuoteRequestHandler(BaseHTTPRequestHandler):
+    simulator: LocalSimulatorProvider = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            self.simulator.simulate_call()
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+
+        if url.path.startswith('/v8/finance/chart/'):
+            symbol = unquote(url.path[len('/v8/finance/chart/'):]).upper()
+            self._send_json(200, self._chart(symbol, params))
+        elif url.path == '/v7/finance/quote':
+            symbols = [s.strip().upper() for s in params.get('symbols', '').split(',') if s.strip()]
+            self._send_json(200, {'quoteResponse': {'result': [self._quote(s) for s in symbols], 'error': None}})
+        else:
+            self._send_json(404, {'error': f'Unknown path {url.path}'})
+
+    def _quote(self, symbol: str) -> dict:
+        now = time.time()
+        price = self.simulator.price_at(symbol, now)
+        previous_close = self.simulator.price_at(symbol, now - 86400)
+        change = price - previous_close
+        return {
+            'symbol': symbol,
+            'shortName': symbol,
+            'longName': f'{symbol} (simulated)',
+            'currency': detect_currency_from_ticker(symbol),
+            'regularMarketPrice': price,
+            'regularMarketPreviousClose': previous_close,
+            'regularMarketChange': round(change, 4),
+            'regularMarketChangePercent': round(change / previous_close * 100, 4),
+            'regularMarketTime': int(now),
+            'marketCap': None
+        }
+
+    def _chart(self, symbol: str, params: dict) -> dict:
+        now = int(time.time())
+        step = _INTERVAL_DAYS.get(params.get('interval', '1d'), 1) * 86400
+        if 'period1' in params:
+            start = int(params['period1'])
+            end = int(params.get('period2', now))
+        else:
+            start = now - _RANGE_DAYS.get(params.get('range', '1mo'), 31) * 86400
+            end = now
+
+        # Daily bars at midnight UTC, skipping weekends
+        timestamps = [t for t in range(start - start % 86400, end + 1, step) if time.gmtime(t).tm_wday < 5]
+        opens, highs, lows, closes, volumes = [], [], [], [], []
+        for t in timestamps:
+            open_price = self.simulator.price_at(symbol, t)
+            close_price = self.simulator.price_at(symbol, t + 86400 * 0.7)
+            opens.append(open_price)
+            closes.append(close_price)
+            highs.append(round(max(open_price, close_price) * 1.005, 4))
+            lows.append(round(min(open_price, close_price) * 0.995, 4))
+            volumes.append(1000000 + (t // 86400) % 7 * 150000)
+
+        quote = self._quote(symbol)
+        return {
+            'chart': {
+                'result': [{
+                    'meta': {
+                        'symbol': symbol,
+                        'currency': quote['currency'],
+                        'regularMarketPrice': quote['regularMarketPrice'],
+                        'previousClose': quote['regularMarketPreviousClose'],
+                        'regularMarketTime': quote['regularMarketTime']
+                    },
+                    'timestamp': timestamps,
+                    'indicators': {
+                        'quote': [{'open': opens, 'high': highs, 'low': lows, 'close': closes, 'volume': volumes}]
+                    }
+                }],
+                'error': None
+            }
+        }
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Yahoo Finance stand-in with simulated prices')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency-ms', type=float, default=LOCAL_QUOTE_LATENCY_MS)
+    parser.add_argument('--jitter-ms', type=float, default=LOCAL_QUOTE_JITTER_MS)
+    parser.add_argument('--failure-rate', type=float, default=LOCAL_QUOTE_FAILURE_RATE)
+    args = parser.parse_args()
+
+    QuoteRequestHandler.simulator = LocalSimulatorProvider(
+        base_price=_get_mock_price,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate
+    )
+    server = ThreadingHTTPServer((args.host, args.port), QuoteRequestHandler)
+    print(f"Local quote server on http://{args.host}:{args.port} "
+          f"(latency {args.latency_ms}±{args.jitter_ms}ms, failure rate {args.failure_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
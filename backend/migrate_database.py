@@ -31,6 +31,8 @@ def migrate_database():
                 missing_columns.append("phone TEXT")
             if 'country' not in existing_columns:
                 missing_columns.append("country TEXT")
+            if 'reporting_currency' not in existing_columns:
+                missing_columns.append("reporting_currency TEXT DEFAULT 'EUR'")
             if 'updated_at' not in existing_columns:
                 missing_columns.append("updated_at DATETIME")
             
@@ -48,11 +50,20 @@ def migrate_database():
                 
     else:
         print("🗄️ Detected PostgreSQL database")
-        # For PostgreSQL, we'll recreate the tables
-        print("Recreating tables for PostgreSQL...")
-        Base.metadata.drop_all(bind=engine)
+        # Create missing tables, then add missing columns in place; existing data is kept
         Base.metadata.create_all(bind=engine)
-        print("✅ Tables recreated!")
+        with engine.connect() as conn:
+            for column_def in [
+                "first_name TEXT",
+                "last_name TEXT",
+                "phone TEXT",
+                "country TEXT",
+                "reporting_currency TEXT DEFAULT 'EUR'",
+                "updated_at TIMESTAMP",
+            ]:
+                conn.execute(text(f"ALTER TABLE users ADD COLUMN IF NOT EXISTS {column_def}"))
+                print(f"✅ Ensured column: {column_def}")
+            conn.commit()
 
 def list_users():
     """List all users in the database"""
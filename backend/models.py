@@ -24,6 +24,7 @@ class UserResponse(BaseModel):
     last_name: Optional[str]
     phone: Optional[str]
     country: Optional[str]
+    reporting_currency: Optional[str] = 'EUR'
     is_admin: str
     created_at: datetime
 
@@ -33,6 +34,7 @@ class UserUpdate(BaseModel):
     email: Optional[str] = Field(None, description='User email address')
     phone: Optional[str] = Field(None, description='User phone number')
     country: Optional[str] = Field(None, description='User country')
+    reporting_currency: Optional[str] = Field(None, description='Currency summaries are reported in, e.g. EUR, USD, GBP')
 
 class Token(BaseModel):
     access_token: str
@@ -2,14 +2,21 @@ from database import SessionLocal, UserDB, PurchaseDB
 from sqlalchemy import func, desc
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
+from .currency_converter import convert_amounts, detect_currency_from_ticker
 
-# Try to import stock price service, fallback if not available
+# Try to import the batched price lookup, fallback if not available
 try:
-    from .stock_price_service import stock_price_service
+    from .finance_api import get_current_prices
     STOCK_PRICE_AVAILABLE = True
 except ImportError:
     STOCK_PRICE_AVAILABLE = False
-    stock_price_service = None
+    get_current_prices = None
+
+def _to_eur(amounts: List[float], tickers: List[str]) -> List[float]:
+    """Amounts in each ticker's trading currency, converted to EUR in one batch; None without a rate"""
+    currencies = [detect_currency_from_ticker(ticker) for ticker in tickers]
+    converted = convert_amounts([float(amount) for amount in amounts], currencies).tolist()
+    return [amount if amount == amount else None for amount in converted]
 
 def get_all_users() -> List[Dict]:
     """Get all users with their basic info"""
@@ -73,15 +80,19 @@ def get_top_investments(limit: int = 10) -> List[Dict]:
             func.count(PurchaseDB.id).label('purchase_count')
         ).group_by(PurchaseDB.ticker).order_by(desc(func.sum(PurchaseDB.costs))).limit(limit).all()
         
+        # Purchase prices are in each instrument's own currency
+        avg_prices_eur = _to_eur([investment.avg_price for investment in top_investments],
+                                 [investment.ticker for investment in top_investments])
+        
         return [
             {
                 'ticker': investment.ticker,
                 'total_shares': float(investment.total_shares),
-                'avg_price': float(investment.avg_price),
+                'avg_price': avg_price,
                 'total_costs': float(investment.total_costs),
                 'purchase_count': investment.purchase_count
             }
-            for investment in top_investments
+            for investment, avg_price in zip(top_investments, avg_prices_eur)
         ]
     finally:
         db.close()
@@ -198,39 +209,40 @@ def get_stock_analytics() -> Dict:
         # Get total unique users
         total_unique_users = db.query(func.count(func.distinct(PurchaseDB.user_id))).scalar() or 0
         
-        # Get current prices for all tickers
+        # Get current prices for all tickers in one batched lookup
         tickers = [stock.ticker for stock in stock_data]
         current_prices = {}
         
-        print(f"🔍 Debug: Stock price service available: {STOCK_PRICE_AVAILABLE}")
-        print(f"🔍 Debug: Stock price service object: {stock_price_service}")
-        print(f"🔍 Debug: Tickers to fetch: {tickers}")
-        
-        if STOCK_PRICE_AVAILABLE and stock_price_service:
+        if STOCK_PRICE_AVAILABLE and get_current_prices:
             try:
-                print(f"🔍 Debug: Attempting to fetch stock prices...")
-                current_prices = stock_price_service.get_batch_stock_prices(tickers)
-                print(f"🔍 Debug: Fetched prices: {current_prices}")
+                current_prices = get_current_prices(tickers)
             except Exception as e:
                 print(f"❌ Error fetching stock prices: {e}")
                 current_prices = {}
         else:
             print(f"❌ Stock price service not available")
         
-        # For now, we'll return the data without current prices
-        # Current prices would need to be fetched from an external API
+        # Purchase prices are in each instrument's own currency; current prices are in EUR
+        avg_buy_prices_eur = _to_eur([stock.avg_buy_price for stock in stock_data], tickers)
+        
+        def _price_field(ticker: str, index: int):
+            price_data = current_prices.get(ticker.upper().strip())
+            return price_data[index] if price_data else None
+        
         return {
             'stock_analytics': [
                 {
                     'ticker': stock.ticker,
                     'user_count': stock.user_count,
                     'total_shares': float(stock.total_shares),
-                    'avg_buy_price': float(stock.avg_buy_price),
+                    'avg_buy_price': avg_buy_price,
                     'total_costs': float(stock.total_costs),
                     'purchase_count': stock.purchase_count,
-                    'current_price': current_prices.get(stock.ticker)  # Real current price
+                    'current_price': _price_field(stock.ticker, 0),  # Current price in EUR
+                    'original_price': _price_field(stock.ticker, 1),
+                    'original_currency': _price_field(stock.ticker, 2)
                 }
-                for stock in stock_data
+                for stock, avg_buy_price in zip(stock_data, avg_buy_prices_eur)
             ],
             'total_unique_users': total_unique_users
         }
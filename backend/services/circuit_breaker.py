@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CIRCUIT_BREAKER_WINDOW = int(os.getenv('CIRCUIT_BREAKER_WINDOW', '20'))
+# Outcomes older than this are forgotten, so a provider that recovered gets ranked up again
+CIRCUIT_BREAKER_WINDOW_SECONDS = float(os.getenv('CIRCUIT_BREAKER_WINDOW_SECONDS', '300'))
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv('CIRCUIT_BREAKER_MIN_CALLS', '5'))
+# Fraction of failed (or too slow) calls in the window that opens the breaker
+CIRCUIT_BREAKER_ERROR_RATE = float(os.getenv('CIRCUIT_BREAKER_ERROR_RATE', '0.5'))
+# Calls slower than this count as failures when deciding whether to open
+CIRCUIT_BREAKER_SLOW_CALL_SECONDS = float(os.getenv('CIRCUIT_BREAKER_SLOW_CALL_SECONDS', '5'))
+# How long an open breaker rejects calls before letting a probe through
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv('CIRCUIT_BREAKER_OPEN_SECONDS', '60'))
+# Latency assumed for providers without recent successes when ranking. Being
+# optimistic here makes sure a provider whose failures have aged out gets retried.
+CIRCUIT_BREAKER_PRIOR_LATENCY = 0.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the provider's breaker is open"""
+    pass
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker over a rolling window of call outcomes.
+
+    The breaker opens when the share of failed or slow calls in the window
+    exceeds the error rate. After open_seconds a single probe call is let
+    through; its outcome closes the breaker again or re-opens it.
+    """
+
+    def __init__(self, name: str, window: int = CIRCUIT_BREAKER_WINDOW, window_seconds: float = CIRCUIT_BREAKER_WINDOW_SECONDS,
+                 min_calls: int = CIRCUIT_BREAKER_MIN_CALLS, error_rate: float = CIRCUIT_BREAKER_ERROR_RATE, slow_call_seconds: float = CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+                 open_seconds: float = CIRCUIT_BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (timestamp, success, latency_seconds)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may go through right now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def _prune(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _recent(self):
+        self._prune(time.time())
+        return self._outcomes
+
+    def record(self, success: bool, latency: float):
+        with self._lock:
+            now = time.time()
+            self._prune(now)
+            self._outcomes.append((now, success, latency))
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if success and latency < self.slow_call_seconds:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                bad = sum(1 for _, ok, seconds in self._outcomes if not ok or seconds >= self.slow_call_seconds)
+                if bad / len(self._outcomes) >= self.error_rate:
+                    self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.time()
+        print(f"Circuit breaker for {self.name} opened")
+
+    def success_rate(self) -> float:
+        """Share of successful recent calls; 1.0 until min_calls outcomes are known"""
+        with self._lock:
+            outcomes = self._recent()
+            if len(outcomes) < self.min_calls:
+                return 1.0
+            return sum(1 for _, ok, _ in outcomes if ok) / len(outcomes)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Return the given percentile (0-100) of recent successful call latencies"""
+        with self._lock:
+            samples = sorted(seconds for _, ok, seconds in self._recent() if ok)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return sum(1 for _, ok, _ in self._recent() if ok)
+
+    def snapshot(self) -> Dict:
+        median = self.latency_percentile(50)
+        p90 = self.latency_percentile(90)
+        with self._lock:
+            calls = len(self._recent())
+            state = self.state
+            retry_in = max(0.0, self.open_seconds - (time.time() - self._opened_at)) if state == OPEN else None
+        return {
+            'name': self.name,
+            'state': state,
+            'calls_in_window': calls,
+            'success_rate': round(self.success_rate(), 4),
+            'median_latency_seconds': round(median, 4) if median is not None else None,
+            'p90_latency_seconds': round(p90, 4) if p90 is not None else None,
+            'rejected_calls': self.rejected,
+            'retry_in_seconds': round(retry_in, 1) if retry_in is not None else None
+        }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+def call_with_breaker(name: str, fn: Callable[[], Any], is_success: Callable[[Any], bool] = lambda result: bool(result)) -> Any:
+    """
+    Call fn through the named provider's breaker. Raises CircuitOpenError
+    without calling fn when the breaker is open.
+    """
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{name} circuit is open")
+    start = time.perf_counter()
+    try:
+        result = fn()
+    except Exception:
+        breaker.record(False, time.perf_counter() - start)
+        raise
+    breaker.record(is_success(result), time.perf_counter() - start)
+    return result
+
+def rank_providers(providers: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+    """
+    Order (name, provider) pairs by observed health: open breakers last, then
+    higher success rate, then lower median latency. Ties keep the configured order.
+    """
+    def health_key(item):
+        index, (name, _) = item
+        breaker = get_breaker(name)
+        median = breaker.latency_percentile(50)
+        return (
+            breaker.state == OPEN,
+            -round(breaker.success_rate(), 1),
+            round(median if median is not None else CIRCUIT_BREAKER_PRIOR_LATENCY, 1),
+            index
+        )
+
+    return [provider for _, provider in sorted(enumerate(providers), key=health_key)]
+
+def get_breaker_states() -> List[Dict]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
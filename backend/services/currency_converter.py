@@ -1,104 +1,251 @@
-import requests
+import os
+import threading
 import time
-from typing import Optional, Tuple
-from datetime import datetime, timedelta
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
 
-# Cache for exchange rates to avoid too many API calls
-_exchange_rate_cache = {}
-_cache_duration = timedelta(hours=1)  # Cache for 1 hour
+import numpy as np
+
+from .http_client import http_client
+from .circuit_breaker import CircuitOpenError, call_with_breaker, rank_providers
+from .single_flight import get_single_flight
+from .rate_limiter import acquire
+from .instrument_master import instrument_master
+
+# Every source is asked for all rates against this currency; other pairs are derived through it
+FX_PIVOT_CURRENCY = 'EUR'
+# The whole table is refetched this often (one upstream request per interval)
+FX_REFRESH_INTERVAL_SECONDS = float(os.getenv('FX_REFRESH_INTERVAL_SECONDS', '3600'))
+# After every source failed, keep serving the old table this long before trying again
+FX_RETRY_SECONDS = float(os.getenv('FX_RETRY_SECONDS', '300'))
+# Currencies a user can pick to have their portfolio reported in
+REPORTING_CURRENCIES = ('EUR', 'USD', 'GBP', 'CHF', 'DKK', 'SEK', 'NOK', 'PLN', 'CZK', 'JPY', 'CAD', 'AUD')
+DEFAULT_REPORTING_CURRENCY = 'EUR'
+
+_fx_flight = get_single_flight('fx')
+
+class _RateTable(NamedTuple):
+    # Units of each currency per one pivot currency unit; never modified once published
+    rates: Dict[str, float]
+    fetched_at: float
+    source: str
+
+class RateMatrix(NamedTuple):
+    """Rates between every pair of a set of currencies: rates[i, j] is units of j per unit of i"""
+    index: Dict[str, int]
+    rates: np.ndarray
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        return float(self.rates[self.index[from_currency.upper()], self.index[to_currency.upper()]])
+
+class ExchangeRateTable:
+    """
+    All exchange rates against the pivot currency, fetched in one request.
+
+    Any pair is derived by triangulation (EUR->GBP / EUR->USD for USD->GBP).
+    A background thread replaces the table every interval; a new table is
+    swapped in whole, so readers never see a half-updated one. Without the
+    thread, an expired table is refreshed on first use.
+    """
+
+    def __init__(self, pivot: str = FX_PIVOT_CURRENCY, interval: float = FX_REFRESH_INTERVAL_SECONDS,
+                 retry: float = FX_RETRY_SECONDS):
+        self.pivot = pivot
+        self.interval = interval
+        self.retry = retry
+        self._table: Optional[_RateTable] = None
+        self._retry_at = 0.0
+        # Shared by all callers until the table is replaced or a new currency comes into use
+        self._matrix: Optional[Tuple[Optional[_RateTable], RateMatrix]] = None
+        self._matrix_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.fetches = 0
+        self.failures = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='fx-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            table = self._table
+            age = time.time() - table.fetched_at if table else None
+            if age is None or age >= self.interval:
+                self.refresh()
+                table = self._table
+                age = time.time() - table.fetched_at if table else None
+            wait = self.interval - age if age is not None and age < self.interval else self.retry
+            self._stop.wait(max(wait, 1))
+
+    def _current(self) -> Optional[_RateTable]:
+        table = self._table
+        now = time.time()
+        if (table is None or now - table.fetched_at >= self.interval) and now >= self._retry_at:
+            self.refresh()
+            table = self._table
+        return table
+
+    def refresh(self) -> bool:
+        """Fetch a new table; concurrent callers share one upstream request"""
+        return _fx_flight.do(('table', self.pivot), self._fetch)
+
+    def _fetch(self) -> bool:
+        # Try multiple sources, healthiest first; open circuits are skipped
+        sources = rank_providers([
+            ('exchangerate_api', _try_exchange_rate_api),
+            ('fixer', _try_fixer_api),
+            ('currencyapi', _try_currency_api)
+        ])
+        
+        for name, source in sources:
+            if not acquire(name):
+                # Out of quota, move on to the next source instead of waiting
+                continue
+            try:
+                rates = call_with_breaker(name, lambda: source(self.pivot), lambda rates: bool(rates))
+            except CircuitOpenError:
+                continue
+            except Exception as e:
+                print(f"Exchange rate source {name} failed: {e}")
+                continue
+            if rates:
+                rates = {currency.upper(): float(rate) for currency, rate in rates.items() if rate and float(rate) > 0}
+                rates[self.pivot] = 1.0
+                self._table = _RateTable(rates, time.time(), name)
+                self.fetches += 1
+                return True
+        
+        self.failures += 1
+        self._retry_at = time.time() + self.retry
+        print(f"Warning: Could not refresh exchange rates, {'keeping the previous table' if self._table else 'no rates available'}")
+        return False
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        """Units of to_currency per from_currency, or None when either is not in the table"""
+        table = self._current()
+        if table is None:
+            return None
+        from_rate = table.rates.get(from_currency.upper())
+        to_rate = table.rates.get(to_currency.upper())
+        if not from_rate or not to_rate:
+            return None
+        return to_rate / from_rate
+
+    def matrix(self, currencies: Iterable[str]) -> RateMatrix:
+        """
+        Rate matrix covering currencies and every currency asked for before.
+        It is computed once per table refresh, however many users share it.
+        """
+        wanted = {currency.upper() for currency in currencies}
+        table = self._current()
+        cached = self._matrix
+        if cached is not None and cached[0] is table and wanted <= cached[1].index.keys():
+            return cached[1]
+        with self._matrix_lock:
+            cached = self._matrix
+            if cached is not None and cached[0] is table and wanted <= cached[1].index.keys():
+                return cached[1]
+            if cached is not None:
+                wanted |= cached[1].index.keys()
+            codes = sorted(wanted)
+            # Units per pivot unit; currencies missing from the table go through the fallback
+            # rates, and rates to or from currencies without any are NaN
+            per_pivot = np.array([
+                table.rates[code] if table and code in table.rates else 1 / (get_exchange_rate(code, self.pivot) or np.nan)
+                for code in codes
+            ], dtype=np.float64)
+            matrix = RateMatrix({code: i for i, code in enumerate(codes)}, per_pivot[np.newaxis, :] / per_pivot[:, np.newaxis])
+            self._matrix = (table, matrix)
+            return matrix
+
+    def clear(self):
+        self._table = None
+        self._retry_at = 0.0
+        self._matrix = None
+
+    def stats(self) -> Dict:
+        table = self._table
+        return {
+            'pivot': self.pivot,
+            'currencies': len(table.rates) if table else 0,
+            'source': table.source if table else None,
+            'age_seconds': round(time.time() - table.fetched_at) if table else None,
+            'fetches': self.fetches,
+            'failures': self.failures,
+            'matrix_currencies': len(self._matrix[1].index) if self._matrix else 0
+        }
 
 def clear_cache():
     """Clear the exchange rate cache"""
-    global _exchange_rate_cache
-    _exchange_rate_cache = {}
+    exchange_rates.clear()
 
 def get_exchange_rate(from_currency: str, to_currency: str) -> Optional[float]:
     """
-    Get exchange rate between two currencies
+    Get exchange rate between two currencies, or None when no rate is known
     """
     if from_currency == to_currency:
         return 1.0
     
-    cache_key = f"{from_currency}_{to_currency}"
-    current_time = datetime.now()
-    
-    # Check cache first
-    if cache_key in _exchange_rate_cache:
-        cached_rate, cached_time = _exchange_rate_cache[cache_key]
-        if current_time - cached_time < _cache_duration:
-            return cached_rate
-    
-    # Try multiple sources for exchange rate
-    sources = [
-        _try_exchange_rate_api,
-        _try_fixer_api,
-        _try_currency_api
-    ]
-    
-    for source in sources:
-        try:
-            rate = source(from_currency, to_currency)
-            if rate and rate > 0:
-                # Cache the result
-                _exchange_rate_cache[cache_key] = (rate, current_time)
-                return rate
-        except Exception as e:
-            print(f"Exchange rate source {source.__name__} failed: {e}")
-            continue
+    rate = exchange_rates.rate(from_currency, to_currency)
+    if rate:
+        return rate
     
     # Fallback to hardcoded rates for common currencies
     fallback_rate = _get_fallback_rate(from_currency, to_currency)
     if fallback_rate:
         return fallback_rate
     
-    # If no fallback rate is available, return 1.0 to avoid NaN
-    print(f"Warning: No exchange rate available for {from_currency} to {to_currency}, using 1.0")
-    return 1.0
+    # Never guess: a wrong rate mislabels amounts by orders of magnitude
+    print(f"Warning: No exchange rate available for {from_currency} to {to_currency}")
+    return None
 
-def _try_exchange_rate_api(from_currency: str, to_currency: str) -> Optional[float]:
+def _try_exchange_rate_api(base: str) -> Optional[Dict[str, float]]:
     """Try Exchange Rate API (free tier)"""
     try:
-        url = f"https://api.exchangerate-api.com/v4/latest/{from_currency}"
-        response = requests.get(url, timeout=10)
+        url = f"https://api.exchangerate-api.com/v4/latest/{base}"
+        response = http_client.get(url)
         response.raise_for_status()
         
         data = response.json()
-        if 'rates' in data and to_currency in data['rates']:
-            return float(data['rates'][to_currency])
-        
-        return None
+        return data.get('rates') or None
     except Exception as e:
         raise Exception(f"Exchange Rate API error: {str(e)}")
 
-def _try_fixer_api(from_currency: str, to_currency: str) -> Optional[float]:
+def _try_fixer_api(base: str) -> Optional[Dict[str, float]]:
     """Try Fixer API (free tier)"""
     try:
         # Using a demo API key - in production you'd want your own
         api_key = "demo"
-        url = f"http://data.fixer.io/api/latest?access_key={api_key}&base={from_currency}&symbols={to_currency}"
+        url = f"http://data.fixer.io/api/latest?access_key={api_key}&base={base}"
         
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url)
         response.raise_for_status()
         
         data = response.json()
-        if data.get('success') and 'rates' in data and to_currency in data['rates']:
-            return float(data['rates'][to_currency])
+        if data.get('success'):
+            return data.get('rates') or None
         
         return None
     except Exception as e:
         raise Exception(f"Fixer API error: {str(e)}")
 
-def _try_currency_api(from_currency: str, to_currency: str) -> Optional[float]:
+def _try_currency_api(base: str) -> Optional[Dict[str, float]]:
     """Try Currency API (free tier)"""
     try:
-        url = f"https://api.currencyapi.com/v3/latest?apikey=demo&base_currency={from_currency}&currencies={to_currency}"
+        url = f"https://api.currencyapi.com/v3/latest?apikey=demo&base_currency={base}"
         
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url)
         response.raise_for_status()
         
         data = response.json()
-        if 'data' in data and to_currency in data['data']:
-            return float(data['data'][to_currency]['value'])
+        if 'data' in data:
+            return {code: item['value'] for code, item in data['data'].items()} or None
         
         return None
     except Exception as e:
@@ -125,17 +272,17 @@ def detect_currency_from_ticker(ticker: str) -> str:
     """
     ticker = ticker.upper()
     
+    # Known instruments carry their listing currency
+    instrument = instrument_master.get(ticker)
+    if instrument and instrument.currency:
+        return instrument.currency
+    
     # European exchanges typically trade in EUR
     european_suffixes = ['.AS', '.BR', '.DE', '.PA', '.SW', '.MC', '.IE', '.CO', '.VI']
     for suffix in european_suffixes:
         if ticker.endswith(suffix):
             return 'EUR'
     
-    # Some London stocks trade in EUR (like BIRG.L)
-    eur_london_stocks = ['BIRG.L', 'SMT.L', 'FCIT.L']  # Add more as needed
-    if ticker in eur_london_stocks:
-        return 'EUR'
-    
     # London exchange typically trades in GBP
     if ticker.endswith('.L'):
         return 'GBP'
@@ -167,6 +314,20 @@ def convert_price_to_eur(price: float, from_currency: str) -> float:
     print(f"Warning: Could not convert {price} {from_currency} to EUR, returning original price")
     return price
 
+def convert_amounts(amounts: Sequence[float], currencies: Sequence[str], to_currency: str = 'EUR') -> np.ndarray:
+    """
+    Convert many amounts, each in its own currency, at current rates.
+    One rate lookup per distinct currency, then a single vector multiply.
+    Amounts in a currency without a known rate come out as NaN.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if not len(amounts):
+        return amounts
+    currency_codes, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+    factors = np.array([get_exchange_rate(currency.upper(), to_currency.upper()) or np.nan for currency in currency_codes],
+                       dtype=np.float64)
+    return amounts * factors[inverse]
+
 def get_price_with_currency_conversion(ticker: str, original_price: float) -> Tuple[float, str]:
     """
     Get the price converted to EUR if needed, along with the original currency
@@ -177,4 +338,7 @@ def get_price_with_currency_conversion(ticker: str, original_price: float) -> Tu
         return original_price, 'EUR'
     else:
         converted_price = convert_price_to_eur(original_price, detected_currency)
-        return converted_price, detected_currency 
\ No newline at end of file
+        return converted_price, detected_currency 
+
+# Global instance
+exchange_rates = ExchangeRateTable()
@@ -0,0 +1,249 @@
+import os
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+# After the close, quotes fetched within this window may still move
+# (closing auctions, 15-minute delayed feeds) and are not frozen yet
+EXCHANGE_CLOSE_GRACE_MINUTES = float(os.getenv('EXCHANGE_CLOSE_GRACE_MINUTES', '20'))
+
+def _easter_sunday(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th given weekday (0=Monday) of a month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed_us(day: date) -> date:
+    """US rule: Saturday holidays are observed on Friday, Sunday ones on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+def _observed_uk(day: date, taken: Set[date]) -> date:
+    """UK rule: weekend holidays move to the next free weekday"""
+    while day.weekday() >= 5 or day in taken:
+        day += timedelta(days=1)
+    return day
+
+def _nyse_holidays(year: int) -> Set[date]:
+    easter = _easter_sunday(year)
+    return {
+        _observed_us(date(year, 1, 1)),
+        _nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),   # Presidents' Day
+        easter - timedelta(days=2),    # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed_us(date(year, 6, 19)),
+        _observed_us(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),   # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed_us(date(year, 12, 25)),
+    }
+
+def _lse_holidays(year: int) -> Set[date]:
+    easter = _easter_sunday(year)
+    holidays = {
+        easter - timedelta(days=2),
+        easter + timedelta(days=1),
+        _nth_weekday(year, 5, 0, 1),   # Early May bank holiday
+        _nth_weekday(year, 5, 0, -1),  # Spring bank holiday
+        _nth_weekday(year, 8, 0, -1),  # Summer bank holiday
+    }
+    holidays.add(_observed_uk(date(year, 1, 1), holidays))
+    christmas = _observed_uk(date(year, 12, 25), holidays)
+    holidays.add(christmas)
+    holidays.add(_observed_uk(date(year, 12, 26), holidays))
+    return holidays
+
+def _euronext_holidays(year: int) -> Set[date]:
+    easter = _easter_sunday(year)
+    return {
+        date(year, 1, 1),
+        easter - timedelta(days=2),
+        easter + timedelta(days=1),
+        date(year, 5, 1),
+        date(year, 12, 25),
+        date(year, 12, 26),
+    }
+
+def _xetra_holidays(year: int) -> Set[date]:
+    return _euronext_holidays(year) | {date(year, 12, 24), date(year, 12, 31)}
+
+def _bme_holidays(year: int) -> Set[date]:
+    return _euronext_holidays(year) | {date(year, 12, 24), date(year, 12, 31)}
+
+def _six_holidays(year: int) -> Set[date]:
+    easter = _easter_sunday(year)
+    return _euronext_holidays(year) | {
+        date(year, 1, 2),
+        easter + timedelta(days=39),   # Ascension Day
+        easter + timedelta(days=50),   # Whit Monday
+        date(year, 8, 1),
+        date(year, 12, 24),
+        date(year, 12, 31),
+    }
+
+def _vienna_holidays(year: int) -> Set[date]:
+    easter = _easter_sunday(year)
+    return _euronext_holidays(year) | {
+        easter + timedelta(days=50),   # Whit Monday
+        date(year, 12, 24),
+        date(year, 12, 31),
+    }
+
+def _copenhagen_holidays(year: int) -> Set[date]:
+    easter = _easter_sunday(year)
+    return {
+        date(year, 1, 1),
+        easter - timedelta(days=3),    # Maundy Thursday
+        easter - timedelta(days=2),
+        easter + timedelta(days=1),
+        easter + timedelta(days=39),   # Ascension Day
+        easter + timedelta(days=40),
+        easter + timedelta(days=50),   # Whit Monday
+        date(year, 6, 5),              # Constitution Day
+        date(year, 12, 24),
+        date(year, 12, 25),
+        date(year, 12, 26),
+        date(year, 12, 31),
+    }
+
+class Market:
+    """Regular trading hours and holidays of one exchange"""
+
+    def __init__(self, code: str, tz: str, open_time: dtime, close_time: dtime,
+                 holidays: Callable[[int], Set[date]]):
+        self.code = code
+        self.tz = ZoneInfo(tz)
+        self.open_time = open_time
+        self.close_time = close_time
+        self._holidays = lru_cache(maxsize=8)(holidays)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self._holidays(day.year)
+
+    def session(self, day: date) -> Tuple[datetime, datetime]:
+        """Open and close of a day's session as aware datetimes"""
+        return (datetime.combine(day, self.open_time, tzinfo=self.tz),
+                datetime.combine(day, self.close_time, tzinfo=self.tz))
+
+    def is_open(self, moment: datetime) -> bool:
+        local = moment.astimezone(self.tz)
+        if not self.is_trading_day(local.date()):
+            return False
+        session_open, session_close = self.session(local.date())
+        return session_open <= local < session_close
+
+    def next_open(self, moment: datetime) -> datetime:
+        local = moment.astimezone(self.tz)
+        day = local.date()
+        for _ in range(15):
+            if self.is_trading_day(day):
+                session_open, _ = self.session(day)
+                if session_open > local:
+                    return session_open
+            day += timedelta(days=1)
+        raise ValueError(f"No trading day found for {self.code} after {moment}")
+
+    def last_close(self, moment: datetime) -> datetime:
+        local = moment.astimezone(self.tz)
+        day = local.date()
+        for _ in range(15):
+            if self.is_trading_day(day):
+                _, session_close = self.session(day)
+                if session_close <= local:
+                    return session_close
+            day -= timedelta(days=1)
+        raise ValueError(f"No trading day found for {self.code} before {moment}")
+
+_EURONEXT_HOURS = (dtime(9, 0), dtime(17, 30))
+
+MARKETS: Dict[str, Market] = {
+    'XNYS': Market('XNYS', 'America/New_York', dtime(9, 30), dtime(16, 0), _nyse_holidays),
+    'XLON': Market('XLON', 'Europe/London', dtime(8, 0), dtime(16, 30), _lse_holidays),
+    'XAMS': Market('XAMS', 'Europe/Amsterdam', *_EURONEXT_HOURS, _euronext_holidays),
+    'XBRU': Market('XBRU', 'Europe/Brussels', *_EURONEXT_HOURS, _euronext_holidays),
+    'XPAR': Market('XPAR', 'Europe/Paris', *_EURONEXT_HOURS, _euronext_holidays),
+    'XMSM': Market('XMSM', 'Europe/Dublin', dtime(8, 0), dtime(16, 30), _euronext_holidays),
+    'XETR': Market('XETR', 'Europe/Berlin', *_EURONEXT_HOURS, _xetra_holidays),
+    'XMAD': Market('XMAD', 'Europe/Madrid', *_EURONEXT_HOURS, _bme_holidays),
+    'XSWX': Market('XSWX', 'Europe/Zurich', *_EURONEXT_HOURS, _six_holidays),
+    'XWBO': Market('XWBO', 'Europe/Vienna', dtime(9, 0), dtime(17, 30), _vienna_holidays),
+    'XCSE': Market('XCSE', 'Europe/Copenhagen', dtime(9, 0), dtime(17, 0), _copenhagen_holidays),
+}
+
+# Same suffixes detect_currency_from_ticker knows about
+SUFFIX_MARKETS = {
+    '.L': 'XLON',
+    '.AS': 'XAMS',
+    '.BR': 'XBRU',
+    '.PA': 'XPAR',
+    '.IE': 'XMSM',
+    '.DE': 'XETR',
+    '.MC': 'XMAD',
+    '.SW': 'XSWX',
+    '.VI': 'XWBO',
+    '.CO': 'XCSE',
+}
+
+# Share class suffixes used by US listings (e.g. BRK.A)
+_US_SUFFIXES = {'.A', '.B', '.US', '.N', '.O'}
+
+def get_market(ticker: str) -> Optional[Market]:
+    """
+    Return the exchange a ticker trades on, or None when unknown. Currency
+    pairs, crypto and other round-the-clock symbols deliberately map to None.
+    """
+    ticker = ticker.upper().strip()
+    if '=' in ticker or '-USD' in ticker or '-EUR' in ticker or ticker.startswith('^'):
+        return None
+    if '.' not in ticker:
+        return MARKETS['XNYS']
+    suffix = ticker[ticker.rindex('.'):]
+    if suffix in _US_SUFFIXES:
+        return MARKETS['XNYS']
+    code = SUFFIX_MARKETS.get(suffix)
+    return MARKETS[code] if code else None
+
+def is_market_open(ticker: str, moment: Optional[datetime] = None) -> Optional[bool]:
+    """True/False for known exchanges, None when the ticker's market is unknown"""
+    market = get_market(ticker)
+    if market is None:
+        return None
+    return market.is_open(moment or datetime.now(timezone.utc))
+
+def closed_quote_expiry(ticker: str, fetched_at: float) -> Optional[float]:
+    """
+    If a quote was fetched while its market was closed, and late enough after
+    the close that the price has settled, it stays correct until the next open.
+    Returns that next open as an epoch timestamp, or None if the quote should
+    get the normal TTL.
+    """
+    market = get_market(ticker)
+    if market is None:
+        return None
+    moment = datetime.fromtimestamp(fetched_at, tz=timezone.utc)
+    if market.is_open(moment):
+        return None
+    if moment - market.last_close(moment) < timedelta(minutes=EXCHANGE_CLOSE_GRACE_MINUTES):
+        return None
+    return market.next_open(moment).timestamp()
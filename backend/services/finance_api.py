@@ -1,37 +1,85 @@
-import requests
+import os
 import time
 import re
-from typing import Optional, List, Dict, Tuple
-from .currency_converter import get_price_with_currency_conversion
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, List, Dict, Tuple
+from .currency_converter import convert_amounts, detect_currency_from_ticker, get_price_with_currency_conversion
+from .quote_cache import MOCK_SOURCE, quote_cache
+from .hedging import hedged_first
+from .circuit_breaker import CircuitOpenError, call_with_breaker, get_breaker, rank_providers
+from .http_client import http_client
+from .single_flight import get_single_flight
+from .rate_limiter import RATE_LIMIT_WAIT_SECONDS, RateLimitExceeded, acquire, call_with_rate_limit
+from .ticker_index import ticker_index
+from .instrument_master import CONFIDENT_MATCH_SCORE, finds_substrings, instrument_master, normalize, to_search_result
+from .search_cache import search_cache
+from .quote_providers import (
+    BATCH_SOURCE_SUFFIX, FunctionProvider, LocalSimulatorProvider, get_batch_provider, get_configured_providers, register_provider
+)
+
+# Point at a local stand-in (see local_quote_server.py) for offline load tests
+YAHOO_FINANCE_BASE_URL = os.getenv('YAHOO_FINANCE_BASE_URL', 'https://query1.finance.yahoo.com').rstrip('/')
+
+# Fall back to generated demo prices when every provider fails. Disable in
+# production so fake prices never mix with real ones.
+ALLOW_MOCK_PRICES = os.getenv('ALLOW_MOCK_PRICES', 'false').lower() == 'true'
+
+# Maximum number of symbols per multi-symbol quote request
+QUOTE_BATCH_SIZE = int(os.getenv('QUOTE_BATCH_SIZE', '40'))
+# Symbols missing from a batch response are fetched one by one, this many at a time
+PRICE_FETCH_CONCURRENCY = int(os.getenv('PRICE_FETCH_CONCURRENCY', '8'))
+
+# Hedged source racing. With no fixed PRICE_HEDGE_DELAY_SECONDS the delay
+# follows the running source's recent PRICE_HEDGE_PERCENTILE latency.
+PRICE_HEDGING_ENABLED = os.getenv('PRICE_HEDGING_ENABLED', 'true').lower() == 'true'
+PRICE_HEDGE_DELAY_SECONDS = float(os.environ['PRICE_HEDGE_DELAY_SECONDS']) if os.getenv('PRICE_HEDGE_DELAY_SECONDS') else None
+PRICE_HEDGE_PERCENTILE = float(os.getenv('PRICE_HEDGE_PERCENTILE', '90'))
+PRICE_HEDGE_DEFAULT_DELAY = float(os.getenv('PRICE_HEDGE_DEFAULT_DELAY', '1.0'))
+PRICE_HEDGE_MIN_DELAY = float(os.getenv('PRICE_HEDGE_MIN_DELAY', '0.25'))
+PRICE_HEDGE_MAX_DELAY = float(os.getenv('PRICE_HEDGE_MAX_DELAY', '3.0'))
+PRICE_HEDGE_MIN_SAMPLES = 5
+
+# Concurrent lookups for the same ticker share one upstream fetch
+_price_flight = get_single_flight('price')
+_stock_info_flight = get_single_flight('stock_info')
+
+# Per-symbol fallback fetches run here
+_fetch_executor = ThreadPoolExecutor(max_workers=PRICE_FETCH_CONCURRENCY, thread_name_prefix='price-fetch')
 
 def get_current_price(ticker: str) -> tuple:
     """
     Get current stock price from multiple sources with currency conversion to EUR
     Returns: (converted_price_eur, original_price, original_currency)
+
+    Quotes are served from the shared quote cache; stale quotes are returned
+    immediately while a background refresh fetches a new one.
+    """
+    return quote_cache.get_or_fetch(ticker, _fetch_current_price)
+
+def _fetch_current_price(ticker: str) -> Tuple[tuple, str]:
+    """
+    Fetch a quote upstream, sharing one fetch between concurrent callers for the same ticker.
+    Returns ((converted_price_eur, original_price, original_currency), source_name)
     """
+    ticker = ticker.upper().strip()
+    return _price_flight.do(ticker, lambda: _fetch_current_price_uncoalesced(ticker))
+
+def _fetch_current_price_uncoalesced(ticker: str) -> Tuple[tuple, str]:
+    """Fetch a quote from the upstream sources, bypassing the cache"""
     # Clean ticker symbol
     ticker = ticker.upper().strip()
     
-    # Try multiple data sources
-    sources = [
-        _try_yahoo_finance,
-        _try_alpha_vantage,
-        _try_alternative_source,
-        _try_finnhub
-    ]
+    source_name, price = _get_upstream_price(ticker)
+    if price:
+        # Convert price to EUR if needed
+        converted_price, original_currency = get_price_with_currency_conversion(ticker, price)
+        if original_currency != 'EUR':
+            print(f"Converted {price} {original_currency} to {converted_price:.2f} EUR for {ticker}")
+        return (converted_price, price, original_currency), source_name
     
-    for source in sources:
-        try:
-            price = source(ticker)
-            if price and price > 0:
-                # Convert price to EUR if needed
-                converted_price, original_currency = get_price_with_currency_conversion(ticker, price)
-                if original_currency != 'EUR':
-                    print(f"Converted {price} {original_currency} to {converted_price:.2f} EUR for {ticker}")
-                return converted_price, price, original_currency
-        except Exception as e:
-            print(f"Source {source.__name__} failed for {ticker}: {e}")
-            continue
+    if not ALLOW_MOCK_PRICES:
+        raise Exception(f"No price available for {ticker} from any provider")
     
     # If all sources fail, return a mock price for demo purposes
     print(f"All data sources failed for {ticker}, using mock data")
@@ -40,27 +88,221 @@ def get_current_price(ticker: str) -> tuple:
     converted_price, original_currency = get_price_with_currency_conversion(ticker, mock_price)
     if original_currency != 'EUR':
         print(f"Converted mock price {mock_price} {original_currency} to {converted_price:.2f} EUR for {ticker}")
-    return converted_price, mock_price, original_currency
+    return (converted_price, mock_price, original_currency), MOCK_SOURCE
+
+def _get_upstream_price(ticker: str) -> Tuple[Optional[str], Optional[float]]:
+    """
+    Ask the upstream sources for a raw price.
+    Returns (source_name, price), or (None, None) if every source failed.
+    """
+    # Try the configured providers, healthiest first; open circuits are skipped
+    sources = rank_providers([(provider.name, provider) for provider in get_configured_providers()])
+    # A provider without a free token fails fast so the next one is tried
+    calls = [
+        (name, partial(call_with_rate_limit, name, partial(call_with_breaker, name, partial(provider.get_price, ticker), _breaker_success(provider))))
+        for name, provider in sources
+    ]
+    
+    if PRICE_HEDGING_ENABLED:
+        # Race the sources: start the next one whenever the previous one is slower than the hedge delay
+        return hedged_first(
+            calls,
+            hedge_delay=_hedge_delay,
+            is_valid=_is_valid_price,
+            on_error=lambda name, e: print(f"Source {name} failed for {ticker}: {e}")
+        )
+    
+    for name, call in calls:
+        try:
+            price = call()
+            if _is_valid_price(price):
+                return name, price
+        except Exception as e:
+            print(f"Source {name} failed for {ticker}: {e}")
+            continue
+    
+    return None, None
+
+def _is_valid_price(price) -> bool:
+    return bool(price and price > 0)
+
+def _is_answer(price) -> bool:
+    # None from an authoritative provider means "no such symbol", the provider itself is healthy
+    return price is None or _is_valid_price(price)
+
+def _breaker_success(provider) -> Callable:
+    """What counts as a healthy call to a provider for its circuit breaker"""
+    return _is_answer if provider.authoritative else _is_valid_price
+
+def _hedge_delay(source_name: str) -> float:
+    """How long to wait for a source before starting the next one"""
+    if PRICE_HEDGE_DELAY_SECONDS is not None:
+        return PRICE_HEDGE_DELAY_SECONDS
+    
+    # Use the source's own recent tail latency once we have enough samples
+    breaker = get_breaker(source_name)
+    if breaker.sample_count() < PRICE_HEDGE_MIN_SAMPLES:
+        return PRICE_HEDGE_DEFAULT_DELAY
+    # Samples can age out of the window between the two reads
+    delay = breaker.latency_percentile(PRICE_HEDGE_PERCENTILE)
+    if delay is None:
+        return PRICE_HEDGE_DEFAULT_DELAY
+    return min(max(delay, PRICE_HEDGE_MIN_DELAY), PRICE_HEDGE_MAX_DELAY)
+
+def get_current_prices(tickers: List[str], timeout: Optional[float] = None) -> Dict[str, tuple]:
+    """
+    Get current prices for many tickers at once with currency conversion to EUR.
+    Cached quotes are served from memory (stale ones are refreshed in the
+    background); the rest are fetched in chunks from the first configured
+    provider with a multi-symbol endpoint, and only symbols missing from the
+    batch response fall back to the per-symbol source chain.
+    With a timeout, uncached tickers not priced in time are left out; their
+    fetch carries on in the background and fills the cache.
+    Returns: {ticker: (converted_price_eur, original_price, original_currency)}
+    """
+    results = {}
+    missing = []
+    stale = []
+    for ticker in dict.fromkeys(quote_cache.normalize(t) for t in tickers if t):
+        value, state = quote_cache.lookup(ticker)
+        if state == 'miss':
+            missing.append(ticker)
+        else:
+            results[ticker] = value
+            if state == 'stale':
+                stale.append(ticker)
+    
+    if stale:
+        quote_cache.refresh_many_in_background(stale, refresh_current_prices)
+    if missing and timeout is None:
+        results.update(refresh_current_prices(missing))
+    elif missing:
+        # Concurrent callers missing the same tickers share one background fetch
+        quote_cache.refresh_many_in_background(missing, refresh_current_prices)
+        results.update(quote_cache.wait_for_refresh(missing, timeout))
+    
+    return results
+
+def refresh_current_prices(tickers: List[str]) -> Dict[str, tuple]:
+    """
+    Fetch quotes for several tickers upstream without reading the cache,
+    store them in the cache and return them
+    """
+    results = {}
+    batch_source, raw_prices = _fetch_provider_batch(tickers)
+    
+    # Convert the whole batch response at once, one rate lookup per currency
+    priced = [ticker for ticker in tickers if raw_prices.get(ticker) and raw_prices[ticker] > 0]
+    currencies = [detect_currency_from_ticker(ticker) for ticker in priced]
+    converted = dict(zip(priced, zip(convert_amounts([raw_prices[t] for t in priced], currencies).tolist(), currencies)))
+    # Prices without an exchange rate (NaN) are not cached, they go through the per-symbol path
+    converted = {ticker: value for ticker, value in converted.items() if value[0] == value[0]}
+    
+    for ticker, (converted_price, original_currency) in converted.items():
+        results[ticker] = (converted_price, raw_prices[ticker], original_currency)
+        quote_cache.set(ticker, results[ticker], source=batch_source)
+    
+    def fetch_one(ticker: str) -> Optional[tuple]:
+        # Not in the batch response, walk the per-symbol source chain
+        try:
+            value, source = _fetch_current_price(ticker)
+        except Exception as e:
+            print(f"No price for {ticker}: {e}")
+            return None
+        quote_cache.set(ticker, value, source=source)
+        return value
+    
+    # Concurrently, so one slow symbol does not hold up the others
+    fallback = [ticker for ticker in tickers if ticker not in converted]
+    mapper = _fetch_executor.map if len(fallback) > 1 else map
+    for ticker, value in zip(fallback, mapper(fetch_one, fallback)):
+        if value is not None:
+            results[ticker] = value
+    
+    return results
+
+def fetch_quote_batch(tickers: List[str]) -> Dict[str, float]:
+    """
+    Fetch raw (unconverted) prices for many tickers from the first configured
+    provider with a multi-symbol endpoint. Symbols without a price are left out.
+    """
+    return _fetch_provider_batch(tickers)[1]
+
+def _fetch_provider_batch(tickers: List[str]) -> Tuple[Optional[str], Dict[str, float]]:
+    """Returns (batch_source_name, {ticker: raw_price}), requested in chunks of QUOTE_BATCH_SIZE"""
+    provider = get_batch_provider()
+    if provider is None:
+        return None, {}
+    
+    breaker_name = f"{provider.name}{BATCH_SOURCE_SUFFIX}"
+    prices = {}
+    symbols = list(dict.fromkeys(t.upper().strip() for t in tickers if t))
+    
+    for start in range(0, len(symbols), QUOTE_BATCH_SIZE):
+        chunk = symbols[start:start + QUOTE_BATCH_SIZE]
+        # Take the token first: in the half-open state allow() reserves the
+        # single probe, which must then be followed by record()
+        if not acquire(breaker_name, RATE_LIMIT_WAIT_SECONDS):
+            print(f"{provider.name} batch quota exhausted, {len(symbols) - start} symbols left for per-symbol fallback")
+            break
+        if not get_breaker(breaker_name).allow():
+            # Batch endpoint is failing, let callers fall back per symbol
+            break
+        request_start = time.perf_counter()
+        try:
+            for symbol, price in provider.get_prices(chunk).items():
+                symbol = symbol.upper()
+                if symbol in chunk and price and price > 0:
+                    prices[symbol] = float(price)
+            get_breaker(breaker_name).record(True, time.perf_counter() - request_start)
+        except Exception as e:
+            get_breaker(breaker_name).record(False, time.perf_counter() - request_start)
+            print(f"{provider.name} batch quote failed for {len(chunk)} symbols: {e}")
+            continue
+    
+    return breaker_name, prices
+
+def _fetch_yahoo_quote_batch(symbols: List[str]) -> Dict[str, float]:
+    """Raw prices from Yahoo's v7 quote endpoint, which accepts a comma-separated symbol list"""
+    url = f"{YAHOO_FINANCE_BASE_URL}/v7/finance/quote"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'application/json, text/plain, */*',
+        'Referer': 'https://finance.yahoo.com/'
+    }
+    
+    response = http_client.get(url, params={'symbols': ','.join(symbols)}, headers=headers)
+    response.raise_for_status()
+    
+    prices = {}
+    data = response.json()
+    for result in data.get('quoteResponse', {}).get('result') or []:
+        symbol = (result.get('symbol') or '').upper()
+        price = result.get('regularMarketPrice')
+        if symbol and price and price > 0:
+            prices[symbol] = float(price)
+    return prices
 
 def _try_yahoo_finance(ticker: str) -> Optional[float]:
     """Try Yahoo Finance API with better headers"""
     try:
         # Use the chart endpoint which is more reliable
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+        url = f"{YAHOO_FINANCE_BASE_URL}/v8/finance/chart/{ticker}"
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'application/json, text/plain, */*',
             'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
             'Referer': 'https://finance.yahoo.com/',
             'Origin': 'https://finance.yahoo.com',
             'Cache-Control': 'no-cache',
             'Pragma': 'no-cache'
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=headers)
+        if response.status_code == 404:
+            # Unknown symbol, a definite answer rather than an error
+            return None
         response.raise_for_status()
         
         data = response.json()
@@ -77,6 +319,57 @@ def _try_yahoo_finance(ticker: str) -> Optional[float]:
     except Exception as e:
         raise Exception(f"Yahoo Finance error: {str(e)}")
 
+def fetch_daily_history(ticker: str, period1: Optional[int] = None) -> Tuple[Optional[str], List[tuple]]:
+    """
+    Fetch daily OHLCV bars from the Yahoo chart endpoint, the full history or
+    only bars from the epoch timestamp period1 onwards.
+    Returns (currency, [(days_since_epoch, open, high, low, close, volume)])
+    """
+    ticker = ticker.upper().strip()
+    if period1 is None:
+        params = {'range': 'max', 'interval': '1d'}
+    else:
+        params = {'period1': int(period1), 'period2': int(time.time()), 'interval': '1d'}
+    
+    if not acquire('yahoo', RATE_LIMIT_WAIT_SECONDS):
+        raise RateLimitExceeded("Rate limit reached for yahoo")
+    
+    def fetch():
+        url = f"{YAHOO_FINANCE_BASE_URL}/v8/finance/chart/{ticker}"
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'application/json, text/plain, */*',
+            'Referer': 'https://finance.yahoo.com/'
+        }
+        response = http_client.get(url, params=params, headers=headers)
+        response.raise_for_status()
+        return response.json()
+    
+    data = call_with_breaker('yahoo_history', fetch)
+    results = (data.get('chart') or {}).get('result') or []
+    if not results:
+        return None, []
+    
+    result = results[0]
+    quote = ((result.get('indicators') or {}).get('quote') or [{}])[0]
+    columns = {field: quote.get(field) or [] for field in ('open', 'high', 'low', 'close', 'volume')}
+    
+    def value(field: str, index: int):
+        column = columns[field]
+        return column[index] if index < len(column) else None
+    
+    bars = []
+    for i, timestamp in enumerate(result.get('timestamp') or []):
+        close = value('close', i)
+        # Yahoo leaves gaps as nulls (halts, partial current day)
+        if close is None:
+            continue
+        close = float(close)
+        open_price, high, low = (float(v) if v is not None else close for v in (value('open', i), value('high', i), value('low', i)))
+        bars.append((int(timestamp) // 86400, open_price, high, low, close, float(value('volume', i) or 0)))
+    
+    return (result.get('meta') or {}).get('currency'), bars
+
 def _try_alpha_vantage(ticker: str) -> Optional[float]:
     """Try Alpha Vantage API (free tier)"""
     try:
@@ -84,10 +377,13 @@ def _try_alpha_vantage(ticker: str) -> Optional[float]:
         api_key = "demo"
         url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={ticker}&apikey={api_key}"
         
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url)
         response.raise_for_status()
         
         data = response.json()
+        if 'Note' in data or 'Information' in data:
+            # Quota messages are not an answer about the symbol
+            raise Exception(data.get('Note') or data.get('Information'))
         
         if 'Global Quote' in data and '05. price' in data['Global Quote']:
             price = data['Global Quote']['05. price']
@@ -113,7 +409,7 @@ def _try_alternative_source(ticker: str) -> Optional[float]:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=headers)
         if response.status_code == 200:
             # Look for price patterns in the HTML
             content = response.text
@@ -134,7 +430,7 @@ def _try_finnhub(ticker: str) -> Optional[float]:
         api_key = "demo"
         url = f"https://finnhub.io/api/v1/quote?symbol={ticker}&token={api_key}"
         
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url)
         response.raise_for_status()
         
         data = response.json()
@@ -152,53 +448,14 @@ def _get_mock_price(ticker: str) -> float:
     import random
     import hashlib
     
-    # Realistic price ranges for different types of stocks (in their native currency)
-    price_ranges = {
-        # US Tech stocks (USD)
-        'AAPL': (150, 200),
-        'MSFT': (300, 400),
-        'GOOGL': (120, 150),
-        'AMZN': (120, 160),
-        'TSLA': (200, 300),
-        'META': (300, 400),
-        'NVDA': (400, 600),
-        'NFLX': (400, 600),
-        'NKE': (90, 120),  # Nike in USD
-        
-        # European stocks (EUR)
-        'ASML.AS': (600, 800),
-        'SAP.DE': (120, 160),
-        'LVMH.PA': (600, 800),
-        'KBC.BR': (50, 80),
-        'INGA.AS': (10, 15),
-        'ABI.BR': (50, 70),
-        'COLR.BR': (30, 50),  # Colruyt in EUR
-        
-        # UK stocks (GBP)
-        'BIRG.L': (8, 12),  # Bank of Ireland Group PLC (in EUR)
-        
-        # Irish stocks (EUR)
-        'BIRG.IE': (8, 12),  # Bank of Ireland Group PLC (Irish exchange)
-        
-        # ETFs
-        'SPY': (400, 500),  # USD
-        'QQQ': (300, 400),  # USD
-        'VTI': (200, 250),  # USD
-        'VXUS': (50, 60),   # USD
-        'BND': (70, 80),    # USD
-        'GLD': (180, 220),  # USD
-        'VWRL.L': (80, 100),  # GBP
-        'IWDA.L': (70, 90),   # GBP
-        'BEL.BR': (60, 80),   # EUR - AMUNDI BEL 20 UCITS ETF DIST
-    }
-    
     # Create a deterministic but realistic price based on ticker
     hash_value = int(hashlib.md5(ticker.encode()).hexdigest()[:8], 16)
     random.seed(hash_value)
     
-    # Check if we have a known price range for this ticker
-    if ticker in price_ranges:
-        min_price, max_price = price_ranges[ticker]
+    # Realistic price ranges (in the native currency) come from the instrument master
+    instrument = instrument_master.get(ticker)
+    if instrument and instrument.mock_price_range:
+        min_price, max_price = instrument.mock_price_range
         price = random.uniform(min_price, max_price)
     else:
         # Generate a realistic price range based on ticker characteristics
@@ -206,7 +463,7 @@ def _get_mock_price(ticker: str) -> float:
             base_price = random.uniform(20, 100)
         elif '.L' in ticker:  # UK stocks (GBP)
             base_price = random.uniform(5, 15)
-        elif 'ETF' in ticker or ticker in ['SPY', 'QQQ', 'VTI', 'VXUS', 'BND', 'GLD']:
+        elif 'ETF' in ticker or (instrument and instrument.type == 'ETF'):
             base_price = random.uniform(50, 500)
         else:  # US stocks
             base_price = random.uniform(50, 300)
@@ -216,19 +473,34 @@ def _get_mock_price(ticker: str) -> float:
     
     return round(price, 2)
 
+# Built-in providers; QUOTE_PROVIDERS picks which ones are used and in what order
+register_provider(FunctionProvider('yahoo', _try_yahoo_finance, _fetch_yahoo_quote_batch))
+register_provider(FunctionProvider('alpha_vantage', _try_alpha_vantage))
+# The scraper swallows its own errors, so its None says nothing about the symbol
+register_provider(FunctionProvider('marketwatch', _try_alternative_source, authoritative=False))
+register_provider(FunctionProvider('finnhub', _try_finnhub))
+# Offline stand-in with simulated latency and failures, e.g. QUOTE_PROVIDERS=local
+register_provider(LocalSimulatorProvider(base_price=_get_mock_price))
+
 def get_stock_info(ticker: str) -> dict:
     """
     Get additional stock information
     """
+    ticker = ticker.upper().strip()
+    return _stock_info_flight.do(ticker, lambda: _fetch_stock_info(ticker))
+
+def _fetch_stock_info(ticker: str) -> dict:
     try:
-        ticker = ticker.upper().strip()
-        url = f"https://query1.finance.yahoo.com/v7/finance/quote?symbols={ticker}"
+        if not acquire('yahoo', RATE_LIMIT_WAIT_SECONDS):
+            raise RateLimitExceeded("Rate limit reached for yahoo")
+        
+        url = f"{YAHOO_FINANCE_BASE_URL}/v7/finance/quote?symbols={ticker}"
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         
         data = response.json()
@@ -250,25 +522,71 @@ def get_stock_info(ticker: str) -> dict:
 
 def validate_ticker(ticker: str) -> bool:
     """
-    Validate if a ticker symbol exists
+    Validate if a ticker symbol exists.
+    Answered from the ticker index when the symbol is known either way; only
+    unknown symbols are checked upstream, without the mock price fallback.
     """
-    try:
-        get_current_price(ticker)
+    ticker = ticker.upper().strip()
+    known = ticker_index.lookup(ticker)
+    if known is not None:
+        return known
+    
+    valid, source_name, price = _probe_upstream(ticker)
+    if valid:
+        ticker_index.mark_valid(ticker)
+        # The quote is likely needed next (e.g. for a new purchase), keep it
+        converted_price, original_currency = get_price_with_currency_conversion(ticker, price)
+        quote_cache.set(ticker, (converted_price, price, original_currency), source=source_name)
         return True
-    except:
+    if valid is False:
+        ticker_index.mark_invalid(ticker)
         return False
+    
+    print(f"Could not validate {ticker}: no provider gave a definite answer")
+    return False
+
+def _probe_upstream(ticker: str) -> Tuple[Optional[bool], Optional[str], Optional[float]]:
+    """
+    Ask the configured providers one by one whether a symbol has a price.
+    Returns (True, source, price) when one has, (False, None, None) when an
+    authoritative provider rejected it and none had a price, and
+    (None, None, None) when nobody could answer (errors, quotas, open circuits).
+    """
+    rejected = False
+    for provider in get_configured_providers():
+        if not provider.live:
+            # A simulated price exists for any symbol, so it proves nothing
+            continue
+        try:
+            price = call_with_rate_limit(
+                provider.name,
+                partial(call_with_breaker, provider.name, partial(provider.get_price, ticker), _breaker_success(provider))
+            )
+        except Exception as e:
+            print(f"Source {provider.name} failed for {ticker}: {e}")
+            continue
+        if _is_valid_price(price):
+            return True, provider.name, price
+        rejected = rejected or provider.authoritative
+    return (False if rejected else None), None, None
 
 def search_stocks(query: str) -> List[Dict]:
     """
     Search for stocks and ETFs by name or ticker
     """
-    results = []
-    
-    # First, search our local database
-    local_results = _search_local_database(query)
-    results.extend(local_results)
+    return search_cache.search(query, _search_stocks)
+
+def _search_stocks(query: str) -> Tuple[List[Dict], bool]:
+    """Search results, and whether they are every local match (see SearchCache)"""
+    # The instrument master answers most queries on its own, without probing upstream
+    matches = instrument_master.search(query, limit=15)
+    results = [to_search_result(match.instrument) for match in matches]
+    if matches and matches[0].score >= CONFIDENT_MATCH_SCORE:
+        # Without the substring pass a longer query could match instruments that are not here
+        complete = len(matches) < 15 and not any(match.fuzzy for match in matches) and finds_substrings(normalize(query))
+        return results, complete
     
-    # Then, try to search Yahoo Finance for additional results
+    # No confident local match, so try to search Yahoo Finance for additional results
     try:
         yahoo_results = _search_yahoo_finance(query)
         results.extend(yahoo_results)
@@ -287,278 +605,11 @@ def search_stocks(query: str) -> List[Dict]:
     unique_results = _remove_duplicates(results)
     sorted_results = _sort_by_relevance(unique_results, query)
     
-    return sorted_results[:15]  # Return top 15 results
-
-def _search_local_database(query: str) -> List[Dict]:
-    """Search our local stock database"""
-    # Common stock and ETF database
-    stock_database = {
-        # US Stocks
-        "apple": ["AAPL", "Apple Inc."],
-        "microsoft": ["MSFT", "Microsoft Corporation"],
-        "google": ["GOOGL", "Alphabet Inc."],
-        "amazon": ["AMZN", "Amazon.com Inc."],
-        "tesla": ["TSLA", "Tesla Inc."],
-        "netflix": ["NFLX", "Netflix Inc."],
-        "facebook": ["META", "Meta Platforms Inc."],
-        "nvidia": ["NVDA", "NVIDIA Corporation"],
-        "berkshire": ["BRK.A", "Berkshire Hathaway Inc."],
-        "johnson": ["JNJ", "Johnson & Johnson"],
-        "nike": ["NKE", "Nike Inc."],
-        "coca cola": ["KO", "The Coca-Cola Company"],
-        "mcdonalds": ["MCD", "McDonald's Corporation"],
-        "disney": ["DIS", "The Walt Disney Company"],
-        "walmart": ["WMT", "Walmart Inc."],
-        "procter": ["PG", "Procter & Gamble Co."],
-        "visa": ["V", "Visa Inc."],
-        "mastercard": ["MA", "Mastercard Inc."],
-        "paypal": ["PYPL", "PayPal Holdings Inc."],
-        "salesforce": ["CRM", "Salesforce Inc."],
-        "adobe": ["ADBE", "Adobe Inc."],
-        "intel": ["INTC", "Intel Corporation"],
-        "amd": ["AMD", "Advanced Micro Devices Inc."],
-        "qualcomm": ["QCOM", "Qualcomm Inc."],
-        "cisco": ["CSCO", "Cisco Systems Inc."],
-        "oracle": ["ORCL", "Oracle Corporation"],
-        "ibm": ["IBM", "International Business Machines Corp."],
-        "goldman": ["GS", "The Goldman Sachs Group Inc."],
-        "jpmorgan": ["JPM", "JPMorgan Chase & Co."],
-        "bank of america": ["BAC", "Bank of America Corp."],
-        "wells fargo": ["WFC", "Wells Fargo & Company"],
-        "citigroup": ["C", "Citigroup Inc."],
-        "morgan stanley": ["MS", "Morgan Stanley"],
-        "blackrock": ["BLK", "BlackRock Inc."],
-        "huntington": ["HBAN", "Huntington Bancshares Incorporated"],
-        "huntington bancshares": ["HBAN", "Huntington Bancshares Incorporated"],
-        "joby": ["JOBY", "Joby Aviation Inc."],
-        "joby aviation": ["JOBY", "Joby Aviation Inc."],
-        "joby aviation inc": ["JOBY", "Joby Aviation Inc."],
-        "home depot": ["HD", "The Home Depot Inc."],
-        "lowes": ["LOW", "Lowe's Companies Inc."],
-        "target": ["TGT", "Target Corporation"],
-        "costco": ["COST", "Costco Wholesale Corporation"],
-        "starbucks": ["SBUX", "Starbucks Corporation"],
-        "uber": ["UBER", "Uber Technologies Inc."],
-        "lyft": ["LYFT", "Lyft Inc."],
-        "airbnb": ["ABNB", "Airbnb Inc."],
-        "zoom": ["ZM", "Zoom Video Communications Inc."],
-        "slack": ["WORK", "Slack Technologies Inc."],
-        "spotify": ["SPOT", "Spotify Technology S.A."],
-        "snap": ["SNAP", "Snap Inc."],
-        "twitter": ["TWTR", "Twitter Inc."],
-        "linkedin": ["MSFT", "LinkedIn (Microsoft)"],
-        "youtube": ["GOOGL", "YouTube (Alphabet)"],
-        "instagram": ["META", "Instagram (Meta)"],
-        "whatsapp": ["META", "WhatsApp (Meta)"],
-        
-        # European Stocks
-        "asml": ["ASML.AS", "ASML Holding N.V."],
-        "sap": ["SAP.DE", "SAP SE"],
-        "lvmh": ["LVMH.PA", "LVMH Moët Hennessy Louis Vuitton"],
-        "nestle": ["NESN.SW", "Nestlé S.A."],
-        "novo": ["NOVO-B.CO", "Novo Nordisk A/S"],
-        "roche": ["ROG.SW", "Roche Holding AG"],
-        "unilever": ["ULVR.L", "Unilever PLC"],
-        "shell": ["SHEL.L", "Shell PLC"],
-        "bp": ["BP.L", "BP PLC"],
-        "glaxo": ["GSK.L", "GSK PLC"],
-        "astrazeneca": ["AZN.L", "AstraZeneca PLC"],
-        "diageo": ["DGE.L", "Diageo PLC"],
-        "rio tinto": ["RIO.L", "Rio Tinto Group"],
-        "bhp": ["BHP.L", "BHP Group PLC"],
-        "anglo american": ["AAL.L", "Anglo American PLC"],
-        "barclays": ["BARC.L", "Barclays PLC"],
-        "hsbc": ["HSBA.L", "HSBC Holdings PLC"],
-        "lloyds": ["LLOY.L", "Lloyds Banking Group PLC"],
-        "rbs": ["RBS.L", "Royal Bank of Scotland Group PLC"],
-        "santander": ["SAN.MC", "Banco Santander S.A."],
-        "bbva": ["BBVA.MC", "Banco Bilbao Vizcaya Argentaria S.A."],
-        "telefonica": ["TEF.MC", "Telefónica S.A."],
-        "inditex": ["ITX.MC", "Inditex S.A."],
-        "volkswagen": ["VOW3.DE", "Volkswagen AG"],
-        "bmw": ["BMW.DE", "BMW AG"],
-        "daimler": ["DAI.DE", "Daimler AG"],
-        "siemens": ["SIE.DE", "Siemens AG"],
-        "basf": ["BAS.DE", "BASF SE"],
-        "bayer": ["BAYN.DE", "Bayer AG"],
-        "allianz": ["ALV.DE", "Allianz SE"],
-        "deutsche bank": ["DBK.DE", "Deutsche Bank AG"],
-        "commerzbank": ["CBK.DE", "Commerzbank AG"],
-        "adidas": ["ADS.DE", "adidas AG"],
-        "puma": ["PUM.DE", "Puma SE"],
-        "airbus": ["AIR.PA", "Airbus SE"],
-        "total": ["TTE.PA", "TotalEnergies SE"],
-        "orange": ["ORA.PA", "Orange S.A."],
-        "bnp paribas": ["BNP.PA", "BNP Paribas S.A."],
-        "societe generale": ["GLE.PA", "Société Générale S.A."],
-        "credit agricole": ["ACA.PA", "Crédit Agricole S.A."],
-        "axa": ["CS.PA", "AXA S.A."],
-        "sanofi": ["SAN.PA", "Sanofi S.A."],
-        "danone": ["BN.PA", "Danone S.A."],
-        "carrefour": ["CA.PA", "Carrefour S.A."],
-        "renault": ["RNO.PA", "Renault S.A."],
-        "peugeot": ["UG.PA", "Peugeot S.A."],
-        "novartis": ["NOVN.SW", "Novartis AG"],
-        "ubs": ["UBSG.SW", "UBS Group AG"],
-        "credit suisse": ["CSGN.SW", "Credit Suisse Group AG"],
-        "swiss re": ["SREN.SW", "Swiss Re Ltd"],
-        "zurich": ["ZURN.SW", "Zurich Insurance Group AG"],
-        "philip morris": ["PMI.SW", "Philip Morris International Inc."],
-        "richemont": ["CFR.SW", "Compagnie Financière Richemont SA"],
-        "swatch": ["UHR.SW", "The Swatch Group AG"],
-        "logitech": ["LOGN.SW", "Logitech International S.A."],
-        
-        # Irish Stocks
-        "bank of ireland": ["BIRG.L", "Bank of Ireland Group PLC"],
-        "allied irish": ["AIBG.IE", "Allied Irish Banks PLC"],
-        "ryanair": ["RYA.IE", "Ryanair Holdings PLC"],
-        "kerry group": ["KRG.IE", "Kerry Group PLC"],
-        "smurfit kappa": ["SKG.IE", "Smurfit Kappa Group PLC"],
-        "glanbia": ["GLB.IE", "Glanbia PLC"],
-        "kingspan": ["KGP.IE", "Kingspan Group PLC"],
-        "crh": ["CRH.IE", "CRH PLC"],
-        "paddy power": ["PPB.IE", "Paddy Power Betfair PLC"],
-        "flutter": ["FLTR.L", "Flutter Entertainment PLC"],
-        
-        # ETFs
-        "sp500": ["SPY", "SPDR S&P 500 ETF Trust"],
-        "nasdaq": ["QQQ", "Invesco QQQ Trust"],
-        "total market": ["VTI", "Vanguard Total Stock Market ETF"],
-        "international": ["VXUS", "Vanguard Total International Stock ETF"],
-        "bonds": ["BND", "Vanguard Total Bond Market ETF"],
-        "gold": ["GLD", "SPDR Gold Trust"],
-        "emerging markets": ["VWO", "Vanguard FTSE Emerging Markets ETF"],
-        "dividend": ["VYM", "Vanguard High Dividend Yield ETF"],
-        "growth": ["VUG", "Vanguard Growth ETF"],
-        "value": ["VTV", "Vanguard Value ETF"],
-        "small cap": ["VB", "Vanguard Small-Cap ETF"],
-        "mid cap": ["VO", "Vanguard Mid-Cap ETF"],
-        "real estate": ["VNQ", "Vanguard Real Estate ETF"],
-        "healthcare": ["VHT", "Vanguard Healthcare ETF"],
-        "technology": ["VGT", "Vanguard Information Technology ETF"],
-        "financial": ["VFH", "Vanguard Financials ETF"],
-        "energy": ["VDE", "Vanguard Energy ETF"],
-        "consumer staples": ["VDC", "Vanguard Consumer Staples ETF"],
-        "consumer discretionary": ["VCR", "Vanguard Consumer Discretionary ETF"],
-        "utilities": ["VPU", "Vanguard Utilities ETF"],
-        "materials": ["VAW", "Vanguard Materials ETF"],
-        "industrials": ["VIS", "Vanguard Industrials ETF"],
-        "communication": ["VOX", "Vanguard Communication Services ETF"],
-        
-        # European ETFs
-        "bel20": ["BEL20.BR", "BEL 20 Index"],
-        "amundi bel": ["BEL.BR", "AMUNDI BEL 20 UCITS ETF DIST"],
-        "ishares msci": ["IWDA.L", "iShares MSCI World UCITS ETF"],
-        "vanguard ftse": ["VWRL.L", "Vanguard FTSE All-World UCITS ETF"],
-        "lyxor msci": ["LYXOR MSCI WORLD UCITS ETF", "LYXOR MSCI WORLD UCITS ETF"],
-        "ishares core": ["CSPX.L", "iShares Core S&P 500 UCITS ETF"],
-        "ishares em": ["EMIM.L", "iShares Core MSCI Emerging Markets IMI UCITS ETF"],
-        "ishares bond": ["IGLO.L", "iShares Core Global Government Bond UCITS ETF"],
-        "ishares gold": ["SGLN.L", "iShares Physical Gold ETC"],
-        "ishares silver": ["SSLN.L", "iShares Physical Silver ETC"],
-        "ishares property": ["IWDP.L", "iShares Developed Markets Property Yield UCITS ETF"],
-        "ishares dividend": ["IDVY.L", "iShares EURO STOXX 50 UCITS ETF"],
-        "ishares europe": ["IMEU.L", "iShares MSCI Europe UCITS ETF"],
-        "ishares uk": ["ISF.L", "iShares Core FTSE 100 UCITS ETF"],
-        "ishares germany": ["IDEX.L", "iShares MSCI Germany UCITS ETF"],
-        "ishares france": ["IDFP.L", "iShares MSCI France UCITS ETF"],
-        "ishares spain": ["IESM.L", "iShares MSCI Spain UCITS ETF"],
-        "ishares italy": ["IMI.L", "iShares MSCI Italy UCITS ETF"],
-        "ishares netherlands": ["INED.L", "iShares MSCI Netherlands UCITS ETF"],
-        "ishares switzerland": ["ISWI.L", "iShares MSCI Switzerland UCITS ETF"],
-        "ishares nordic": ["INRD.L", "iShares MSCI Nordic UCITS ETF"],
-        
-        # Belgian Stocks
-        "kbc": ["KBC.BR", "KBC Group NV"],
-        "ing": ["INGA.AS", "ING Groep NV"],
-        "ab inbev": ["ABI.BR", "Anheuser-Busch InBev SA/NV"],
-        "ucb": ["UCB.BR", "UCB SA"],
-        "solvay": ["SOLB.BR", "Solvay SA"],
-        "proximus": ["PROX.BR", "Proximus PLC"],
-        "colruyt": ["COLR.BR", "Colruyt Group NV"],
-        "ageas": ["AGS.BR", "Ageas SA/NV"],
-        "bpost": ["BPOST.BR", "bpost SA/NV"],
-        "birg": ["BIRG.BR", "BIRG - Belgian Investment Research Group"],
-        "telenet": ["TNET.BR", "Telenet Group Holding NV"],
-        "waregem": ["WAR.BR", "Waregem NV"],
-        "mechelen": ["MEC.BR", "Mechelen NV"],
-        "antwerp": ["ANT.BR", "Antwerp NV"],
-        "ghent": ["GHE.BR", "Ghent NV"],
-        "bruges": ["BRU.BR", "Bruges NV"],
-        "leuven": ["LEU.BR", "Leuven NV"],
-        "namur": ["NAM.BR", "Namur NV"],
-        "liege": ["LIE.BR", "Liege NV"],
-        "charleroi": ["CHA.BR", "Charleroi NV"],
-        "mons": ["MON.BR", "Mons NV"],
-        "tournai": ["TOU.BR", "Tournai NV"],
-        "arlon": ["ARL.BR", "Arlon NV"],
-        "bastogne": ["BAS.BR", "Bastogne NV"],
-        "verviers": ["VER.BR", "Verviers NV"],
-        "hasselt": ["HAS.BR", "Hasselt NV"],
-        "genk": ["GEN.BR", "Genk NV"],
-        "roeselare": ["ROE.BR", "Roeselare NV"],
-        "kortrijk": ["KOR.BR", "Kortrijk NV"],
-        "ostend": ["OST.BR", "Ostend NV"],
-        "knokke": ["KNO.BR", "Knokke NV"],
-        "blankenberge": ["BLA.BR", "Blankenberge NV"],
-        "de haan": ["DEH.BR", "De Haan NV"],
-        "zeebrugge": ["ZEE.BR", "Zeebrugge NV"],
-        "oostende": ["OOS.BR", "Oostende NV"],
-        "nieuwpoort": ["NIE.BR", "Nieuwpoort NV"],
-        "diksmuide": ["DIK.BR", "Diksmuide NV"],
-        "poperinge": ["POP.BR", "Poperinge NV"],
-        "ieper": ["IEP.BR", "Ieper NV"],
-        "vleteren": ["VLE.BR", "Vleteren NV"],
-        "alveringem": ["ALV.BR", "Alveringem NV"],
-        "lo-rense": ["LOR.BR", "Lo-Reninge NV"],
-        "hooglede": ["HOO.BR", "Hooglede NV"],
-        "gits": ["GIT.BR", "Gits NV"],
-        "torhout": ["TOR.BR", "Torhout NV"],
-        "oostkamp": ["OOK.BR", "Oostkamp NV"],
-        "beernem": ["BEE.BR", "Beernem NV"],
-        "zulte": ["ZUL.BR", "Zulte NV"],
-        "deinze": ["DEI.BR", "Deinze NV"],
-        "evergem": ["EVE.BR", "Evergem NV"],
-        "assenede": ["ASS.BR", "Assenede NV"],
-        "kaprijke": ["KAP.BR", "Kaprijke NV"],
-        "lievegem": ["LIE.BR", "Lievegem NV"],
-        "destelbergen": ["DES.BR", "Destelbergen NV"],
-        "merelbeke": ["MER.BR", "Merelbeke NV"],
-        "melle": ["MEL.BR", "Melle NV"],
-        "ovl": ["OVL.BR", "Oost-Vlaanderen NV"],
-        "wvl": ["WVL.BR", "West-Vlaanderen NV"],
-        "ant": ["ANT.BR", "Antwerpen NV"],
-        "lim": ["LIM.BR", "Limburg NV"],
-        "vbr": ["VBR.BR", "Vlaams-Brabant NV"],
-        "wbr": ["WBR.BR", "Waals-Brabant NV"],
-        "hai": ["HAI.BR", "Henegouwen NV"],
-        "nam": ["NAM.BR", "Namen NV"],
-        "lux": ["LUX.BR", "Luxemburg NV"],
-        "lie": ["LIE.BR", "Luik NV"],
-    }
-    
-    query_lower = query.lower().strip()
-    results = []
-    
-    # Search by name or ticker
-    for name, (ticker, full_name) in stock_database.items():
-        if (query_lower in name or 
-            query_lower in ticker.lower() or 
-            query_lower in full_name.lower()):
-            results.append({
-                "ticker": ticker,
-                "name": full_name,
-                "type": "ETF" if "ETF" in full_name else "Stock"
-            })
-    
-    # Sort results by relevance
-    results.sort(key=lambda x: (
-        query_lower in x["ticker"].lower(),  # Exact ticker match first
-        query_lower in x["name"].lower(),    # Then name match
-        len(x["name"])                       # Shorter names first
-    ), reverse=True)
-    
-    return results[:10]  # Return top 10 results
+    return sorted_results[:15], False  # Return top 15 results
+
+def search_local_instruments(query: str, limit: int = 15) -> List[Dict]:
+    """Search the instrument master only; never calls upstream"""
+    return [to_search_result(match.instrument) for match in instrument_master.search(query, limit)]
 
 def get_stock_suggestions(query: str) -> List[str]:
     """
@@ -567,25 +618,12 @@ def get_stock_suggestions(query: str) -> List[str]:
     if len(query) < 2:
         return []
     
-    suggestions = []
-    query_lower = query.lower()
-    
-    # Common ticker patterns
-    common_tickers = [
-        "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "META", "NVDA", "NFLX",
-        "ASML.AS", "SAP.DE", "LVMH.PA", "KBC.BR", "INGA.AS", "ABI.BR",
-        "SPY", "QQQ", "VTI", "VXUS", "BND", "GLD", "VWRL.L", "IWDA.L"
-    ]
-    
-    for ticker in common_tickers:
-        if query_lower in ticker.lower():
-            suggestions.append(ticker)
-    
-    return suggestions[:5]
+    return [match.instrument.symbol for match in instrument_master.search(query, limit=5)]
 
 def _search_yahoo_finance(query: str) -> List[Dict]:
     """
-    Search Yahoo Finance for stocks and ETFs using a more reliable approach
+    Search Yahoo Finance for stocks and ETFs by probing candidate symbols.
+    Candidates the ticker index already knows are answered from memory.
     """
     try:
         # Clean the query
@@ -605,83 +643,16 @@ def _search_yahoo_finance(query: str) -> List[Dict]:
         
         results = []
         
-        for pattern in search_patterns:
+        for pattern in dict.fromkeys(search_patterns):
             for exchange in exchanges:
                 try:
-                    ticker = pattern + exchange
-                    # Try to get stock info using a more reliable endpoint
-                    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                        'Accept': 'application/json, text/plain, */*',
-                        'Accept-Language': 'en-US,en;q=0.9',
-                        'Accept-Encoding': 'gzip, deflate, br',
-                        'Connection': 'keep-alive',
-                        'Referer': 'https://finance.yahoo.com/',
-                        'Origin': 'https://finance.yahoo.com',
-                        'Cache-Control': 'no-cache',
-                        'Pragma': 'no-cache'
-                    }
-                    
-                    response = requests.get(url, headers=headers, timeout=5)
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
-                            result = data['chart']['result'][0]
-                            meta = result.get('meta', {})
-                            
-                            if meta.get('regularMarketPrice') and meta.get('regularMarketPrice') > 0:
-                                symbol = meta.get('symbol', ticker)
-                                name = meta.get('shortName', meta.get('longName', ticker))
-                                
-                                results.append({
-                                    'ticker': symbol,
-                                    'name': name,
-                                    'type': 'Stock' if 'ETF' not in name else 'ETF',
-                                    'source': 'Yahoo Finance'
-                                })
-                    
-                except Exception as e:
-                    continue
-        
-        # If no results found, try a more direct approach for common US stocks
-        if not results and len(query) <= 5:
-            try:
-                # Try the exact ticker symbol with chart endpoint
-                url = f"https://query1.finance.yahoo.com/v8/finance/chart/{query}"
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'application/json, text/plain, */*',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Connection': 'keep-alive',
-                    'Referer': 'https://finance.yahoo.com/',
-                    'Origin': 'https://finance.yahoo.com',
-                    'Cache-Control': 'no-cache',
-                    'Pragma': 'no-cache'
-                }
-                
-                response = requests.get(url, headers=headers, timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
-                        result = data['chart']['result'][0]
-                        meta = result.get('meta', {})
-                        
-                        if meta.get('regularMarketPrice') and meta.get('regularMarketPrice') > 0:
-                            symbol = meta.get('symbol', query)
-                            name = meta.get('shortName', meta.get('longName', query))
-                            
-                            results.append({
-                                'ticker': symbol,
-                                'name': name,
-                                'type': 'Stock' if 'ETF' not in name else 'ETF',
-                                'source': 'Yahoo Finance'
-                            })
-            except Exception as e:
-                pass
+                    result = _probe_search_candidate(pattern + exchange)
+                except (RateLimitExceeded, CircuitOpenError) as e:
+                    # Out of quota or Yahoo is failing; the remaining candidates would fail too
+                    print(f"Stopped probing search candidates: {e}")
+                    return results
+                if result:
+                    results.append(result)
         
         return results
         
@@ -689,46 +660,120 @@ def _search_yahoo_finance(query: str) -> List[Dict]:
         print(f"Yahoo Finance search error: {e}")
         return []
 
+def _probe_search_candidate(ticker: str) -> Optional[Dict]:
+    """
+    Search result for one candidate symbol, or None if it does not exist.
+    Upstream probes share Yahoo's rate limit and circuit breaker, and raise
+    RateLimitExceeded or CircuitOpenError when either stops them.
+    """
+    known = ticker_index.lookup(ticker)
+    if known is False:
+        return None
+    if known:
+        info = ticker_index.get(ticker)
+        if info and info.get('name'):
+            return _search_result(ticker, info['name'])
+    
+    try:
+        # Any answer, including "no such symbol", means Yahoo is healthy
+        return call_with_rate_limit(
+            'yahoo',
+            partial(call_with_breaker, 'yahoo', partial(_fetch_search_candidate, ticker), lambda result: True)
+        )
+    except (RateLimitExceeded, CircuitOpenError):
+        raise
+    except Exception:
+        return None
+
+def _fetch_search_candidate(ticker: str) -> Optional[Dict]:
+    """Probe Yahoo for one candidate symbol; raises on errors that say nothing about the symbol"""
+    # Try to get stock info using a more reliable endpoint
+    url = f"{YAHOO_FINANCE_BASE_URL}/v8/finance/chart/{ticker}"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'application/json, text/plain, */*',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Referer': 'https://finance.yahoo.com/',
+        'Origin': 'https://finance.yahoo.com',
+        'Cache-Control': 'no-cache',
+        'Pragma': 'no-cache'
+    }
+    
+    response = http_client.get(url, headers=headers, timeout=5)
+    if response.status_code == 404:
+        ticker_index.mark_invalid(ticker)
+        return None
+    response.raise_for_status()
+    
+    data = response.json()
+    if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
+        result = data['chart']['result'][0]
+        meta = result.get('meta', {})
+        
+        if meta.get('regularMarketPrice') and meta.get('regularMarketPrice') > 0:
+            symbol = meta.get('symbol', ticker)
+            name = meta.get('shortName', meta.get('longName', ticker))
+            ticker_index.mark_valid(symbol, name, meta.get('currency'))
+            return _search_result(symbol, name)
+    
+    # Answered, but without a price: nothing tradable under this symbol
+    ticker_index.mark_invalid(ticker)
+    return None
+
+def _search_result(ticker: str, name: str) -> Dict:
+    return {
+        'ticker': ticker,
+        'name': name,
+        'type': 'Stock' if 'ETF' not in name else 'ETF',
+        'source': 'Yahoo Finance'
+    }
+
 def _search_alpha_vantage(query: str) -> List[Dict]:
     """
-    Search Alpha Vantage for stocks and ETFs (fallback)
+    Search Alpha Vantage for stocks and ETFs (fallback), within its rate limit and circuit breaker
     """
     try:
-        # Alpha Vantage API key (free tier)
-        api_key = "demo"  # Using demo key for testing
-        
-        # Search for the query
-        url = f"https://www.alphavantage.co/query?function=SYMBOL_SEARCH&keywords={query}&apikey={api_key}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            
-            results = []
-            if 'bestMatches' in data:
-                for match in data['bestMatches'][:5]:  # Limit to 5 results
-                    symbol = match.get('1. symbol', '')
-                    name = match.get('2. name', '')
-                    type_info = match.get('3. type', '')
-                    region = match.get('4. region', '')
-                    
-                    if symbol and name:
-                        results.append({
-                            'ticker': symbol,
-                            'name': name,
-                            'type': 'Stock' if 'Equity' in type_info else 'ETF',
-                            'source': 'Alpha Vantage'
-                        })
-            
-            return results
-            
+        return call_with_rate_limit(
+            'alpha_vantage',
+            partial(call_with_breaker, 'alpha_vantage', partial(_fetch_alpha_vantage_matches, query), lambda results: True)
+        )
     except Exception as e:
         print(f"Alpha Vantage search error: {e}")
         return []
 
+def _fetch_alpha_vantage_matches(query: str) -> List[Dict]:
+    # Alpha Vantage API key (free tier)
+    api_key = "demo"  # Using demo key for testing
+    
+    # Search for the query
+    url = f"https://www.alphavantage.co/query?function=SYMBOL_SEARCH&keywords={query}&apikey={api_key}"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+    
+    response = http_client.get(url, headers=headers, timeout=5)
+    response.raise_for_status()
+    data = response.json()
+    if 'Note' in data or 'Information' in data:
+        # Quota messages are not search results
+        raise Exception(data.get('Note') or data.get('Information'))
+    
+    results = []
+    for match in data.get('bestMatches', [])[:5]:  # Limit to 5 results
+        symbol = match.get('1. symbol', '')
+        name = match.get('2. name', '')
+        type_info = match.get('3. type', '')
+        
+        if symbol and name:
+            results.append({
+                'ticker': symbol,
+                'name': name,
+                'type': 'Stock' if 'Equity' in type_info else 'ETF',
+                'source': 'Alpha Vantage'
+            })
+    
+    return results
+
 def _remove_duplicates(results: List[Dict]) -> List[Dict]:
     """Remove duplicate results based on ticker"""
     seen = set()
@@ -0,0 +1,275 @@
+import csv
+import io
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from services.circuit_breaker import CircuitOpenError, call_with_breaker
+from services.currency_converter import FX_PIVOT_CURRENCY, get_exchange_rate
+from services.http_client import http_client
+from services.rate_limiter import acquire
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Offline reference file in the ECB format (eurofxref-hist.csv: Date,USD,JPY,...), read-only
+FX_HISTORY_CSV_PATH = os.getenv('FX_HISTORY_CSV_PATH', os.path.join(_DATA_DIR, 'eurofxref-hist.csv'))
+# Rates fetched since the reference file was made, kept in the same format
+FX_HISTORY_STORE_PATH = os.getenv('FX_HISTORY_STORE_PATH', os.path.join(_DATA_DIR, 'fx_history.csv'))
+# Daily rates for the days missing from the store are fetched from here (ECB data, base EUR)
+FX_HISTORY_URL = os.getenv('FX_HISTORY_URL', 'https://api.frankfurter.app')
+FX_HISTORY_REFRESH_HOURS = float(os.getenv('FX_HISTORY_REFRESH_HOURS', '12'))
+# A trade this many days past the last stored rate is converted at the current rate instead
+FX_HISTORY_MAX_GAP_DAYS = int(os.getenv('FX_HISTORY_MAX_GAP_DAYS', '7'))
+# How far back the first top-up reaches when there is no reference file
+FX_HISTORY_INITIAL_DAYS = int(os.getenv('FX_HISTORY_INITIAL_DAYS', '3650'))
+
+_EPOCH = date(1970, 1, 1)
+# Dates that cannot be parsed map here, before any stored rate
+_NO_DAY = np.iinfo(np.int32).min
+
+def to_days(dates: Iterable) -> np.ndarray:
+    """Trade dates ('2024-03-01', '2024-03-01T10:00' or date objects) as days since 1970-01-01"""
+    days = []
+    for value in dates:
+        try:
+            if isinstance(value, date):
+                days.append((value - _EPOCH).days)
+            else:
+                days.append((date.fromisoformat(str(value).strip()[:10]) - _EPOCH).days)
+        except ValueError:
+            days.append(_NO_DAY)
+    return np.array(days, dtype=np.int64)
+
+def _parse_csv(text: str) -> Dict[str, Dict[int, float]]:
+    """ECB history CSV -> {currency: {day: units per EUR}}"""
+    rates: Dict[str, Dict[int, float]] = {}
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, None)
+    if not header:
+        return rates
+    currencies = [name.strip().upper() for name in header[1:]]
+    for row in reader:
+        if not row or not row[0].strip():
+            continue
+        try:
+            day = (date.fromisoformat(row[0].strip()) - _EPOCH).days
+        except ValueError:
+            continue
+        for currency, value in zip(currencies, row[1:]):
+            try:
+                rate = float(value)
+            except ValueError:
+                # N/A for currencies not quoted that day
+                continue
+            if currency and rate > 0:
+                rates.setdefault(currency, {})[day] = rate
+    return rates
+
+class _Series:
+    __slots__ = ('days', 'rates')
+
+    def __init__(self, points: Dict[int, float]):
+        days = sorted(points)
+        self.days = np.array(days, dtype=np.int32)
+        self.rates = np.array([points[day] for day in days], dtype=np.float64)
+
+    def lookup(self, days: np.ndarray, max_gap: int) -> np.ndarray:
+        """Rate in effect on each day (the last one on or before it); NaN where there is none close enough"""
+        index = np.searchsorted(self.days, days, side='right') - 1
+        clipped = np.maximum(index, 0)
+        found = (index >= 0) & (days - self.days[clipped] <= max_gap)
+        return np.where(found, self.rates[clipped], np.nan)
+
+class FxHistory:
+    """
+    Daily exchange rates against EUR, one date-indexed array per currency.
+
+    Bulk loaded from an offline ECB reference file plus the local store of
+    rates fetched since, then topped up in the background with only the
+    days missing. Any pair on any date is derived through EUR, so converting
+    a whole portfolio's cost basis is a few array lookups and no network calls.
+    """
+
+    def __init__(self, reference_path: str = FX_HISTORY_CSV_PATH, store_path: str = FX_HISTORY_STORE_PATH,
+                 max_gap: int = FX_HISTORY_MAX_GAP_DAYS):
+        self.reference_path = reference_path
+        self.store_path = store_path
+        self.max_gap = max_gap
+        self._series: Optional[Dict[str, _Series]] = None
+        self._fetched: Dict[str, Dict[int, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_top_up: Optional[float] = None
+        self.top_up_failures = 0
+
+    def _ensure_loaded(self) -> Dict[str, _Series]:
+        series = self._series
+        if series is not None:
+            return series
+        with self._lock:
+            if self._series is None:
+                self._load()
+            return self._series
+
+    def _read(self, path: str) -> Dict[str, Dict[int, float]]:
+        try:
+            with open(path, encoding='utf-8-sig') as f:
+                return _parse_csv(f.read())
+        except OSError:
+            return {}
+
+    def _load(self):
+        # Callers hold self._lock
+        points = self._read(self.reference_path)
+        self._fetched = self._read(self.store_path)
+        for currency, rates in self._fetched.items():
+            points.setdefault(currency, {}).update(rates)
+        self._publish(points)
+        print(f"Loaded FX history for {len(points)} currencies")
+
+    def _publish(self, points: Dict[str, Dict[int, float]]):
+        # A new dict is swapped in whole, so lookups never see a half-updated one
+        self._series = {currency: _Series(rates) for currency, rates in points.items() if rates}
+
+    def last_day(self) -> Optional[int]:
+        series = self._ensure_loaded()
+        return max((int(s.days[-1]) for s in series.values() if len(s.days)), default=None)
+
+    def rates(self, currency: str, days: np.ndarray) -> np.ndarray:
+        """Units of currency per EUR on each day, NaN where unknown"""
+        currency = currency.upper()
+        if currency == FX_PIVOT_CURRENCY:
+            return np.ones(len(days), dtype=np.float64)
+        series = self._ensure_loaded().get(currency)
+        if series is None:
+            return np.full(len(days), np.nan)
+        return series.lookup(days, self.max_gap)
+
+    def convert(self, amounts: Sequence[float], currencies: Sequence[str], dates: Sequence,
+                to_currency: str = 'EUR') -> np.ndarray:
+        """
+        Convert amounts, each in its own currency, at the rate of its own date.
+        Amounts on dates without a stored rate use the current rate, and are
+        NaN when there is none either.
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if not len(amounts):
+            return amounts
+        days = to_days(dates)
+        currency_codes, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        to_rates = self.rates(to_currency, days)
+        factors = np.empty(len(amounts), dtype=np.float64)
+        for code_index, currency in enumerate(currency_codes):
+            rows = inverse == code_index
+            if currency.upper() == to_currency.upper():
+                factors[rows] = 1.0
+                continue
+            factor = to_rates[rows] / self.rates(currency, days[rows])
+            missing = np.isnan(factor)
+            if missing.any():
+                factor[missing] = get_exchange_rate(currency.upper(), to_currency.upper()) or np.nan
+            factors[rows] = factor
+        return amounts * factors
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='fx-history', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.top_up()
+            except Exception as e:
+                print(f"FX history top-up failed: {e}")
+            self._stop.wait(FX_HISTORY_REFRESH_HOURS * 3600)
+
+    def top_up(self) -> int:
+        """Fetch the days missing since the last stored rate; returns the number of days added"""
+        self._ensure_loaded()
+        last = self.last_day()
+        today = date.today()
+        start = _EPOCH + timedelta(days=last + 1) if last is not None else today - timedelta(days=FX_HISTORY_INITIAL_DAYS)
+        if start > today:
+            return 0
+        if not acquire('frankfurter'):
+            return 0
+        try:
+            fetched = call_with_breaker('frankfurter', lambda: _fetch_range(start, today), lambda rates: rates is not None)
+        except CircuitOpenError:
+            return 0
+        except Exception as e:
+            self.top_up_failures += 1
+            print(f"Could not fetch FX history from {start}: {e}")
+            return 0
+        self.last_top_up = time.time()
+
+        with self._lock:
+            fetched = {currency: {day: rate for day, rate in rates.items() if last is None or day > last}
+                       for currency, rates in fetched.items()}
+            new_days = {day for rates in fetched.values() for day in rates}
+            if not new_days:
+                return 0
+            points = {currency: dict(zip(s.days.tolist(), s.rates.tolist())) for currency, s in self._series.items()}
+            for currency, rates in fetched.items():
+                self._fetched.setdefault(currency, {}).update(rates)
+                points.setdefault(currency, {}).update(rates)
+            self._publish(points)
+            self._save()
+        print(f"Added FX rates for {len(new_days)} days")
+        return len(new_days)
+
+    def _save(self):
+        # Callers hold self._lock
+        currencies = sorted(self._fetched)
+        days = sorted({day for rates in self._fetched.values() for day in rates}, reverse=True)
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        temp_path = f"{self.store_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Date'] + currencies)
+            for day in days:
+                writer.writerow([(_EPOCH + timedelta(days=day)).isoformat()] +
+                                [self._fetched[currency].get(day, 'N/A') for currency in currencies])
+        os.replace(temp_path, self.store_path)
+
+    def stats(self) -> Dict:
+        series = self._series or {}
+        last = max((int(s.days[-1]) for s in series.values() if len(s.days)), default=None)
+        return {
+            'loaded': self._series is not None,
+            'currencies': len(series),
+            'days': max((len(s.days) for s in series.values()), default=0),
+            'last_date': (_EPOCH + timedelta(days=last)).isoformat() if last is not None else None,
+            'last_top_up_age_seconds': round(time.time() - self.last_top_up) if self.last_top_up else None,
+            'top_up_failures': self.top_up_failures
+        }
+
+def _fetch_range(start: date, end: date) -> Optional[Dict[str, Dict[int, float]]]:
+    """Daily EUR rates between two dates from a Frankfurter compatible API"""
+    url = f"{FX_HISTORY_URL.rstrip('/')}/{start.isoformat()}..{end.isoformat()}?from={FX_PIVOT_CURRENCY}"
+    response = http_client.get(url)
+    response.raise_for_status()
+    data = response.json()
+    if 'rates' not in data:
+        return None
+    rates: Dict[str, Dict[int, float]] = {}
+    for day_text, day_rates in data['rates'].items():
+        day = (date.fromisoformat(day_text) - _EPOCH).days
+        for currency, rate in day_rates.items():
+            if rate and rate > 0:
+                rates.setdefault(currency.upper(), {})[day] = float(rate)
+    return rates
+
+# Global instance
+fx_history = FxHistory()
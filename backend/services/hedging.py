@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, List, Optional, Tuple
+
+# Upper bound on provider calls running at once across all hedged lookups.
+# Losing calls cannot be interrupted mid-request, so they keep a worker busy
+# until their own timeout expires.
+HEDGE_MAX_WORKERS = int(os.getenv('HEDGE_MAX_WORKERS', '16'))
+
+_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix='hedged-call')
+
+def hedged_first(calls: List[Tuple[str, Callable[[], Any]]],
+                 hedge_delay: Callable[[str], float],
+                 is_valid: Callable[[Any], bool],
+                 on_error: Optional[Callable[[str, Exception], None]] = None) -> Tuple[Optional[str], Any]:
+    """
+    Run calls in order, starting the next one whenever the running ones have
+    not produced a valid result within hedge_delay(name_of_last_started) seconds,
+    or as soon as a call fails. Returns (name, result) of the first valid result,
+    or (None, None) if every call failed. Calls that have not started yet are
+    cancelled; calls already in flight are left to finish and their results ignored.
+    """
+    pending = {}
+    remaining = list(calls)
+    last_started = None
+
+    def _launch_next() -> bool:
+        nonlocal last_started
+        if not remaining:
+            return False
+        name, fn = remaining.pop(0)
+        pending[_executor.submit(fn)] = name
+        last_started = name
+        return True
+
+    _launch_next()
+    try:
+        while pending:
+            timeout = hedge_delay(last_started) if remaining else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Nobody answered within the hedge delay, start a backup request
+                _launch_next()
+                continue
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if on_error:
+                        on_error(name, e)
+                    result = None
+                if is_valid(result):
+                    return name, result
+
+            # Everything that finished was unusable, move on immediately
+            _launch_next()
+        return None, None
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from database import SessionLocal, PurchaseDB
+from services.history_store import HISTORY_DATA_DIR, backfill_ticker, is_up_to_date
+
+HISTORY_BACKFILL_CONCURRENCY = int(os.getenv('HISTORY_BACKFILL_CONCURRENCY', '4'))
+# Pick up a backfill that was interrupted by a crash or deploy when the API starts
+HISTORY_BACKFILL_RESUME_ON_STARTUP = os.getenv('HISTORY_BACKFILL_RESUME_ON_STARTUP', 'true').lower() == 'true'
+HISTORY_BACKFILL_STATE_FILE = os.getenv('HISTORY_BACKFILL_STATE_FILE', os.path.join(HISTORY_DATA_DIR, '_backfill.json'))
+
+class HistoryBackfill:
+    """
+    Tops up the history store for every distinct ticker in PurchaseDB,
+    fetching only the bars missing since each ticker's last stored bar.
+
+    Progress is written to a state file after every ticker, so a run that was
+    interrupted resumes with the tickers it had not finished.
+    """
+
+    def __init__(self, concurrency: int = HISTORY_BACKFILL_CONCURRENCY, state_file: str = HISTORY_BACKFILL_STATE_FILE):
+        self.concurrency = concurrency
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._state: Dict = self._load_state()
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        # Callers hold self._lock
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        temp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._state, f)
+        os.replace(temp_path, self.state_file)
+
+    def _load_tickers(self) -> List[str]:
+        db = SessionLocal()
+        try:
+            rows = db.query(PurchaseDB.ticker).distinct().all()
+            return sorted({row[0].upper().strip() for row in rows if row[0]})
+        finally:
+            db.close()
+
+    def is_interrupted(self) -> bool:
+        with self._lock:
+            return bool(self._state) and self._state.get('finished_at') is None
+
+    def run(self, tickers: Optional[List[str]] = None, resume: bool = True) -> Dict:
+        """
+        Backfill the given tickers (all held tickers by default) and return
+        the final status. With resume, an unfinished previous run is continued
+        instead of starting over.
+        """
+        with self._lock:
+            previous = self._state
+            if resume and previous and previous.get('finished_at') is None:
+                done = set(previous.get('done', []))
+                tickers = [t for t in previous.get('tickers', []) if t not in done]
+                print(f"Resuming history backfill with {len(tickers)} of {len(previous.get('tickers', []))} tickers left")
+            else:
+                previous = None
+
+        if tickers is None:
+            tickers = self._load_tickers()
+        tickers = [t.upper().strip() for t in tickers]
+
+        with self._lock:
+            if previous is None:
+                self._state = {
+                    'started_at': time.time(),
+                    'finished_at': None,
+                    'tickers': tickers,
+                    'done': [],
+                    'failed': {},
+                    'bars_added': 0
+                }
+            self._state['resumed_at'] = time.time() if previous else None
+            self._save_state()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='history-backfill') as executor:
+            list(executor.map(self._backfill_one, tickers))
+
+        with self._lock:
+            self._state['finished_at'] = time.time()
+            self._save_state()
+            print(f"History backfill finished: {len(self._state['done'])} tickers, "
+                  f"{self._state['bars_added']} new bars, {len(self._state['failed'])} failed")
+            return dict(self._state)
+
+    def _backfill_one(self, ticker: str):
+        added = 0
+        error = None
+        try:
+            if not is_up_to_date(ticker):
+                added = backfill_ticker(ticker)
+        except Exception as e:
+            error = str(e)
+            print(f"History backfill failed for {ticker}: {e}")
+
+        with self._lock:
+            if error is None:
+                self._state['done'].append(ticker)
+                self._state['failed'].pop(ticker, None)
+                self._state['bars_added'] += added
+            else:
+                # Failed tickers stay out of 'done' so a resumed run retries them
+                self._state['failed'][ticker] = error
+            self._save_state()
+
+    def start(self, tickers: Optional[List[str]] = None, resume: bool = True) -> bool:
+        """Run in a background thread; returns False if a run is already going"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(
+                target=self._run_safely, args=(tickers, resume), name='history-backfill', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run_safely(self, tickers: Optional[List[str]], resume: bool):
+        try:
+            self.run(tickers, resume)
+        except Exception as e:
+            print(f"History backfill stopped: {e}")
+
+    def status(self) -> Dict:
+        with self._lock:
+            state = self._state
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'started_at': state.get('started_at'),
+                'finished_at': state.get('finished_at'),
+                'resumed_at': state.get('resumed_at'),
+                'tickers': len(state.get('tickers', [])),
+                'done': len(state.get('done', [])),
+                'failed': state.get('failed', {}),
+                'bars_added': state.get('bars_added', 0)
+            }
+
+# Global instance
+history_backfill = HistoryBackfill()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Backfill daily price history for held tickers')
+    parser.add_argument('tickers', nargs='*', help='Tickers to backfill (default: every ticker in purchases)')
+    parser.add_argument('--restart', action='store_true', help='Start over instead of resuming an unfinished run')
+    args = parser.parse_args()
+
+    status = history_backfill.run(args.tickers or None, resume=not args.restart)
+    print(json.dumps({key: status[key] for key in ('bars_added', 'failed')}, indent=2))
@@ -0,0 +1,329 @@
+import json
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from services.exchange_calendar import get_market
+from services.finance_api import fetch_daily_history
+from services.instrument_master import instrument_master
+from services.single_flight import get_single_flight
+from services.ticker_index import ticker_index
+
+HISTORY_DATA_DIR = os.getenv(
+    'HISTORY_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'history')
+)
+
+_EPOCH = date(1970, 1, 1)
+
+# Column name -> array typecode. Dates are int32 days since 1970-01-01.
+COLUMNS = (('date', 'i'), ('open', 'd'), ('high', 'd'), ('low', 'd'), ('close', 'd'), ('volume', 'd'))
+
+INTERVALS = ('1d', '1wk', '1mo')
+
+# (days_since_epoch, open, high, low, close, volume)
+Bar = Tuple[int, float, float, float, float, float]
+
+def to_day(value: date) -> int:
+    return (value - _EPOCH).days
+
+def from_day(day: int) -> date:
+    return _EPOCH + timedelta(days=day)
+
+# Letters, digits and . - ^ = _ as in BRK.B, ^GSPC or EURUSD=X; never starting with a dot
+_TICKER_PATTERN = re.compile(r'[A-Z0-9^=_-][A-Z0-9.^=_-]{0,19}')
+
+def validate_ticker(ticker: str) -> str:
+    """Normalized ticker, or ValueError when it is not a plausible symbol"""
+    ticker = ticker.upper().strip()
+    if not _TICKER_PATTERN.fullmatch(ticker):
+        raise ValueError(f'Invalid ticker: {ticker!r}')
+    return ticker
+
+def _ticker_dir_name(ticker: str) -> str:
+    # Tickers like ^GSPC or EURUSD=X must map to safe directory names
+    return ''.join(c if c.isalnum() or c in '.-' else f'_{ord(c):02x}' for c in validate_ticker(ticker))
+
+class _MappedSeries:
+    """Read-only memory-mapped columns of one ticker"""
+
+    def __init__(self, directory: str, committed_rows: Optional[int]):
+        self.columns: Dict[str, memoryview] = {}
+        rows = None
+        for name, typecode in COLUMNS:
+            path = os.path.join(directory, f'{name}.bin')
+            size = os.path.getsize(path)
+            itemsize = array(typecode).itemsize
+            count = size // itemsize
+            rows = count if rows is None else min(rows, count)
+            if count == 0:
+                self.columns[name] = memoryview(b'').cast(typecode)
+                continue
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # The views keep the mapping alive; it is unmapped once the last reader drops them
+            self.columns[name] = memoryview(mapped)[:count * itemsize].cast(typecode)
+        # Rows past the committed count belong to an append that never finished
+        self.rows = min(rows or 0, committed_rows) if committed_rows is not None else rows or 0
+        self.signature = self._signature(directory)
+
+    @staticmethod
+    def _signature(directory: str) -> Tuple:
+        names = [f'{name}.bin' for name, _ in COLUMNS] + ['meta.json']
+        return tuple(
+            os.stat(os.path.join(directory, name)).st_mtime_ns if os.path.exists(os.path.join(directory, name)) else 0
+            for name in names
+        )
+
+class HistoryStore:
+    """
+    Daily OHLCV bars per ticker, stored as one binary column file per field
+    (data/history/<TICKER>/<column>.bin) and memory-mapped for reads, so range
+    queries only touch the pages they need.
+
+    meta.json records the committed row count. Appends are fsynced before the
+    count is bumped, so bars from an append interrupted by a crash are ignored
+    and overwritten by the next one.
+    """
+
+    def __init__(self, root: str = HISTORY_DATA_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._series: Dict[str, _MappedSeries] = {}
+        self._write_locks: Dict[str, threading.Lock] = {}
+
+    def _dir(self, ticker: str) -> str:
+        return os.path.join(self.root, _ticker_dir_name(ticker))
+
+    def _open(self, ticker: str) -> Optional[_MappedSeries]:
+        directory = self._dir(ticker)
+        if not os.path.exists(os.path.join(directory, 'date.bin')):
+            return None
+        key = ticker.upper().strip()
+        with self._lock:
+            series = self._series.get(key)
+            # Another worker process may have written since we mapped the files
+            if series is not None and series.signature == _MappedSeries._signature(directory):
+                return series
+            # Requests may still be reading the old mapping, so it is replaced but never closed
+            series = self._series[key] = _MappedSeries(directory, self.read_meta(ticker).get('rows'))
+            return series
+
+    def row_count(self, ticker: str) -> int:
+        series = self._open(ticker)
+        return series.rows if series else 0
+
+    def last_day(self, ticker: str) -> Optional[int]:
+        series = self._open(ticker)
+        if not series or not series.rows:
+            return None
+        return series.columns['date'][series.rows - 1]
+
+    def read_meta(self, ticker: str) -> Dict:
+        try:
+            with open(os.path.join(self._dir(ticker), 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_meta(self, ticker: str, meta: Dict):
+        directory = self._dir(ticker)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f'meta.json.{os.getpid()}.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, os.path.join(directory, 'meta.json'))
+
+    @contextmanager
+    def _write_lock(self, ticker: str):
+        """Serialize writers of one ticker across threads and worker processes"""
+        directory = self._dir(ticker)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock_for(ticker):
+            with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lock_for(self, ticker: str) -> threading.Lock:
+        with self._lock:
+            return self._write_locks.setdefault(ticker.upper().strip(), threading.Lock())
+
+    def append(self, ticker: str, bars: Sequence[Bar], meta: Optional[Dict] = None) -> int:
+        """
+        Append bars newer than the last stored one and merge meta into
+        meta.json; returns how many bars were written
+        """
+        with self._write_lock(ticker):
+            series = self._open(ticker)
+            rows = series.rows if series else 0
+            last = series.columns['date'][rows - 1] if rows else None
+            bars = sorted({bar[0]: bar for bar in bars if last is None or bar[0] > last}.values())
+
+            stored_meta = self.read_meta(ticker)
+            if bars:
+                directory = self._dir(ticker)
+                for index, (name, typecode) in enumerate(COLUMNS):
+                    path = os.path.join(directory, f'{name}.bin')
+                    with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+                        # Drop anything an interrupted append left past the committed rows
+                        f.truncate(rows * array(typecode).itemsize)
+                        f.seek(0, os.SEEK_END)
+                        array(typecode, (bar[index] for bar in bars)).tofile(f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                stored_meta['rows'] = rows + len(bars)
+                stored_meta['last_date'] = from_day(bars[-1][0]).isoformat()
+            elif 'rows' not in stored_meta:
+                stored_meta['rows'] = rows
+            stored_meta.update(meta or {})
+            stored_meta['updated_at'] = datetime.now(timezone.utc).isoformat()
+            self.write_meta(ticker, stored_meta)
+            return len(bars)
+
+    def query(self, ticker: str, start: Optional[date] = None, end: Optional[date] = None,
+              interval: str = '1d') -> List[Dict]:
+        """Bars between start and end (inclusive), resampled to 1d, 1wk or 1mo"""
+        series = self._open(ticker)
+        if not series or not series.rows:
+            return []
+
+        dates = series.columns['date'][:series.rows]
+        lo = bisect_left(dates, to_day(start)) if start else 0
+        hi = bisect_right(dates, to_day(end)) if end else series.rows
+        columns = {name: series.columns[name][lo:hi] for name, _ in COLUMNS}
+
+        if interval == '1d':
+            return [
+                {
+                    'date': from_day(columns['date'][i]).isoformat(),
+                    'open': columns['open'][i],
+                    'high': columns['high'][i],
+                    'low': columns['low'][i],
+                    'close': columns['close'][i],
+                    'volume': columns['volume'][i]
+                }
+                for i in range(hi - lo)
+            ]
+        return _resample(columns, hi - lo, interval)
+
+def _period_start(day: int, interval: str) -> date:
+    value = from_day(day)
+    if interval == '1wk':
+        return value - timedelta(days=value.weekday())
+    return value.replace(day=1)
+
+def _resample(columns: Dict[str, memoryview], rows: int, interval: str) -> List[Dict]:
+    bars = []
+    current = None
+    for i in range(rows):
+        period = _period_start(columns['date'][i], interval)
+        if current is None or current['date'] != period.isoformat():
+            current = {
+                'date': period.isoformat(),
+                'open': columns['open'][i],
+                'high': columns['high'][i],
+                'low': columns['low'][i],
+                'close': columns['close'][i],
+                'volume': columns['volume'][i]
+            }
+            bars.append(current)
+            continue
+        current['high'] = max(current['high'], columns['high'][i])
+        current['low'] = min(current['low'], columns['low'][i])
+        current['close'] = columns['close'][i]
+        current['volume'] += columns['volume'][i]
+    return bars
+
+def _last_completed_session(ticker: str, now: datetime) -> Tuple[int, float]:
+    """
+    Day number of the most recent fully closed session and the epoch time it
+    closed. Symbols without a known exchange (FX, crypto) close at midnight UTC.
+    """
+    market = get_market(ticker)
+    if market is None:
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return to_day(midnight.date()) - 1, midnight.timestamp()
+    close = market.last_close(now)
+    return to_day(close.date()), close.timestamp()
+
+def is_up_to_date(ticker: str) -> bool:
+    """True when the store holds every completed session, or was checked since the last close"""
+    last = history_store.last_day(ticker)
+    if last is None:
+        return False
+    expected_day, closed_at = _last_completed_session(ticker, datetime.now(timezone.utc))
+    # Holidays we do not know about leave the last bar behind; a check after the close is enough
+    return last >= expected_day or history_store.read_meta(ticker).get('checked_at', 0) >= closed_at
+
+_backfill_flight = get_single_flight('history_backfill')
+
+def backfill_ticker(ticker: str) -> int:
+    """
+    Fetch only the bars missing since the last stored one (the full history
+    for a new ticker) and append them. Returns the number of new bars.
+    """
+    ticker = ticker.upper().strip()
+    return _backfill_flight.do(ticker, lambda: _backfill_ticker(ticker))
+
+def _backfill_ticker(ticker: str) -> int:
+    now = datetime.now(timezone.utc)
+    last = history_store.last_day(ticker)
+    period1 = (last + 1) * 86400 if last is not None else None
+    currency, bars = fetch_daily_history(ticker, period1)
+
+    # Today's bar keeps changing until the close, store completed sessions only
+    expected_day, _ = _last_completed_session(ticker, now)
+    bars = [bar for bar in bars if bar[0] <= expected_day]
+
+    meta = {'checked_at': now.timestamp()}
+    if currency:
+        meta['currency'] = currency
+    added = history_store.append(ticker, bars, meta)
+    if added:
+        print(f"Stored {added} new daily bars for {ticker}")
+    return added
+
+def get_history(ticker: str, start: Optional[date] = None, end: Optional[date] = None,
+                interval: str = '1d') -> Dict:
+    """
+    Serve a ticker's history from the local store. Bars missing since the
+    last stored one are fetched first (the full history on first use), for
+    symbols the ticker index or the instrument master knows only.
+    Raises ValueError for tickers that are not plausible symbols.
+    """
+    ticker = validate_ticker(ticker)
+    known = ticker_index.lookup(ticker) or instrument_master.get(ticker) is not None
+    if known and not is_up_to_date(ticker):
+        try:
+            backfill_ticker(ticker)
+        except Exception as e:
+            # Serve what we have; only fail when there is nothing stored at all
+            if history_store.row_count(ticker) == 0:
+                raise
+            print(f"Could not top up history for {ticker}: {e}")
+
+    return {
+        'ticker': ticker,
+        'interval': interval,
+        'currency': history_store.read_meta(ticker).get('currency'),
+        'bars': history_store.query(ticker, start, end, interval)
+    }
+
+# Global instance
+history_store = HistoryStore()
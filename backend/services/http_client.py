@@ -0,0 +1,134 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Number of per-host pools kept alive, and connections kept per host
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '16'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+# Per-host overrides, e.g. "query1.finance.yahoo.com=2:6,www.marketwatch.com=2:5"
+HTTP_HOST_TIMEOUTS = os.getenv('HTTP_HOST_TIMEOUTS', '')
+
+def _parse_host_timeouts(spec: str) -> Dict[str, Tuple[float, float]]:
+    timeouts = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        host, values = item.split('=', 1)
+        try:
+            connect, read = values.split(':', 1)
+            timeouts[host.strip().lower()] = (float(connect), float(read))
+        except ValueError:
+            print(f"Ignoring invalid HTTP_HOST_TIMEOUTS entry: {item}")
+    return timeouts
+
+class _ConnectionMetrics:
+    """Counts requests and newly opened connections per host"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.new_connections: Dict[str, int] = {}
+
+    def record_request(self, host: str):
+        with self._lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+
+    def record_new_connection(self, host: str):
+        with self._lock:
+            self.new_connections[host] = self.new_connections.get(host, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            hosts = {}
+            for host, count in self.requests.items():
+                opened = self.new_connections.get(host, 0)
+                hosts[host] = {
+                    'requests': count,
+                    'new_connections': opened,
+                    'reused_connections': max(count - opened, 0)
+                }
+            total_requests = sum(self.requests.values())
+            total_new = sum(self.new_connections.values())
+            return {
+                'requests': total_requests,
+                'new_connections': total_new,
+                'reused_connections': max(total_requests - total_new, 0),
+                'reuse_rate': round(1 - total_new / total_requests, 4) if total_requests else 0.0,
+                'hosts': hosts
+            }
+
+_metrics = _ConnectionMetrics()
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _metrics.record_new_connection(self.host)
+        return super()._new_conn()
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _metrics.record_new_connection(self.host)
+        return super()._new_conn()
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report new connections"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        _metrics.record_request(urlparse(request.url).hostname or '')
+        return super().send(request, **kwargs)
+
+class HttpClient:
+    """
+    Shared outbound HTTP client.
+
+    All threads share one keep-alive pool per host (urllib3 pools are thread
+    safe), while each thread gets its own lightweight Session so cookies and
+    headers never leak between concurrent requests.
+    """
+
+    def __init__(self, pool_connections: int = HTTP_POOL_CONNECTIONS, pool_maxsize: int = HTTP_POOL_MAXSIZE):
+        self._adapter = _PooledAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self._local = threading.local()
+        self.default_timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        self.host_timeouts = _parse_host_timeouts(HTTP_HOST_TIMEOUTS)
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+            self._local.session = session
+        return session
+
+    def timeout_for(self, url: str) -> Tuple[float, float]:
+        host = (urlparse(url).hostname or '').lower()
+        return self.host_timeouts.get(host, self.default_timeout)
+
+    def request(self, method: str, url: str, timeout: Optional[object] = None, **kwargs) -> requests.Response:
+        if timeout is None:
+            timeout = self.timeout_for(url)
+        return self._session().request(method, url, timeout=timeout, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def stats(self) -> Dict:
+        return _metrics.snapshot()
+
+# Global instance
+http_client = HttpClient()
@@ -0,0 +1,358 @@
+import csv
+import heapq
+import io
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from services.http_client import http_client
+from services.trigram_index import TrigramIndex
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Bundled list of symbols, names, exchanges, types, currencies, aliases and demo price ranges
+INSTRUMENTS_CSV_PATH = os.getenv('INSTRUMENTS_CSV_PATH', os.path.join(_DATA_DIR, 'instruments.csv'))
+# Optional larger list in the same format, downloaded at startup and merged over the bundled one
+INSTRUMENTS_CSV_URL = os.getenv('INSTRUMENTS_CSV_URL', '')
+INSTRUMENTS_DOWNLOAD_PATH = os.getenv('INSTRUMENTS_DOWNLOAD_PATH', os.path.join(_DATA_DIR, 'instruments.downloaded.csv'))
+INSTRUMENTS_REFRESH_HOURS = float(os.getenv('INSTRUMENTS_REFRESH_HOURS', '24'))
+
+# Match scores; anything at or above CONFIDENT_MATCH_SCORE needs no upstream search
+EXACT_SYMBOL_SCORE = 100
+EXACT_BASE_SYMBOL_SCORE = 95
+SYMBOL_PREFIX_SCORE = 90
+EXACT_NAME_SCORE = 85
+NAME_PREFIX_SCORE = 80
+WORD_PREFIX_SCORE = 70
+SUBSTRING_SCORE = 50
+# Fuzzy (trigram) matches score between SUBSTRING_SCORE and WORD_PREFIX_SCORE by similarity,
+# so a typo sharing at least half of the query's trigrams counts as confident
+FUZZY_SCORE_RANGE = WORD_PREFIX_SCORE - SUBSTRING_SCORE
+CONFIDENT_MATCH_SCORE = 60
+
+# Prefix and substring hits beyond this many are not worth ranking (e.g. every word starting with "a")
+_MAX_HITS = 1000
+
+class Instrument(NamedTuple):
+    symbol: str
+    name: str
+    exchange: Optional[str]
+    type: str
+    currency: Optional[str]
+    aliases: Tuple[str, ...]
+    # (low, high) in the listing currency for generated demo prices
+    mock_price_range: Optional[Tuple[float, float]] = None
+
+class Match(NamedTuple):
+    score: int
+    instrument: Instrument
+    # Found by the typo tolerant fallback rather than by prefix or substring
+    fuzzy: bool = False
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation, so "Nestlé S.A." matches "nestle sa" """
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+def finds_substrings(text: str) -> bool:
+    """Whether search() looks for substring matches of a normalized query"""
+    # TrigramIndex.containing needs a query word of three or more characters
+    return any(len(word) >= 3 for word in text.split())
+
+def _base_symbol(symbol: str) -> str:
+    # ASML.AS -> asml; share classes like BRK.A keep their own base
+    return symbol.split('.', 1)[0].lower()
+
+def _parse_csv(text: str) -> List[Instrument]:
+    instruments = []
+    reader = csv.DictReader(io.StringIO(text))
+    for row in reader:
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        symbol = row.get('symbol', '').upper()
+        if not symbol:
+            continue
+        try:
+            mock_price_range = (float(row['mock_price_low']), float(row['mock_price_high']))
+        except (KeyError, ValueError):
+            mock_price_range = None
+        instruments.append(Instrument(
+            symbol=symbol,
+            name=row.get('name') or symbol,
+            exchange=row.get('exchange') or None,
+            type=row.get('type') or 'Stock',
+            currency=row.get('currency', '').upper() or None,
+            aliases=tuple(alias.strip() for alias in row.get('aliases', '').split('|') if alias.strip()),
+            mock_price_range=mock_price_range
+        ))
+    return instruments
+
+def _prefix_range(keys: List[str], prefix: str) -> range:
+    lo = bisect_left(keys, prefix)
+    hi = bisect_left(keys, prefix + '\uffff', lo)
+    return range(lo, hi)
+
+def _capped(positions: range) -> range:
+    # Sorted keys, so the shortest completions of a prefix are kept
+    return positions[:_MAX_HITS]
+
+class _Index:
+    """Immutable sorted-array indexes over one instrument list"""
+
+    def __init__(self, instruments: List[Instrument]):
+        self.instruments = sorted(instruments, key=lambda i: i.symbol)
+        self.by_symbol = {instrument.symbol: i for i, instrument in enumerate(self.instruments)}
+
+        base: Dict[str, List[int]] = {}
+        symbol_entries = []
+        name_entries = []
+        word_entries = set()
+        self.words: List[Tuple[str, ...]] = []
+        search_texts = []
+        for i, instrument in enumerate(self.instruments):
+            symbol = instrument.symbol.lower()
+            symbol_entries.append((symbol, i))
+            base.setdefault(_base_symbol(symbol), []).append(i)
+            names = [normalize(instrument.name)] + [normalize(alias) for alias in instrument.aliases]
+            for name in names:
+                name_entries.append((name, i))
+                word_entries.update((word, i) for word in name.split())
+            self.words.append(tuple(word for name in names for word in name.split()))
+            search_texts.append([_base_symbol(symbol)] + names)
+
+        symbol_entries.sort()
+        name_entries.sort()
+        word_entries = sorted(word_entries)
+        self.base = base
+        self.symbol_keys = [key for key, _ in symbol_entries]
+        self.symbol_ids = [i for _, i in symbol_entries]
+        self.name_keys = [key for key, _ in name_entries]
+        self.name_ids = [i for _, i in name_entries]
+        self.word_keys = [key for key, _ in word_entries]
+        self.word_ids = [i for _, i in word_entries]
+
+        # Shorter names rank first among equally similar fuzzy matches
+        ranked = sorted(range(len(search_texts)), key=lambda i: (len(self.instruments[i].name), self.instruments[i].symbol))
+        self.trigrams = TrigramIndex([(text, i) for i in ranked for text in search_texts[i]])
+
+    def word_prefix_ids(self, words: List[str]) -> Set[int]:
+        """Instruments where every query word starts some word of the name or an alias"""
+        ranges = sorted(((_prefix_range(self.word_keys, word), word) for word in words), key=lambda item: len(item[0]))
+        positions, _ = ranges[0]
+        candidates = {self.word_ids[position] for position in _capped(positions)}
+        # Check the other words against the few candidates of the rarest one
+        for _, word in ranges[1:]:
+            candidates = {i for i in candidates if any(own.startswith(word) for own in self.words[i])}
+        return candidates
+
+class InstrumentMaster:
+    """
+    Local list of known instruments, searchable by symbol, name and alias
+    without any upstream call. The one place instrument knowledge lives:
+    search, suggestions, currency detection and demo prices all read it.
+
+    Loaded on first use from the bundled CSV, merged with the downloaded list
+    when INSTRUMENTS_CSV_URL is set. Lookups go through sorted arrays (bisect
+    for prefixes) and a trigram index, which finds substrings and, for queries
+    without a confident match, tolerates typos.
+    """
+
+    def __init__(self, csv_path: str = INSTRUMENTS_CSV_PATH, download_url: str = INSTRUMENTS_CSV_URL,
+                 download_path: str = INSTRUMENTS_DOWNLOAD_PATH, refresh_hours: float = INSTRUMENTS_REFRESH_HOURS):
+        self.csv_path = csv_path
+        self.download_url = download_url
+        self.download_path = download_path
+        self.refresh_hours = refresh_hours
+        self._lock = threading.Lock()
+        self._index: Optional[_Index] = None
+        self._thread: Optional[threading.Thread] = None
+        self.loaded_at = None
+        self.searches = 0
+        self.confident_searches = 0
+
+    def _ensure_loaded(self) -> _Index:
+        index = self._index
+        if index is not None:
+            return index
+        with self._lock:
+            if self._index is None:
+                self._index = self._load()
+            return self._index
+
+    def _load(self) -> _Index:
+        merged: Dict[str, Instrument] = {}
+        paths = [self.csv_path] + ([self.download_path] if self.download_url else [])
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    instruments = _parse_csv(f.read())
+            except (OSError, ValueError, csv.Error) as e:
+                print(f"Could not load instruments from {path}: {e}")
+                continue
+            for instrument in instruments:
+                known = merged.get(instrument.symbol)
+                if known is not None:
+                    # Later lists win, but keep the aliases and price ranges we curated
+                    aliases = tuple(dict.fromkeys(instrument.aliases + known.aliases))
+                    instrument = instrument._replace(
+                        aliases=aliases, mock_price_range=instrument.mock_price_range or known.mock_price_range
+                    )
+                merged[instrument.symbol] = instrument
+        self.loaded_at = time.time()
+        print(f"Loaded {len(merged)} instruments")
+        return _Index(list(merged.values()))
+
+    def reload(self):
+        index = self._load()
+        with self._lock:
+            self._index = index
+
+    def start(self):
+        """
+        Build the index in the background so the first search does not pay for
+        it, then keep the configured download fresh
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='instrument-master', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self._ensure_loaded()
+        while self.download_url:
+            if self._is_stale():
+                try:
+                    self.download()
+                except Exception as e:
+                    print(f"Could not download instrument list: {e}")
+            # Failed downloads are retried within the hour
+            time.sleep(min(3600, self.refresh_hours * 3600))
+
+    def _is_stale(self) -> bool:
+        if not os.path.exists(self.download_path):
+            return True
+        return time.time() - os.path.getmtime(self.download_path) >= self.refresh_hours * 3600
+
+    def download(self):
+        response = http_client.get(self.download_url, timeout=30)
+        response.raise_for_status()
+        if not _parse_csv(response.text):
+            raise ValueError('no instruments in download')
+        os.makedirs(os.path.dirname(self.download_path), exist_ok=True)
+        temp_path = f"{self.download_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        os.replace(temp_path, self.download_path)
+        self.reload()
+
+    def get(self, symbol: str) -> Optional[Instrument]:
+        index = self._ensure_loaded()
+        i = index.by_symbol.get(symbol.upper().strip())
+        return index.instruments[i] if i is not None else None
+
+    def search(self, query: str, limit: int = 15) -> List[Match]:
+        """Best local matches for a symbol, name or alias query, highest score first"""
+        index = self._ensure_loaded()
+        symbol = query.strip().lower()
+        text = normalize(query)
+        if not symbol:
+            return []
+
+        scores: Dict[int, int] = {}
+        fuzzy: Set[int] = set()
+
+        def hit(i: int, score: int):
+            if score > scores.get(i, 0):
+                scores[i] = score
+
+        for position in _capped(_prefix_range(index.symbol_keys, symbol)):
+            hit(index.symbol_ids[position], EXACT_SYMBOL_SCORE if index.symbol_keys[position] == symbol else SYMBOL_PREFIX_SCORE)
+        for i in index.base.get(symbol, ()):
+            hit(i, EXACT_BASE_SYMBOL_SCORE)
+
+        if text:
+            for position in _capped(_prefix_range(index.name_keys, text)):
+                hit(index.name_ids[position], EXACT_NAME_SCORE if index.name_keys[position] == text else NAME_PREFIX_SCORE)
+
+            for i in index.word_prefix_ids(text.split()):
+                hit(i, WORD_PREFIX_SCORE)
+
+            # Substring hits rank last; only look when the better ones leave room
+            if len(scores) < limit and finds_substrings(text):
+                for i in index.trigrams.containing(text, _MAX_HITS):
+                    hit(i, SUBSTRING_SCORE)
+
+            if max(scores.values(), default=0) < CONFIDENT_MATCH_SCORE:
+                for i, similarity in index.trigrams.search(text, limit):
+                    score = SUBSTRING_SCORE + round(FUZZY_SCORE_RANGE * similarity)
+                    if score > scores.get(i, 0):
+                        scores[i] = score
+                        fuzzy.add(i)
+
+        best = heapq.nsmallest(
+            limit, scores.items(),
+            key=lambda item: (-item[1], len(index.instruments[item[0]].name), index.instruments[item[0]].symbol)
+        )
+        matches = [Match(score, index.instruments[i], i in fuzzy) for i, score in best]
+        self.searches += 1
+        if matches and matches[0].score >= CONFIDENT_MATCH_SCORE:
+            self.confident_searches += 1
+        return matches
+
+    def score(self, query: str, instrument: Instrument) -> int:
+        """
+        Score search() gives instrument for query without the fuzzy fallback,
+        or 0 when it does not match. Used to re-rank a known candidate set.
+        """
+        symbol = query.strip().lower()
+        text = normalize(query)
+        own = instrument.symbol.lower()
+        if own == symbol:
+            return EXACT_SYMBOL_SCORE
+        if _base_symbol(own) == symbol:
+            return EXACT_BASE_SYMBOL_SCORE
+        if own.startswith(symbol):
+            return SYMBOL_PREFIX_SCORE
+        if not text:
+            return 0
+
+        names = [normalize(instrument.name)] + [normalize(alias) for alias in instrument.aliases]
+        if text in names:
+            return EXACT_NAME_SCORE
+        if any(name.startswith(text) for name in names):
+            return NAME_PREFIX_SCORE
+        words = [word for name in names for word in name.split()]
+        if all(any(own_word.startswith(word) for own_word in words) for word in text.split()):
+            return WORD_PREFIX_SCORE
+        if finds_substrings(text) and any(text in name for name in [_base_symbol(own)] + names):
+            return SUBSTRING_SCORE
+        return 0
+
+    def stats(self) -> Dict:
+        index = self._index
+        return {
+            'instruments': len(index.instruments) if index else None,
+            'loaded_at': self.loaded_at,
+            'download_url': self.download_url or None,
+            'searches': self.searches,
+            'confident_searches': self.confident_searches
+        }
+
+def to_search_result(instrument: Instrument) -> Dict:
+    return {
+        'ticker': instrument.symbol,
+        'name': instrument.name,
+        'type': instrument.type,
+        'exchange': instrument.exchange,
+        'currency': instrument.currency,
+        'source': 'Local'
+    }
+
+# Global instance
+instrument_master = InstrumentMaster()
@@ -1,16 +1,174 @@
-﻿from typing import Dict, List, Optional
-from datetime import datetime
-from database import SessionLocal, PurchaseDB, InvestmentDB
-from services.finance_api import get_current_price
-from services.currency_converter import detect_currency_from_ticker
-from services.analytics import calculate_profit, calculate_profit_percentage
+﻿import os
+import time
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+from database import SessionLocal, PurchaseDB, InvestmentDB, UserDB
+from services.finance_api import get_current_prices
+from services.currency_converter import DEFAULT_REPORTING_CURRENCY, detect_currency_from_ticker, exchange_rates
+from services.fx_history import fx_history
+from services.price_refresher import price_refresher
+from services.quote_cache import quote_cache
 
-def get_investment_summary(ticker: str, user_id: str) -> Optional[Dict]:
+# Summaries never wait longer than this for prices; positions not priced in
+# time show their last known price marked stale, or none
+SUMMARY_PRICE_DEADLINE_SECONDS = float(os.getenv('SUMMARY_PRICE_DEADLINE_SECONDS', '1.5'))
+
+# ticker -> (price_data, quote time, stale, source)
+Quotes = Dict[str, Tuple[Optional[tuple], Optional[float], bool, Optional[str]]]
+
+def get_reporting_currency(db, user_id: str) -> str:
+    """The currency a user's summaries are reported in"""
+    currency = db.query(UserDB.reporting_currency).filter(UserDB.id == user_id).scalar()
+    return currency or DEFAULT_REPORTING_CURRENCY
+
+def _purchase_costs(purchases: List[PurchaseDB], reporting_currency: str) -> List[float]:
+    """
+    amount * price_per_share of every purchase in the reporting currency.
+    Purchase prices are in the instrument's own currency; each is converted at
+    its trade date's rate, all in one vectorized pass.
+    """
+    currencies = {ticker: detect_currency_from_ticker(ticker) for ticker in {p.ticker for p in purchases}}
+    return fx_history.convert(
+        [p.amount * p.price_per_share for p in purchases],
+        [currencies[p.ticker] for p in purchases],
+        [p.date for p in purchases],
+        reporting_currency
+    ).tolist()
+
+def _get_quotes(tickers: List[str]) -> Quotes:
+    """
+    Price tickers within SUMMARY_PRICE_DEADLINE_SECONDS. Tickers not priced in
+    time fall back to their last known quote, however old, marked stale.
+    """
+    try:
+        prices = get_current_prices(tickers, timeout=SUMMARY_PRICE_DEADLINE_SECONDS)
+    except Exception as e:
+        print(f'Batch price lookup failed: {e}')
+        prices = {}
+    
+    now = time.time()
+    quotes = {}
+    for ticker in tickers:
+        entry = quote_cache.peek(ticker)
+        price_data = prices.get(quote_cache.normalize(ticker))
+        if price_data is None and entry is not None:
+            price_data = entry.value
+        if price_data is None:
+            quotes[ticker] = (None, None, False, None)
+        else:
+            quotes[ticker] = (price_data, entry.fetched_at if entry else None,
+                              entry is not None and now >= entry.expires_at, entry.source if entry else None)
+    return quotes
+
+def _build_summary(ticker: str, purchases: List[PurchaseDB], cost_amounts: List[float],
+                   price_data: Optional[tuple], eur_rate: float, reporting_currency: str,
+                   quote_time: Optional[float] = None, stale: bool = False, source: Optional[str] = None) -> Dict:
+    """
+    Aggregate one ticker's purchases into a summary. cost_amounts are the
+    purchases' amount * price_per_share in the reporting currency, price_data
+    the (converted_price_eur, original_price, original_currency) quote or None,
+    and eur_rate the EUR to reporting currency rate, for the quote and the fees. quote_time and stale
+    describe the quote's age, source the provider it came from ('mock' for demo prices).
+    Amounts without an exchange rate to the reporting currency are NaN; the
+    summary then leaves them out and sets fx_unavailable.
+    """
+    fx_unavailable = eur_rate != eur_rate or any(cost != cost for cost in cost_amounts)
+    
+    # Calculate aggregated metrics
+    total_amount = sum(p.amount for p in purchases)
+    total_cost_amount = sum(cost_amounts)
+    # Fees are entered in EUR
+    total_costs = sum(p.costs for p in purchases) * eur_rate
+    
+    # Calculate average price (reporting currency, like current_price)
+    average_price = total_cost_amount / total_amount if total_amount > 0 else 0
+    
+    # Current price
+    if price_data is not None:
+        current_price = price_data[0] * eur_rate if price_data[0] is not None else None
+        original_price = price_data[1]  # Original price
+        original_currency = price_data[2]  # Original currency
+        
+        # Validate that current_price is not NaN
+        if current_price is not None and (current_price != current_price or current_price <= 0):
+            current_price = None
+            if not fx_unavailable:
+                print(f'Warning: Invalid current price for {ticker}: {price_data[0]}')
+    else:
+        current_price = None
+        original_price = None
+        original_currency = detect_currency_from_ticker(ticker)
+    
+    # Calculate current value and profit
+    total_value = None
+    total_profit = None
+    profit_percentage = None
+    
+    if current_price is not None and current_price > 0:
+        total_value = total_amount * current_price
+        total_cost = total_cost_amount + total_costs
+        total_profit = total_value - total_cost
+        profit_percentage = ((total_value - total_cost) / total_cost * 100) if total_cost > 0 else 0
+        
+        # Validate that we don't have NaN values
+        if total_value is not None and (total_value != total_value or total_value < 0):
+            total_value = None
+        if total_profit is not None and (total_profit != total_profit):
+            total_profit = None
+        if profit_percentage is not None and (profit_percentage != profit_percentage):
+            profit_percentage = None
+    
+    # Format purchases for response
+    purchase_list = []
+    for purchase in purchases:
+        purchase_list.append({
+            'id': purchase.id,
+            'ticker': purchase.ticker,
+            'amount': purchase.amount,
+            'price_per_share': purchase.price_per_share,
+            'date': purchase.date,
+            'costs': purchase.costs,
+            'created_at': purchase.created_at.isoformat()
+        })
+    
+    return {
+        'ticker': ticker,
+        'total_amount': round(total_amount, 2),
+        'average_price': round(average_price, 2) if average_price == average_price else None,
+        'total_costs': round(total_costs, 2) if total_costs == total_costs else None,
+        'current_price': current_price,
+        'original_price': original_price,
+        'total_value': round(total_value, 2) if total_value else None,
+        'total_profit': round(total_profit, 2) if total_profit else None,
+        'profit_percentage': round(profit_percentage, 2) if profit_percentage else None,
+        'original_currency': original_currency,
+        'currency': reporting_currency,
+        # Last known price served because a fresh one was not available in time
+        'stale': stale and current_price is not None,
+        'as_of': datetime.fromtimestamp(quote_time, timezone.utc).isoformat() if quote_time and current_price is not None else None,
+        'price_source': source if current_price is not None else None,
+        # No exchange rate to the reporting currency, so amounts that need one are missing
+        'fx_unavailable': fx_unavailable,
+        'purchases': purchase_list
+    }
+
+def _eur_rate(reporting_currency: str) -> float:
+    if reporting_currency == 'EUR':
+        return 1.0
+    return exchange_rates.matrix(('EUR', reporting_currency)).rate('EUR', reporting_currency)
+
+def get_investment_summary(ticker: str, user_id: str, price_data: Optional[tuple] = None,
+                           reporting_currency: Optional[str] = None) -> Optional[Dict]:
     """
-    Get aggregated summary for a specific ticker for a specific user
+    Get aggregated summary for a specific ticker for a specific user, with
+    prices and values in the user's reporting currency.
+    price_data may carry an already fetched (converted_price_eur, original_price, original_currency)
     """
     db = SessionLocal()
     try:
+        if reporting_currency is None:
+            reporting_currency = get_reporting_currency(db, user_id)
+        
         # Get all purchases for this ticker and user
         purchases = db.query(PurchaseDB).filter(
             PurchaseDB.ticker == ticker,
@@ -20,100 +178,50 @@ def get_investment_summary(ticker: str, user_id: str) -> Optional[Dict]:
         if not purchases:
             return None
         
-        # Calculate aggregated metrics
-        total_amount = sum(p.amount for p in purchases)
-        total_cost_amount = sum(p.amount * p.price_per_share for p in purchases)
-        total_costs = sum(p.costs for p in purchases)
-        
-        # Calculate average price
-        average_price = total_cost_amount / total_amount if total_amount > 0 else 0
-        
-        # Get current price
-        try:
-            current_price_data = get_current_price(ticker)
-            current_price = current_price_data[0]  # Converted price in EUR
-            original_price = current_price_data[1]  # Original price
-            original_currency = current_price_data[2]  # Original currency
-            
-            # Validate that current_price is not NaN
-            if current_price is not None and (current_price != current_price or current_price <= 0):
-                current_price = None
-                print(f'Warning: Invalid current price for {ticker}: {current_price_data[0]}')
-        except:
-            current_price = None
-            original_price = None
-            original_currency = detect_currency_from_ticker(ticker)
-        
-        # Calculate current value and profit
-        total_value = None
-        total_profit = None
-        profit_percentage = None
+        quote_time, stale, source = None, False, None
+        if price_data is None:
+            price_data, quote_time, stale, source = _get_quotes([ticker])[ticker]
         
-        if current_price is not None and current_price > 0:
-            total_value = total_amount * current_price
-            total_cost = total_cost_amount + total_costs
-            total_profit = total_value - total_cost
-            profit_percentage = ((total_value - total_cost) / total_cost * 100) if total_cost > 0 else 0
-            
-            # Validate that we don't have NaN values
-            if total_value is not None and (total_value != total_value or total_value < 0):
-                total_value = None
-            if total_profit is not None and (total_profit != total_profit):
-                total_profit = None
-            if profit_percentage is not None and (profit_percentage != profit_percentage):
-                profit_percentage = None
-        
-        # Format purchases for response
-        purchase_list = []
-        for purchase in purchases:
-            purchase_list.append({
-                'id': purchase.id,
-                'ticker': purchase.ticker,
-                'amount': purchase.amount,
-                'price_per_share': purchase.price_per_share,
-                'date': purchase.date,
-                'costs': purchase.costs,
-                'created_at': purchase.created_at.isoformat()
-            })
-        
-        return {
-            'ticker': ticker,
-            'total_amount': round(total_amount, 2),
-            'average_price': round(average_price, 2),
-            'total_costs': round(total_costs, 2),
-            'current_price': current_price,
-            'original_price': original_price,
-            'total_value': round(total_value, 2) if total_value else None,
-            'total_profit': round(total_profit, 2) if total_profit else None,
-            'profit_percentage': round(profit_percentage, 2) if profit_percentage else None,
-            'original_currency': original_currency,
-            'purchases': purchase_list
-        }
+        return _build_summary(ticker, purchases, _purchase_costs(purchases, reporting_currency),
+                              price_data, _eur_rate(reporting_currency), reporting_currency, quote_time, stale, source)
         
     finally:
         db.close()
 
 def get_all_investment_summaries(user_id: str) -> List[Dict]:
     """
-    Get aggregated summaries for all tickers for a specific user
+    Get aggregated summaries for all tickers for a specific user.
+    Two queries, one batched price lookup and one FX conversion pass however
+    many positions the user holds; summaries are assembled in memory.
     """
     db = SessionLocal()
     try:
-        # Get all unique tickers for this user
-        tickers = db.query(PurchaseDB.ticker).filter(
+        reporting_currency = get_reporting_currency(db, user_id)
+        purchases = db.query(PurchaseDB).filter(
             PurchaseDB.user_id == user_id
-        ).distinct().all()
-        ticker_list = [t[0] for t in tickers]
-        
-        summaries = []
-        for ticker in ticker_list:
-            summary = get_investment_summary(ticker, user_id)
-            if summary:
-                summaries.append(summary)
-        
-        return summaries
+        ).order_by(PurchaseDB.ticker, PurchaseDB.date).all()
     finally:
         db.close()
+    
+    if not purchases:
+        return []
+    
+    # Group purchases by ticker, keeping each purchase's converted cost alongside
+    positions: Dict[str, Tuple[List[PurchaseDB], List[float]]] = {}
+    for purchase, cost_amount in zip(purchases, _purchase_costs(purchases, reporting_currency)):
+        ticker_purchases, cost_amounts = positions.setdefault(purchase.ticker, ([], []))
+        ticker_purchases.append(purchase)
+        cost_amounts.append(cost_amount)
+    
+    # Price every ticker in one batched lookup, bounded by the summary deadline
+    quotes = _get_quotes(list(positions))
+    eur_rate = _eur_rate(reporting_currency)
+    
+    return [
+        _build_summary(ticker, ticker_purchases, cost_amounts, quotes[ticker][0], eur_rate, reporting_currency,
+                       *quotes[ticker][1:])
+        for ticker, (ticker_purchases, cost_amounts) in positions.items()
+    ]
 
 def add_purchase(purchase_data: Dict, user_id: str) -> Dict:
     """
@@ -133,6 +241,9 @@ def add_purchase(purchase_data: Dict, user_id: str) -> Dict:
         db.commit()
         db.refresh(purchase)
         
+        # Warm the quote cache for this ticker before the dashboard asks for it
+        price_refresher.track(purchase.ticker)
+        
         return {
             'id': purchase.id,
             'ticker': purchase.ticker,
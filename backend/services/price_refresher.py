@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from database import SessionLocal, PurchaseDB
+from services.finance_api import QUOTE_BATCH_SIZE, refresh_current_prices
+from services.quote_cache import quote_cache
+from services.ticker_index import ticker_index
+
+PRICE_REFRESHER_ENABLED = os.getenv('PRICE_REFRESHER_ENABLED', 'true').lower() == 'true'
+# Keep this below QUOTE_CACHE_TTL_SECONDS so held tickers never go stale
+PRICE_REFRESH_INTERVAL_SECONDS = float(os.getenv('PRICE_REFRESH_INTERVAL_SECONDS', '45'))
+# Number of batched upstream fetches running at once
+PRICE_REFRESH_CONCURRENCY = int(os.getenv('PRICE_REFRESH_CONCURRENCY', '2'))
+# Upstream budget: at most this many tickers are refreshed per cycle, soonest to expire first
+PRICE_REFRESH_MAX_TICKERS = int(os.getenv('PRICE_REFRESH_MAX_TICKERS', '200'))
+# Tickers no provider could price are retried after one interval, then twice as long each time, up to this
+PRICE_REFRESH_MAX_BACKOFF_SECONDS = float(os.getenv('PRICE_REFRESH_MAX_BACKOFF_SECONDS', '1800'))
+
+class PriceRefresher:
+    """
+    Background thread that keeps every held ticker's quote hot in the quote cache.
+
+    Each cycle it reads the distinct tickers in PurchaseDB, picks the ones whose
+    cached quote expires soonest (up to the per-cycle budget) and refreshes them
+    with batched upstream fetches. Newly tracked tickers wake the thread immediately.
+    Tickers that fail to price back off exponentially, and tickers the ticker
+    index knows to be invalid are skipped, so they do not crowd out the rest.
+    """
+
+    def __init__(self, interval: float = PRICE_REFRESH_INTERVAL_SECONDS, concurrency: int = PRICE_REFRESH_CONCURRENCY,
+                 max_tickers: int = PRICE_REFRESH_MAX_TICKERS, max_backoff: float = PRICE_REFRESH_MAX_BACKOFF_SECONDS):
+        self.interval = interval
+        self.concurrency = concurrency
+        self.max_tickers = max_tickers
+        self.max_backoff = max_backoff
+        self._tickers = set()
+        self._pending = set()
+        # ticker -> (consecutive failures, retry not before)
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.errors = 0
+        self.last_cycle_at: Optional[float] = None
+        self.last_cycle_seconds: Optional[float] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='price-refresher', daemon=True)
+        self._thread.start()
+        print(f"Price refresher started (every {self.interval}s, concurrency {self.concurrency}, budget {self.max_tickers} tickers)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def track(self, ticker: str):
+        """Start refreshing a ticker right away, e.g. after a purchase was added"""
+        key = quote_cache.normalize(ticker)
+        with self._lock:
+            self._tickers.add(key)
+            self._pending.add(key)
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_once()
+            except Exception as e:
+                print(f"Price refresh cycle failed: {e}")
+                with self._lock:
+                    self.errors += 1
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _load_tickers(self) -> List[str]:
+        db = SessionLocal()
+        try:
+            rows = db.query(PurchaseDB.ticker).distinct().all()
+            return [quote_cache.normalize(row[0]) for row in rows if row[0]]
+        finally:
+            db.close()
+
+    def _select_tickers(self) -> List[str]:
+        try:
+            held = self._load_tickers()
+        except Exception as e:
+            print(f"Price refresher could not load tickers: {e}")
+            held = []
+
+        with self._lock:
+            self._tickers.update(held)
+            pending = list(self._pending)
+            self._pending.clear()
+            now = time.time()
+            # Tickers backing off or known to be invalid wait; explicitly tracked (pending) ones never do
+            tickers = [t for t in self._tickers if self._failures.get(t, (0, 0.0))[1] <= now]
+        tickers = [t for t in tickers if ticker_index.lookup(t) is not False]
+
+        def expires_in(ticker: str) -> float:
+            entry = quote_cache.peek(ticker)
+            return entry.expires_at - now if entry else float('-inf')
+
+        # Only refresh quotes that would expire before the next cycle (quotes of
+        # closed markets stay valid until the open), soonest first within the budget
+        due = [t for t in tickers if t not in pending and expires_in(t) < self.interval]
+        due.sort(key=expires_in)
+        return (pending + due)[:max(self.max_tickers, len(pending))]
+
+    def refresh_once(self) -> int:
+        """Run one refresh cycle and return the number of refreshed tickers"""
+        started = time.perf_counter()
+        tickers = self._select_tickers()
+        chunks = [tickers[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(tickers), QUOTE_BATCH_SIZE)]
+
+        refreshed = 0
+        if chunks:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='price-refresh') as executor:
+                for result in executor.map(self._refresh_chunk, chunks):
+                    refreshed += result
+
+        self.cycles += 1
+        self.refreshed += refreshed
+        self.last_cycle_at = time.time()
+        self.last_cycle_seconds = round(time.perf_counter() - started, 3)
+        return refreshed
+
+    def _refresh_chunk(self, chunk: List[str]) -> int:
+        try:
+            prices = refresh_current_prices(chunk)
+        except Exception as e:
+            print(f"Price refresh failed for {len(chunk)} tickers: {e}")
+            with self._lock:
+                self.errors += 1
+            return 0
+
+        now = time.time()
+        with self._lock:
+            for ticker in chunk:
+                if ticker in prices:
+                    self._failures.pop(ticker, None)
+                    continue
+                failures = self._failures.get(ticker, (0, 0.0))[0] + 1
+                self._failures[ticker] = (failures, now + min(self.interval * 2 ** (failures - 1), self.max_backoff))
+        return len(prices)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            tracked = len(self._tickers)
+            backing_off = sum(1 for _, retry_at in self._failures.values() if retry_at > time.time())
+            errors = self.errors
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'interval_seconds': self.interval,
+            'concurrency': self.concurrency,
+            'max_tickers_per_cycle': self.max_tickers,
+            'tracked_tickers': tracked,
+            'cycles': self.cycles,
+            'refreshed_quotes': self.refreshed,
+            'backing_off_tickers': backing_off,
+            'errors': errors,
+            'last_cycle_at': self.last_cycle_at,
+            'last_cycle_seconds': self.last_cycle_seconds
+        }
+
+# Global instance
+price_refresher = PriceRefresher()
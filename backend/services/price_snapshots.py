@@ -0,0 +1,167 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from database import SessionLocal, PriceSnapshotDB, engine
+from services.quote_cache import CachedQuote, is_live_source, quote_cache
+
+PRICE_SNAPSHOTS_ENABLED = os.getenv('PRICE_SNAPSHOTS_ENABLED', 'true').lower() == 'true'
+PRICE_SNAPSHOT_FLUSH_SECONDS = float(os.getenv('PRICE_SNAPSHOT_FLUSH_SECONDS', '30'))
+# Flush early once this many tickers are waiting to be written
+PRICE_SNAPSHOT_BATCH_SIZE = int(os.getenv('PRICE_SNAPSHOT_BATCH_SIZE', '200'))
+# Snapshots older than this are not worth serving after a restart
+PRICE_SNAPSHOT_MAX_AGE_HOURS = float(os.getenv('PRICE_SNAPSHOT_MAX_AGE_HOURS', '168'))
+
+def _ensure_table():
+    # The API may be started without create_tables(), e.g. straight from the Procfile
+    PriceSnapshotDB.__table__.create(bind=engine, checkfirst=True)
+
+def _to_datetime(timestamp: float) -> datetime:
+    """Epoch seconds to the naive UTC datetimes used throughout the database"""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+def _to_timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+class PriceSnapshotWriter:
+    """
+    Persists live quotes to the price_snapshots table in batches.
+
+    Registered as a quote cache listener; only the latest quote per ticker is
+    kept in the buffer, and the buffer is written in one transaction every
+    flush interval or as soon as it reaches the batch size.
+    """
+
+    def __init__(self, flush_seconds: float = PRICE_SNAPSHOT_FLUSH_SECONDS, batch_size: int = PRICE_SNAPSHOT_BATCH_SIZE):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self._buffer: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listening = False
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+
+    def record(self, ticker: str, entry: CachedQuote):
+        # Restored snapshots are already persisted and demo or simulated prices must never be
+        if entry.restored or not is_live_source(entry.source):
+            return
+        converted_price, original_price, currency = entry.value
+        if not converted_price or not original_price:
+            return
+        row = {
+            'price': float(converted_price),
+            'original_price': float(original_price),
+            'currency': currency,
+            'source': entry.source,
+            'as_of': _to_datetime(entry.fetched_at)
+        }
+        with self._lock:
+            self._buffer[ticker] = row
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def start(self):
+        if not self._listening:
+            quote_cache.add_listener(self.record)
+            self._listening = True
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='price-snapshots', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered snapshots and return how many rows were written"""
+        with self._lock:
+            rows, self._buffer = self._buffer, {}
+        if not rows:
+            return 0
+
+        db = SessionLocal()
+        try:
+            _ensure_table()
+            existing = {
+                snapshot.ticker: snapshot
+                for snapshot in db.query(PriceSnapshotDB).filter(PriceSnapshotDB.ticker.in_(list(rows))).all()
+            }
+            for ticker, row in rows.items():
+                snapshot = existing.get(ticker)
+                if snapshot is None:
+                    db.add(PriceSnapshotDB(ticker=ticker, **row))
+                elif snapshot.as_of <= row['as_of']:
+                    for field, value in row.items():
+                        setattr(snapshot, field, value)
+            db.commit()
+            self.written += len(rows)
+            self.flushes += 1
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to write {len(rows)} price snapshots: {e}")
+            self.errors += 1
+            # Put the rows back unless a newer quote arrived meanwhile
+            with self._lock:
+                for ticker, row in rows.items():
+                    self._buffer.setdefault(ticker, row)
+            return 0
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            'buffered': buffered,
+            'written': self.written,
+            'flushes': self.flushes,
+            'errors': self.errors
+        }
+
+def load_price_snapshots(max_age_hours: float = PRICE_SNAPSHOT_MAX_AGE_HOURS) -> int:
+    """
+    Seed the quote cache with persisted snapshots so the first requests after a
+    restart are answered from memory. Snapshots keep their original as_of time
+    and are served as stale until a live quote replaces them.
+    """
+    db = SessionLocal()
+    try:
+        _ensure_table()
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        snapshots = db.query(PriceSnapshotDB).filter(PriceSnapshotDB.as_of >= cutoff).all()
+        loaded = 0
+        for snapshot in snapshots:
+            existing = quote_cache.peek(snapshot.ticker)
+            if existing is not None and not existing.restored:
+                continue
+            quote_cache.set(
+                snapshot.ticker,
+                (snapshot.price, snapshot.original_price, snapshot.currency),
+                fetched_at=_to_timestamp(snapshot.as_of),
+                source=snapshot.source,
+                restored=True
+            )
+            loaded += 1
+        print(f"Loaded {loaded} price snapshots")
+        return loaded
+    finally:
+        db.close()
+
+# Global instance
+price_snapshot_writer = PriceSnapshotWriter()
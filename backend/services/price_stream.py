@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from database import SessionLocal, PurchaseDB
+from services.currency_converter import DEFAULT_REPORTING_CURRENCY, convert_amounts, detect_currency_from_ticker
+from services.fx_history import fx_history
+from services.price_refresher import price_refresher
+from services.quote_cache import CachedQuote, quote_cache
+
+# Comment lines sent while idle so proxies keep the connection open and dead clients are noticed
+PRICE_STREAM_HEARTBEAT_SECONDS = float(os.getenv('PRICE_STREAM_HEARTBEAT_SECONDS', '15'))
+
+# ticker -> (shares held, total cost including fees, in the reporting currency)
+Positions = Dict[str, Tuple[float, float]]
+
+def load_positions(user_id: str, currency: str = DEFAULT_REPORTING_CURRENCY) -> Positions:
+    """Aggregate a user's purchases into shares and cost per ticker with one query"""
+    db = SessionLocal()
+    try:
+        purchases = db.query(PurchaseDB).filter(PurchaseDB.user_id == user_id).all()
+        tickers = [quote_cache.normalize(purchase.ticker) for purchase in purchases]
+        # Purchase prices are in each instrument's own currency, converted at their trade date
+        costs = fx_history.convert(
+            [purchase.amount * purchase.price_per_share for purchase in purchases],
+            [detect_currency_from_ticker(ticker) for ticker in tickers],
+            [purchase.date for purchase in purchases],
+            currency
+        ).tolist()
+        # Fees are entered in EUR
+        fees = convert_amounts([purchase.costs or 0 for purchase in purchases], ['EUR'] * len(purchases), currency).tolist()
+        positions: Dict[str, Tuple[float, float]] = {}
+        for ticker, purchase, cost_amount, fee in zip(tickers, purchases, costs, fees):
+            amount, cost = positions.get(ticker, (0.0, 0.0))
+            positions[ticker] = (amount + purchase.amount, cost + cost_amount + fee)
+        return positions
+    finally:
+        db.close()
+
+class _Subscriber:
+    """One connected client; only touched from its event loop's thread"""
+
+    def __init__(self, user_id: str, positions: Positions, loop: asyncio.AbstractEventLoop, currency: str,
+                 eur_rate: float = 1.0):
+        self.user_id = user_id
+        self.positions = positions
+        self.currency = currency
+        # EUR to reporting currency, looked up off the event loop when the client connected
+        self.eur_rate = eur_rate
+        self.loop = loop
+        self.pending: Dict[str, CachedQuote] = {}
+        self.wake = asyncio.Event()
+        # ticker -> (price, stale) last sent
+        self._sent: Dict[str, Tuple[float, bool]] = {}
+
+    def offer(self, ticker: str, entry: CachedQuote):
+        # Several updates of one ticker before the client catches up collapse into the latest
+        self.pending[ticker] = entry
+        self.wake.set()
+
+    def delta(self, ticker: str, entry: CachedQuote) -> Optional[Dict]:
+        """
+        Compact update for one position, or None if the client already has this price
+        with the same staleness.
+        Keys: t ticker, p price (reporting currency), op original price, c original currency,
+        v position value, pl profit/loss, pp profit %, ts quote time (epoch seconds),
+        s whether the quote is past its TTL or restored from a snapshot, src the provider it came from
+        """
+        price, original_price, currency = entry.value
+        stale = entry.restored or time.time() >= entry.expires_at
+        if not price or self._sent.get(ticker) == (price, stale):
+            return None
+        self._sent[ticker] = (price, stale)
+        price *= self.eur_rate
+
+        amount, cost = self.positions[ticker]
+        value = amount * price
+        profit = value - cost
+        return {
+            't': ticker,
+            'p': round(price, 4),
+            'op': original_price,
+            'c': currency,
+            'v': round(value, 2),
+            'pl': round(profit, 2),
+            'pp': round(profit / cost * 100, 2) if cost > 0 else 0,
+            'ts': int(entry.fetched_at),
+            's': stale,
+            'src': entry.source
+        }
+
+class PriceStreamBroker:
+    """
+    Fans quote cache updates out to connected price stream clients.
+
+    Registered as a quote cache listener, so every upstream refresh (usually the
+    background refresher's batched fetch) is pushed once to all subscribers
+    holding that ticker. Unchanged prices are not sent.
+    """
+
+    def __init__(self, heartbeat: float = PRICE_STREAM_HEARTBEAT_SECONDS):
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._by_ticker: Dict[str, Set[_Subscriber]] = {}
+        self._last: Dict[str, CachedQuote] = {}
+        self._listening = False
+        self.subscribers = 0
+        self.published = 0
+        self.unchanged = 0
+        self.deltas_sent = 0
+
+    def start(self):
+        if not self._listening:
+            quote_cache.add_listener(self.publish)
+            self._listening = True
+
+    def subscribe(self, user_id: str, positions: Positions, loop: asyncio.AbstractEventLoop,
+                  currency: str = DEFAULT_REPORTING_CURRENCY, eur_rate: float = 1.0) -> _Subscriber:
+        subscriber = _Subscriber(user_id, positions, loop, currency, eur_rate)
+        with self._lock:
+            for ticker in positions:
+                self._by_ticker.setdefault(ticker, set()).add(subscriber)
+            self.subscribers += 1
+        # Keep every streamed ticker hot; uncached ones are fetched right away
+        for ticker in positions:
+            price_refresher.track(ticker)
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber):
+        with self._lock:
+            for ticker in subscriber.positions:
+                holders = self._by_ticker.get(ticker)
+                if holders is not None:
+                    holders.discard(subscriber)
+                    if not holders:
+                        del self._by_ticker[ticker]
+            self.subscribers -= 1
+
+    def publish(self, ticker: str, entry: CachedQuote):
+        """Quote cache listener; called from whichever thread stored the quote"""
+        if entry.restored:
+            return
+        with self._lock:
+            last = self._last.get(ticker)
+            # An unchanged price is still sent once the previous quote went stale, to clear the stale mark
+            if last is not None and last.value[0] == entry.value[0] and time.time() < last.expires_at:
+                self.unchanged += 1
+                return
+            self._last[ticker] = entry
+            holders = list(self._by_ticker.get(ticker, ()))
+            self.published += 1
+
+        for subscriber in holders:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, ticker, entry)
+            except RuntimeError:
+                # Event loop already closed; the stream's cleanup will unsubscribe it
+                pass
+
+    async def stream(self, user_id: str, positions: Positions, is_disconnected,
+                     currency: str = DEFAULT_REPORTING_CURRENCY, eur_rate: float = 1.0) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for one client: a snapshot of all cached positions,
+        then delta events with only the positions whose price changed.
+        eur_rate converts the cached EUR prices to currency; it may need a
+        network call, so callers look it up outside the event loop.
+        """
+        subscriber = self.subscribe(user_id, positions, asyncio.get_running_loop(), currency, eur_rate)
+        try:
+            snapshot = []
+            for ticker in positions:
+                entry = quote_cache.peek(ticker)
+                if entry is not None:
+                    delta = subscriber.delta(ticker, entry)
+                    if delta:
+                        snapshot.append(delta)
+            yield self._event('snapshot', snapshot)
+
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.wake.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    yield ': keepalive\n\n'
+                    continue
+
+                subscriber.wake.clear()
+                pending, subscriber.pending = subscriber.pending, {}
+                deltas = [subscriber.delta(ticker, entry) for ticker, entry in pending.items()]
+                deltas = [delta for delta in deltas if delta]
+                if deltas:
+                    with self._lock:
+                        self.deltas_sent += len(deltas)
+                    yield self._event('delta', deltas)
+        finally:
+            self.unsubscribe(subscriber)
+
+    @staticmethod
+    def _event(name: str, data) -> str:
+        return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'subscribers': self.subscribers,
+                'streamed_tickers': len(self._by_ticker),
+                'published_updates': self.published,
+                'unchanged_updates': self.unchanged,
+                'deltas_sent': self.deltas_sent
+            }
+
+# Global instance
+price_stream = PriceStreamBroker()
@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .exchange_calendar import closed_quote_expiry
+from .quote_providers import get_source_provider
+
+# How long a quote is served without touching the network
+QUOTE_CACHE_TTL_SECONDS = float(os.getenv('QUOTE_CACHE_TTL_SECONDS', '60'))
+# How long past the TTL a quote may still be served while a background refresh runs
+QUOTE_CACHE_STALE_SECONDS = float(os.getenv('QUOTE_CACHE_STALE_SECONDS', '900'))
+QUOTE_CACHE_REFRESH_WORKERS = int(os.getenv('QUOTE_CACHE_REFRESH_WORKERS', '4'))
+# Stretch the TTL of quotes fetched after the close until the market reopens
+QUOTE_CACHE_MARKET_HOURS = os.getenv('QUOTE_CACHE_MARKET_HOURS', 'true').lower() == 'true'
+# Quotes that are not live market data (demo prices, the local simulator) expire this
+# quickly and never get the closed-market extension, so a real quote replaces them soon
+QUOTE_CACHE_FALLBACK_TTL_SECONDS = float(os.getenv('QUOTE_CACHE_FALLBACK_TTL_SECONDS', '15'))
+# Source of generated demo prices served when every provider fails
+MOCK_SOURCE = 'mock'
+
+def is_live_source(source: Optional[str]) -> bool:
+    """False for demo prices and providers that are not live (see QuoteProvider.live)"""
+    if source == MOCK_SOURCE:
+        return False
+    provider = get_source_provider(source)
+    return provider is None or provider.live
+
+class CachedQuote:
+    """A cached value together with the time it was fetched and where it came from"""
+    __slots__ = ('value', 'fetched_at', 'expires_at', 'source', 'restored')
+
+    def __init__(self, value: Any, fetched_at: float, expires_at: float, source: Optional[str] = None,
+                 restored: bool = False):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.source = source
+        # Restored entries (e.g. loaded from a snapshot at startup) are served
+        # as stale whatever their age, until a live quote replaces them
+        self.restored = restored
+
+class QuoteCache:
+    """
+    Process-wide quote cache keyed by normalized ticker.
+
+    Fresh entries are returned directly. Entries older than the TTL but still
+    inside the stale window are returned as well, and a background refresh is
+    scheduled so the next caller sees a fresh value.
+
+    An optional ttl_policy(ticker, fetched_at) may return a later expiry time
+    than fetched_at + ttl, e.g. the next market open for quotes fetched after
+    the close.
+
+    Fetch functions return (value, source). Listeners registered with
+    add_listener are called with (ticker, entry) after every set().
+    """
+
+    def __init__(self, ttl: float = QUOTE_CACHE_TTL_SECONDS, stale_ttl: float = QUOTE_CACHE_STALE_SECONDS,
+                 refresh_workers: int = QUOTE_CACHE_REFRESH_WORKERS,
+                 ttl_policy: Optional[Callable[[str, float], Optional[float]]] = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.ttl_policy = ttl_policy
+        self._entries: Dict[str, CachedQuote] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        # Notified whenever a background refresh finishes
+        self._refreshed = threading.Condition(self._lock)
+        self._listeners: List[Callable[[str, CachedQuote], None]] = []
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='quote-refresh')
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @staticmethod
+    def normalize(ticker: str) -> str:
+        return ticker.upper().strip()
+
+    def peek(self, ticker: str) -> Optional[CachedQuote]:
+        """Return the cached entry regardless of age, without touching counters"""
+        with self._lock:
+            return self._entries.get(self.normalize(ticker))
+
+    def get(self, ticker: str) -> Optional[Any]:
+        """Return a fresh cached value or None"""
+        entry = self.peek(ticker)
+        if entry and time.time() < entry.expires_at:
+            return entry.value
+        return None
+
+    def _expiry(self, key: str, fetched_at: float, source: Optional[str] = None) -> float:
+        if not is_live_source(source):
+            return fetched_at + min(self.ttl, QUOTE_CACHE_FALLBACK_TTL_SECONDS)
+        expires_at = fetched_at + self.ttl
+        if self.ttl_policy is not None:
+            try:
+                extended = self.ttl_policy(key, fetched_at)
+                if extended is not None:
+                    expires_at = max(expires_at, extended)
+            except Exception as e:
+                print(f"Quote TTL policy failed for {key}: {e}")
+        return expires_at
+
+    def set(self, ticker: str, value: Any, fetched_at: Optional[float] = None, source: Optional[str] = None,
+            restored: bool = False):
+        key = self.normalize(ticker)
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+        entry = CachedQuote(value, fetched_at, self._expiry(key, fetched_at, source), source, restored)
+        with self._lock:
+            self._entries[key] = entry
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(key, entry)
+            except Exception as e:
+                print(f"Quote cache listener failed for {key}: {e}")
+
+    def add_listener(self, listener: Callable[[str, CachedQuote], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def lookup(self, ticker: str):
+        """
+        Look up a ticker and classify the result as 'fresh', 'stale' or 'miss'.
+        Returns (value, state); value is None on a miss. Updates the counters.
+        """
+        key = self.normalize(ticker)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry.expires_at:
+                    self.hits += 1
+                    return entry.value, 'fresh'
+                if now < entry.expires_at + self.stale_ttl or entry.restored:
+                    self.stale_hits += 1
+                    return entry.value, 'stale'
+            self.misses += 1
+            return None, 'miss'
+
+    def get_or_fetch(self, ticker: str, fetch: Callable[[str], Tuple[Any, str]]) -> Any:
+        """
+        Serve from cache when possible, otherwise call fetch(ticker) and cache the result.
+        Stale entries are served immediately while fetch runs in the background.
+        """
+        key = self.normalize(ticker)
+        value, state = self.lookup(key)
+        if state == 'fresh':
+            return value
+        if state == 'stale':
+            self.refresh_in_background(key, fetch)
+            return value
+
+        value, source = fetch(key)
+        self.set(key, value, source=source)
+        return value
+
+    def refresh_in_background(self, ticker: str, fetch: Callable[[str], Tuple[Any, str]]):
+        """Schedule a background refresh unless one is already running for this ticker"""
+        key = self.normalize(ticker)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, fetch)
+
+    def refresh_many_in_background(self, tickers: List[str], fetch_many: Callable[[List[str]], Dict[str, Any]]):
+        """
+        Schedule one background refresh for several tickers at once.
+        fetch_many(tickers) must return {ticker: value}; it is responsible for
+        storing the results, e.g. by calling set().
+        """
+        with self._lock:
+            keys = [k for k in dict.fromkeys(self.normalize(t) for t in tickers) if k not in self._refreshing]
+            self._refreshing.update(keys)
+        if keys:
+            self._executor.submit(self._refresh_many, keys, fetch_many)
+
+    def _refresh_many(self, keys: List[str], fetch_many: Callable[[List[str]], Dict[str, Any]]):
+        try:
+            fetch_many(keys)
+            with self._lock:
+                self.refreshes += len(keys)
+        except Exception as e:
+            print(f"Background batch quote refresh failed for {len(keys)} tickers: {e}")
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(keys)
+                self._refreshed.notify_all()
+
+    def wait_for_refresh(self, tickers: List[str], timeout: float) -> Dict[str, Any]:
+        """
+        Wait up to timeout for the background refreshes running for tickers,
+        then return the fresh values cached for them by then
+        """
+        keys = list(dict.fromkeys(self.normalize(t) for t in tickers))
+        deadline = time.monotonic() + timeout
+        with self._refreshed:
+            while any(key in self._refreshing for key in keys):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._refreshed.wait(remaining)
+        results = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                results[key] = value
+        return results
+
+    def _refresh(self, key: str, fetch: Callable[[str], Tuple[Any, str]]):
+        try:
+            value, source = fetch(key)
+            self.set(key, value, source=source)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            print(f"Background quote refresh failed for {key}: {e}")
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+                self._refreshed.notify_all()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'restored_entries': sum(1 for entry in self._entries.values() if entry.restored),
+                'extended_entries': sum(1 for entry in self._entries.values() if entry.expires_at > entry.fetched_at + self.ttl),
+                'ttl_seconds': self.ttl,
+                'stale_seconds': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                'background_refreshes': self.refreshes,
+                'refresh_errors': self.refresh_errors,
+                'refreshing': len(self._refreshing)
+            }
+
+# Global instance
+quote_cache = QuoteCache(ttl_policy=closed_quote_expiry if QUOTE_CACHE_MARKET_HOURS else None)
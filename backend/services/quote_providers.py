@@ -0,0 +1,166 @@
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+# Comma-separated provider names, in fallback order
+QUOTE_PROVIDERS = os.getenv('QUOTE_PROVIDERS', 'yahoo,alpha_vantage,marketwatch,finnhub')
+
+# Local stand-in provider: simulated latency and failure injection
+LOCAL_QUOTE_LATENCY_MS = float(os.getenv('LOCAL_QUOTE_LATENCY_MS', '50'))
+LOCAL_QUOTE_JITTER_MS = float(os.getenv('LOCAL_QUOTE_JITTER_MS', '25'))
+LOCAL_QUOTE_FAILURE_RATE = float(os.getenv('LOCAL_QUOTE_FAILURE_RATE', '0'))
+# Daily volatility of the simulated random walk
+LOCAL_QUOTE_VOLATILITY = float(os.getenv('LOCAL_QUOTE_VOLATILITY', '0.02'))
+
+# Quotes from a provider's multi-symbol endpoint are stored with source '<name>_batch'
+BATCH_SOURCE_SUFFIX = '_batch'
+
+class QuoteProvider(ABC):
+    """
+    Common interface for upstream quote providers.
+
+    get_price returns the raw price in the instrument's own currency or None.
+    Providers that can quote many symbols in one request set supports_batch
+    and override get_prices. Providers whose None reliably means "unknown
+    symbol" (rather than also covering network errors) are authoritative.
+    Providers that do not serve real market data are not live.
+    """
+    name = 'provider'
+    supports_batch = False
+    authoritative = True
+    live = True
+
+    @abstractmethod
+    def get_price(self, ticker: str) -> Optional[float]:
+        """Raw price of one symbol, None when the provider does not know it"""
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, float]:
+        prices = {}
+        for ticker in tickers:
+            price = self.get_price(ticker)
+            if price and price > 0:
+                prices[ticker] = price
+        return prices
+
+class FunctionProvider(QuoteProvider):
+    """Adapts plain fetch functions to the provider interface"""
+
+    def __init__(self, name: str, get_price: Callable[[str], Optional[float]],
+                 get_prices: Optional[Callable[[List[str]], Dict[str, float]]] = None, authoritative: bool = True):
+        self.name = name
+        self._get_price = get_price
+        self._get_prices = get_prices
+        self.supports_batch = get_prices is not None
+        self.authoritative = authoritative
+
+    def get_price(self, ticker: str) -> Optional[float]:
+        return self._get_price(ticker)
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, float]:
+        if self._get_prices is None:
+            return super().get_prices(tickers)
+        return self._get_prices(tickers)
+
+class LocalSimulatorProvider(QuoteProvider):
+    """
+    In-process stand-in for an upstream quote API, for load tests and
+    benchmarks without network access. Prices follow a deterministic random
+    walk around base_price(ticker); every call sleeps for the configured
+    latency and fails with the configured probability.
+    """
+    name = 'local'
+    supports_batch = True
+    live = False
+
+    def __init__(self, base_price: Callable[[str], float], latency_ms: float = LOCAL_QUOTE_LATENCY_MS,
+                 jitter_ms: float = LOCAL_QUOTE_JITTER_MS, failure_rate: float = LOCAL_QUOTE_FAILURE_RATE,
+                 volatility: float = LOCAL_QUOTE_VOLATILITY):
+        self.base_price = base_price
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.volatility = volatility
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._base_prices: Dict[str, float] = {}
+        self.calls = 0
+        self.failures = 0
+
+    def simulate_call(self):
+        """Sleep for the simulated latency, then fail with the configured probability"""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) / 1000 if self.jitter_ms else self.latency_ms / 1000
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise Exception("Simulated provider failure")
+
+    def price_at(self, ticker: str, moment: Optional[float] = None) -> float:
+        """Deterministic simulated price of a ticker at a point in time"""
+        ticker = ticker.upper().strip()
+        with self._lock:
+            base = self._base_prices.get(ticker)
+        if base is None:
+            base = self.base_price(ticker)
+            with self._lock:
+                self._base_prices[ticker] = base
+        moment = time.time() if moment is None else moment
+        phase = zlib.crc32(ticker.encode()) % 1000
+        days = moment / 86400
+        # Sum of two waves gives a smooth, ticker-specific intraday and multi-day drift
+        drift = math.sin(days * 2 * math.pi + phase) * 0.5 + math.sin(days * 0.3 + phase) * 1.5
+        return round(base * (1 + self.volatility * drift), 4)
+
+    def get_price(self, ticker: str) -> Optional[float]:
+        self.simulate_call()
+        return self.price_at(ticker)
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, float]:
+        self.simulate_call()
+        return {ticker.upper().strip(): self.price_at(ticker) for ticker in tickers}
+
+_providers: Dict[str, QuoteProvider] = {}
+
+def register_provider(provider: QuoteProvider):
+    _providers[provider.name] = provider
+
+def get_provider(name: str) -> Optional[QuoteProvider]:
+    return _providers.get(name)
+
+def get_source_provider(source: Optional[str]) -> Optional[QuoteProvider]:
+    """Provider a quote source name refers to, for single and batch quotes alike"""
+    if not source:
+        return None
+    if source.endswith(BATCH_SOURCE_SUFFIX):
+        source = source[:-len(BATCH_SOURCE_SUFFIX)]
+    return _providers.get(source)
+
+def get_configured_providers() -> List[QuoteProvider]:
+    """Registered providers named in QUOTE_PROVIDERS, in configured order"""
+    providers = []
+    for name in QUOTE_PROVIDERS.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        provider = _providers.get(name)
+        if provider is None:
+            print(f"Warning: Unknown quote provider '{name}' in QUOTE_PROVIDERS")
+            continue
+        providers.append(provider)
+    return providers
+
+def get_batch_provider() -> Optional[QuoteProvider]:
+    """First configured provider that can quote many symbols per request"""
+    for provider in get_configured_providers():
+        if provider.supports_batch:
+            return provider
+    return None
@@ -0,0 +1,225 @@
+import os
+import struct
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Per-provider limits as "name=rate:burst", rate in requests per second.
+# Providers without an entry are not limited.
+RATE_LIMITS = os.getenv(
+    'RATE_LIMITS',
+    'yahoo=5:20,yahoo_batch=2:10,alpha_vantage=0.083:5,marketwatch=0.5:5,finnhub=1:30,'
+    'exchangerate_api=0.5:10,fixer=0.05:3,currencyapi=0.05:3,frankfurter=0.5:5'
+)
+# 'file' shares buckets between uvicorn worker processes, 'memory' keeps them per process
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'file')
+RATE_LIMIT_STATE_DIR = os.getenv('RATE_LIMIT_STATE_DIR', os.path.join(tempfile.gettempdir(), 'cac-rate-limits'))
+# How long callers that can afford to wait (batch and background fetches) wait for a token
+RATE_LIMIT_WAIT_SECONDS = float(os.getenv('RATE_LIMIT_WAIT_SECONDS', '2'))
+
+class RateLimitExceeded(Exception):
+    """Raised when a provider's bucket has no token available in time"""
+
+class TokenBucket(ABC):
+    """
+    Token bucket holding up to burst tokens, refilled at rate tokens per second.
+    Subclasses decide where the bucket state lives.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._stats_lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    @abstractmethod
+    def _take(self, count: float) -> float:
+        """Take count tokens if available; return 0, or the seconds until they will be"""
+
+    def acquire(self, timeout: float = 0.0) -> bool:
+        """
+        Take one token. With timeout 0 this fails fast; otherwise it waits until
+        a token is available as long as that is within the deadline.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take(1)
+            if wait <= 0:
+                with self._stats_lock:
+                    self.allowed += 1
+                return True
+            if time.monotonic() + wait > deadline:
+                with self._stats_lock:
+                    self.throttled += 1
+                return False
+            time.sleep(wait)
+            with self._stats_lock:
+                self.waited_seconds += wait
+
+    @abstractmethod
+    def available(self) -> float:
+        """Tokens that could be taken right now"""
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'available_tokens': round(self.available(), 2),
+                'allowed': self.allowed,
+                'throttled': self.throttled,
+                'waited_seconds': round(self.waited_seconds, 3)
+            }
+
+class MemoryTokenBucket(TokenBucket):
+    """Bucket state in process memory"""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        super().__init__(name, rate, burst)
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.time()
+
+    def _take(self, count: float) -> float:
+        with self._lock:
+            now = time.time()
+            self._tokens = self._refill(self._tokens, self._updated, now)
+            self._updated = now
+            if self._tokens >= count:
+                self._tokens -= count
+                return 0.0
+            return (count - self._tokens) / self.rate
+
+    def available(self) -> float:
+        with self._lock:
+            return self._refill(self._tokens, self._updated, time.time())
+
+class FileTokenBucket(TokenBucket):
+    """
+    Bucket state in a small file guarded by flock, so every worker process on
+    the host draws from the same bucket. The file holds two doubles: the token
+    count and the wall-clock time it was last updated.
+    """
+    _STATE = struct.Struct('dd')
+
+    def __init__(self, name: str, rate: float, burst: float, state_dir: str = RATE_LIMIT_STATE_DIR):
+        super().__init__(name, rate, burst)
+        self.path = os.path.join(state_dir, f"{name}.bucket")
+        # flock does not exclude threads sharing one descriptor
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+
+    def _open(self) -> int:
+        # Reopen after a fork so each process has its own open file description
+        if self._fd is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    def _read(self, fd: int, now: float) -> Tuple[float, float]:
+        data = os.pread(fd, self._STATE.size, 0)
+        if len(data) < self._STATE.size:
+            return self.burst, now
+        return self._STATE.unpack(data)
+
+    def _take(self, count: float) -> float:
+        with self._lock:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                tokens, updated = self._read(fd, now)
+                tokens = self._refill(tokens, updated, now)
+                wait = 0.0
+                if tokens >= count:
+                    tokens -= count
+                else:
+                    wait = (count - tokens) / self.rate
+                os.pwrite(fd, self._STATE.pack(tokens, now), 0)
+                return wait
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def available(self) -> float:
+        with self._lock:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                now = time.time()
+                tokens, updated = self._read(fd, now)
+                return self._refill(tokens, updated, now)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            rate, _, burst = value.partition(':')
+            rate = float(rate)
+            burst = float(burst) if burst else max(1.0, rate)
+        except ValueError:
+            print(f"Warning: Ignoring invalid rate limit '{item}'")
+            continue
+        if rate > 0:
+            limits[name.strip()] = (rate, burst)
+    return limits
+
+_limits = _parse_limits(RATE_LIMITS)
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def _use_file_backend() -> bool:
+    if RATE_LIMIT_BACKEND != 'file':
+        return False
+    if fcntl is None:
+        print("Warning: File rate limit backend needs fcntl, using per-process buckets")
+        return False
+    return True
+
+def get_rate_limiter(name: str) -> Optional[TokenBucket]:
+    """Return the bucket of a provider, or None when it is not rate limited"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None and name in _limits:
+            rate, burst = _limits[name]
+            if _use_file_backend():
+                bucket = FileTokenBucket(name, rate, burst)
+            else:
+                bucket = MemoryTokenBucket(name, rate, burst)
+            _buckets[name] = bucket
+        return bucket
+
+def acquire(name: str, timeout: float = 0.0) -> bool:
+    """Take a token for a provider call; unlimited providers always succeed"""
+    bucket = get_rate_limiter(name)
+    return bucket is None or bucket.acquire(timeout)
+
+def call_with_rate_limit(name: str, fn, timeout: float = 0.0):
+    """Run fn if the provider has a token within timeout, else raise RateLimitExceeded"""
+    if not acquire(name, timeout):
+        raise RateLimitExceeded(f"Rate limit reached for {name}")
+    return fn()
+
+def get_rate_limit_stats() -> Dict[str, Dict]:
+    with _buckets_lock:
+        names = list(dict.fromkeys(list(_limits) + list(_buckets)))
+    return {name: get_rate_limiter(name).stats() for name in names}
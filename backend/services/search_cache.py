@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.instrument_master import CONFIDENT_MATCH_SCORE, instrument_master
+from services.single_flight import get_single_flight
+
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '2000'))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv('SEARCH_CACHE_TTL_SECONDS', '300'))
+
+class _Entry:
+    __slots__ = ('results', 'complete', 'expires_at')
+
+    def __init__(self, results: List[Dict], complete: bool, expires_at: float):
+        self.results = results
+        # True when results hold every local match, so longer queries can be answered from them
+        self.complete = complete
+        self.expires_at = expires_at
+
+class SearchCache:
+    """
+    LRU cache of /search results keyed by normalized query, with a TTL.
+
+    Typeahead sends "a", "ap", "app", "appl"... When a shorter query's
+    result set was complete (every local match, no upstream or fuzzy
+    results), a longer query is answered by re-ranking that set instead of
+    searching again. Identical concurrent searches share one computation.
+    """
+
+    def __init__(self, size: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = get_single_flight('search')
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return ' '.join(query.lower().split())
+
+    def _get(self, key: str) -> Optional[_Entry]:
+        # Callers hold self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: str, results: List[Dict], complete: bool):
+        with self._lock:
+            self._entries[key] = _Entry(results, complete, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def search(self, query: str, compute: Callable[[str], Tuple[List[Dict], bool]]) -> List[Dict]:
+        """
+        Cached results for query. compute(query) returns (results, complete),
+        complete meaning results hold every match and nothing from upstream.
+        """
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None:
+                self.hits += 1
+                return list(entry.results)
+            prefix_entry = self._complete_prefix(key)
+
+        if prefix_entry is not None:
+            results = self._refine(query, prefix_entry.results)
+            if results is not None:
+                with self._lock:
+                    self.prefix_hits += 1
+                self._put(key, results, True)
+                return list(results)
+
+        with self._lock:
+            self.misses += 1
+
+        def run():
+            results, complete = compute(query)
+            self._put(key, results, complete)
+            return results
+
+        return list(self._flight.do(key, run))
+
+    def _complete_prefix(self, key: str) -> Optional[_Entry]:
+        # Callers hold self._lock; longest cached prefix first
+        for end in range(len(key) - 1, 0, -1):
+            entry = self._get(key[:end])
+            if entry is not None and entry.complete:
+                return entry
+        return None
+
+    @staticmethod
+    def _refine(query: str, results: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Results of a longer query: the cached matches that still match,
+        re-ranked. None when none of them is a confident match, since the
+        full search would then try typo tolerant and upstream matches.
+        """
+        scored = []
+        for result in results:
+            instrument = instrument_master.get(result['ticker'])
+            score = instrument_master.score(query, instrument) if instrument else 0
+            if score:
+                scored.append((-score, len(result['name']), result['ticker'], result))
+        scored.sort(key=lambda item: item[:3])
+        if not scored or -scored[0][0] < CONFIDENT_MATCH_SCORE:
+            return None
+        return [item[3] for item in scored]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.prefix_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'prefix_hits': self.prefix_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.prefix_hits) / lookups, 3) if lookups else None
+            }
+
+# Global instance
+search_cache = SearchCache()
@@ -1,14 +1,14 @@
-import requests
-import time
 from typing import Dict, Optional
+from .finance_api import YAHOO_FINANCE_BASE_URL, fetch_quote_batch
+from .http_client import http_client
+from .rate_limiter import RATE_LIMIT_WAIT_SECONDS, acquire
 
 class StockPriceService:
     def __init__(self):
-        self.base_url = "https://query1.finance.yahoo.com/v8/finance/chart/"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.base_url = f"{YAHOO_FINANCE_BASE_URL}/v8/finance/chart/"
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        }
     
     def get_stock_price(self, ticker: str) -> Optional[float]:
         """Get current stock price for a given ticker"""
@@ -28,7 +28,7 @@ class StockPriceService:
             yahoo_symbol = ticker_mapping.get(clean_ticker, clean_ticker)
             
             url = f"{self.base_url}{yahoo_symbol}"
-            response = self.session.get(url, timeout=10)
+            response = http_client.get(url, headers=self.headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -44,14 +44,29 @@ class StockPriceService:
             return None
     
     def get_batch_stock_prices(self, tickers: list) -> Dict[str, float]:
-        """Get current prices for multiple tickers"""
+        """Get current prices for multiple tickers, using multi-symbol requests where possible"""
         prices = {}
         
+        try:
+            batch_prices = fetch_quote_batch(tickers)
+        except Exception as e:
+            print(f"Batch price fetch failed: {e}")
+            batch_prices = {}
+        
         for ticker in tickers:
+            price = batch_prices.get(ticker.upper().strip())
+            if price is not None:
+                prices[ticker] = price
+                continue
+            
+            # Only symbols missing from the batch response are fetched one by one,
+            # within the shared Yahoo quota
+            if not acquire('yahoo', RATE_LIMIT_WAIT_SECONDS):
+                print(f"Yahoo quota exhausted, skipping {ticker}")
+                continue
             price = self.get_stock_price(ticker)
             if price is not None:
                 prices[ticker] = price
-            time.sleep(0.1)  # Rate limiting
         
         return prices
 
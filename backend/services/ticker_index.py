@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from database import SessionLocal, ValidTickerDB, engine
+from services.quote_cache import CachedQuote, is_live_source, quote_cache
+
+# How long a symbol every provider rejected is answered as invalid without asking again
+TICKER_NEGATIVE_TTL_SECONDS = float(os.getenv('TICKER_NEGATIVE_TTL_SECONDS', '21600'))
+TICKER_NEGATIVE_CACHE_SIZE = int(os.getenv('TICKER_NEGATIVE_CACHE_SIZE', '50000'))
+
+def _ensure_table():
+    # The API may be started without create_tables(), e.g. straight from the Procfile
+    ValidTickerDB.__table__.create(bind=engine, checkfirst=True)
+
+class TickerIndex:
+    """
+    Which symbols exist, answered from memory.
+
+    Confirmed symbols (with their name when known) are persisted in the
+    valid_tickers table and loaded on first use. Symbols every provider
+    rejected are kept in a bounded in-memory negative cache for a limited time,
+    since listings do change.
+    """
+
+    def __init__(self, negative_ttl: float = TICKER_NEGATIVE_TTL_SECONDS, negative_size: int = TICKER_NEGATIVE_CACHE_SIZE):
+        self.negative_ttl = negative_ttl
+        self.negative_size = negative_size
+        self._lock = threading.Lock()
+        self._valid: Dict[str, Dict] = {}
+        self._invalid: Dict[str, float] = {}
+        self._loaded = False
+        self._listening = False
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            db = SessionLocal()
+            try:
+                _ensure_table()
+                for row in db.query(ValidTickerDB).all():
+                    self._valid[row.ticker] = {'name': row.name, 'currency': row.currency}
+            except Exception as e:
+                print(f"Could not load known tickers: {e}")
+            finally:
+                db.close()
+            self._loaded = True
+
+    def start(self):
+        """Learn valid symbols from every real quote stored in the quote cache"""
+        if not self._listening:
+            quote_cache.add_listener(self.record_quote)
+            self._listening = True
+
+    def lookup(self, ticker: str) -> Optional[bool]:
+        """True for confirmed symbols, False for recently rejected ones, None when unknown"""
+        self._ensure_loaded()
+        key = quote_cache.normalize(ticker)
+        with self._lock:
+            if key in self._valid:
+                self.hits += 1
+                return True
+            expires_at = self._invalid.get(key)
+            if expires_at is not None:
+                if expires_at > time.time():
+                    self.negative_hits += 1
+                    return False
+                del self._invalid[key]
+            self.misses += 1
+            return None
+
+    def get(self, ticker: str) -> Optional[Dict]:
+        """Stored name and currency of a confirmed symbol"""
+        self._ensure_loaded()
+        with self._lock:
+            return self._valid.get(quote_cache.normalize(ticker))
+
+    def mark_valid(self, ticker: str, name: Optional[str] = None, currency: Optional[str] = None):
+        self._ensure_loaded()
+        key = quote_cache.normalize(ticker)
+        with self._lock:
+            self._invalid.pop(key, None)
+            known = self._valid.get(key)
+            if known is not None and (known['name'] or not name):
+                return
+            self._valid[key] = {'name': name, 'currency': currency or (known or {}).get('currency')}
+
+        db = SessionLocal()
+        try:
+            row = db.query(ValidTickerDB).filter(ValidTickerDB.ticker == key).first()
+            if row is None:
+                db.add(ValidTickerDB(ticker=key, name=name, currency=currency))
+            else:
+                row.name = row.name or name
+                row.currency = row.currency or currency
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Could not store known ticker {key}: {e}")
+        finally:
+            db.close()
+
+    def mark_invalid(self, ticker: str):
+        key = quote_cache.normalize(ticker)
+        now = time.time()
+        with self._lock:
+            if key in self._valid:
+                return
+            self._invalid[key] = now + self.negative_ttl
+            if len(self._invalid) > self.negative_size:
+                # Drop expired entries first, then the oldest ones
+                self._invalid = {k: v for k, v in self._invalid.items() if v > now}
+                while len(self._invalid) > self.negative_size:
+                    del self._invalid[next(iter(self._invalid))]
+
+    def record_quote(self, ticker: str, entry: CachedQuote):
+        # Demo and simulated prices prove nothing and restored snapshots were confirmed before
+        if entry.restored or entry.source is None or not is_live_source(entry.source):
+            return
+        with self._lock:
+            if ticker in self._valid:
+                return
+        self.mark_valid(ticker, currency=entry.value[2])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'known_valid': len(self._valid),
+                'known_invalid': len(self._invalid),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 3) if lookups else None
+            }
+
+# Global instance
+ticker_index = TickerIndex()
@@ -0,0 +1,115 @@
+import heapq
+import os
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+# Matches below this share of the query's trigrams are dropped
+SEARCH_FUZZY_MIN_SIMILARITY = float(os.getenv('SEARCH_FUZZY_MIN_SIMILARITY', '0.3'))
+# Posting lists longer than this (trigrams of "inc", "group", "etf"...) are only
+# counted when the rarer ones found nothing, and then only their best-ranked entries
+TRIGRAM_MAX_POSTING = int(os.getenv('TRIGRAM_MAX_POSTING', '5000'))
+# Documents rescored exactly after the posting lists have been counted
+TRIGRAM_CANDIDATES = int(os.getenv('TRIGRAM_CANDIDATES', '100'))
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of every word, padded like pg_trgm so word starts weigh more: "ab" -> "  a", " ab", "ab " """
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _padded(text: str) -> str:
+    # Every word padded the way trigrams() pads it; a trigram occurs in here iff it is one of the text's
+    return ''.join(f'  {word} ' for word in text.split())
+
+class TrigramIndex:
+    """
+    Inverted index from trigrams to documents, for typo tolerant search
+    ("nvidea", "volkswagon").
+
+    Documents are (text, value) pairs given in rank order, best first. Posting
+    lists keep that order, so truncating one keeps its best-ranked documents
+    and ties are settled by rank. Texts must already be normalized.
+    """
+
+    def __init__(self, documents: Sequence[Tuple[str, int]], max_posting: int = TRIGRAM_MAX_POSTING,
+                 candidates: int = TRIGRAM_CANDIDATES):
+        self.max_posting = max_posting
+        self.candidates = candidates
+        self.texts: List[str] = []
+        self.values = array('i')
+        self.sizes = array('i')
+        postings: Dict[str, array] = {}
+        for doc, (text, value) in enumerate(documents):
+            grams = trigrams(text)
+            self.texts.append(_padded(text))
+            self.values.append(value)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('i')
+                posting.append(doc)
+        self.postings = postings
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search(self, text: str, limit: int = 15, min_similarity: float = SEARCH_FUZZY_MIN_SIMILARITY) -> List[Tuple[int, float]]:
+        """
+        Best (value, similarity) pairs for a normalized query. Similarity is
+        the share of the query's trigrams found in the document; equal
+        similarities go to the document closer in length (higher Jaccard),
+        then to the better-ranked one.
+        """
+        query = trigrams(text)
+        if not query:
+            return []
+
+        posting_lists = sorted(((gram, self.postings.get(gram, ())) for gram in query), key=lambda item: len(item[1]))
+        counts: Counter = Counter()
+        skipped = []
+        for gram, posting in posting_lists:
+            if len(posting) > self.max_posting and counts:
+                skipped.append(gram)
+                continue
+            counts.update(posting[:self.max_posting])
+        if not counts:
+            return []
+
+        best: Dict[int, Tuple[float, float, int]] = {}
+        for doc, overlap in counts.most_common(self.candidates):
+            # Counts miss the skipped common trigrams, so check those directly
+            text = self.texts[doc]
+            overlap += sum(1 for gram in skipped if gram in text)
+            similarity = overlap / len(query)
+            if similarity < min_similarity:
+                continue
+            key = (similarity, overlap / (len(query) + self.sizes[doc] - overlap), -doc)
+            value = self.values[doc]
+            if value not in best or key > best[value]:
+                best[value] = key
+
+        top = heapq.nlargest(limit, best.items(), key=lambda item: item[1])
+        return [(value, round(key[0], 3)) for value, key in top]
+
+    def containing(self, text: str, max_hits: int) -> Iterator[int]:
+        """
+        Values of documents containing text as a substring. Only the posting
+        list of the rarest trigram inside a word is checked, so texts shorter
+        than three characters find nothing.
+        """
+        grams = {text[i:i + 3] for i in range(len(text) - 2)}
+        postings = [self.postings.get(gram, ()) for gram in grams if ' ' not in gram]
+        if not postings:
+            return
+        needle = '   '.join(text.split())
+        hits = 0
+        for doc in min(postings, key=len):
+            if needle in self.texts[doc]:
+                yield self.values[doc]
+                hits += 1
+                if hits >= max_hits:
+                    return
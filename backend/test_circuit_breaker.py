@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test circuit breaker state transitions and health-based provider ordering
+"""
+import time
+
+import services.finance_api as finance_api
+from services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, call_with_breaker, get_breaker, rank_providers
+)
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    options = dict(window=10, window_seconds=60, min_calls=4, error_rate=0.5, slow_call_seconds=1, open_seconds=0.05)
+    options.update(kwargs)
+    return CircuitBreaker('test', **options)
+
+def test_opens_on_error_rate():
+    breaker = _breaker()
+    for success in (True, False, True):
+        breaker.record(success, 0.01)
+    # Below min_calls nothing happens yet
+    assert breaker.state == CLOSED
+    breaker.record(False, 0.01)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+def test_slow_calls_count_as_failures():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(True, 2.0)
+    assert breaker.state == OPEN
+
+def test_half_open_single_probe():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False, 0.01)
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record(True, 0.01)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+def test_failed_probe_reopens():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False, 0.01)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False, 0.01)
+    assert breaker.state == OPEN
+
+def test_call_with_breaker():
+    name = 'test_call_with_breaker'
+    breaker = get_breaker(name)
+    breaker.open_seconds = 60
+    for _ in range(breaker.min_calls):
+        assert call_with_breaker(name, lambda: None) is None
+    assert breaker.state == OPEN
+    try:
+        call_with_breaker(name, lambda: 1)
+        assert False, 'expected CircuitOpenError'
+    except CircuitOpenError:
+        pass
+
+def test_rank_providers():
+    for _ in range(get_breaker('rank_bad').min_calls):
+        get_breaker('rank_bad').record(False, 0.01)
+    get_breaker('rank_good').record(True, 0.01)
+    assert [name for name, _ in rank_providers([('rank_bad', 1), ('rank_good', 2)])] == ['rank_good', 'rank_bad']
+
+def test_unknown_symbols_keep_provider_closed():
+    provider = finance_api.FunctionProvider('test_unknown', lambda ticker: None)
+    breaker = get_breaker('test_unknown')
+    is_success = finance_api._breaker_success(provider)
+    for _ in range(breaker.min_calls * 2):
+        call_with_breaker('test_unknown', lambda: provider.get_price('NOSUCH'), is_success)
+    assert breaker.state == CLOSED
+    # A provider that may return None on errors is still judged on its prices
+    assert finance_api._breaker_success(finance_api.FunctionProvider('x', lambda t: None, authoritative=False))(None) is False
+
+if __name__ == "__main__":
+    test_opens_on_error_rate()
+    test_slow_calls_count_as_failures()
+    test_half_open_single_probe()
+    test_failed_probe_reopens()
+    test_call_with_breaker()
+    test_rank_providers()
+    test_unknown_symbols_keep_provider_closed()
+    print("Circuit breaker tests passed")
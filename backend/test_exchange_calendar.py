@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Test the exchange calendar and the closed-market quote TTL
+"""
+from datetime import date, datetime, timezone
+
+import services.finance_api  # registers the quote providers
+from services.exchange_calendar import _nyse_holidays, _lse_holidays, closed_quote_expiry, is_market_open
+from services.quote_cache import QUOTE_CACHE_FALLBACK_TTL_SECONDS, QuoteCache
+
+def _ts(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+def test_holidays():
+    assert date(2026, 4, 3) in _nyse_holidays(2026)  # Good Friday
+    assert date(2026, 11, 26) in _nyse_holidays(2026)  # Thanksgiving
+    assert date(2026, 12, 28) in _lse_holidays(2026)  # Boxing Day falls on a Saturday
+    assert date(2026, 4, 6) in _lse_holidays(2026)  # Easter Monday
+
+def test_market_hours():
+    assert is_market_open('AAPL', datetime(2026, 10, 19, 15, 0, tzinfo=timezone.utc)) is True
+    assert is_market_open('AAPL', datetime(2026, 10, 17, 15, 0, tzinfo=timezone.utc)) is False  # Saturday
+    assert is_market_open('AAPL', datetime(2026, 11, 26, 15, 0, tzinfo=timezone.utc)) is False  # Thanksgiving
+    assert is_market_open('UNKNOWN.XX', datetime(2026, 10, 19, 15, 0, tzinfo=timezone.utc)) is None
+
+def test_next_open():
+    # Saturday noon UTC: valid until Monday's 09:30 New York open (13:30 UTC)
+    assert closed_quote_expiry('AAPL', _ts(2026, 10, 17, 12, 0)) == _ts(2026, 10, 19, 13, 30)
+    # Right after the close the price may still settle, so no extension
+    assert closed_quote_expiry('AAPL', _ts(2026, 10, 16, 20, 5)) is None
+    # During trading hours the normal TTL applies
+    assert closed_quote_expiry('AAPL', _ts(2026, 10, 19, 15, 0)) is None
+
+def test_mock_quotes_are_not_extended():
+    cache = QuoteCache(ttl=60, ttl_policy=closed_quote_expiry)
+    saturday = _ts(2026, 10, 17, 12, 0)
+    cache.set('AAPL', (1.0, 1.0, 'USD'), fetched_at=saturday, source='yahoo')
+    assert cache.peek('AAPL').expires_at == _ts(2026, 10, 19, 13, 30)
+    cache.set('AAPL', (1.0, 1.0, 'USD'), fetched_at=saturday, source='mock')
+    assert cache.peek('AAPL').expires_at == saturday + QUOTE_CACHE_FALLBACK_TTL_SECONDS
+    # The local simulator is not live, whether quoted one by one or in a batch
+    for source in ('local', 'local_batch'):
+        cache.set('AAPL', (1.0, 1.0, 'USD'), fetched_at=saturday, source=source)
+        assert cache.peek('AAPL').expires_at == saturday + QUOTE_CACHE_FALLBACK_TTL_SECONDS
+    cache.set('AAPL', (1.0, 1.0, 'USD'), fetched_at=saturday, source='yahoo_batch')
+    assert cache.peek('AAPL').expires_at == _ts(2026, 10, 19, 13, 30)
+
+if __name__ == "__main__":
+    test_holidays()
+    test_market_hours()
+    test_next_open()
+    test_mock_quotes_are_not_extended()
+    print("Exchange calendar tests passed")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test converting purchase amounts at their trade date's exchange rate
+"""
+import os
+import tempfile
+
+import services.fx_history as fx_history_module
+from services.fx_history import FxHistory
+
+REFERENCE = """Date,USD,GBP
+2024-03-04,1.10,0.85
+2024-03-01,1.08,0.86
+2024-02-29,1.05,
+"""
+
+def _history(directory: str) -> FxHistory:
+    reference_path = os.path.join(directory, 'eurofxref-hist.csv')
+    with open(reference_path, 'w', encoding='utf-8') as f:
+        f.write(REFERENCE)
+    return FxHistory(reference_path, os.path.join(directory, 'fx_history.csv'), max_gap=7)
+
+def test_trade_date_rates():
+    with tempfile.TemporaryDirectory() as directory:
+        history = _history(directory)
+        converted = history.convert(
+            [108.0, 110.0, 105.0, 100.0],
+            ['USD', 'USD', 'USD', 'EUR'],
+            ['2024-03-01', '2024-03-04T10:00', '2024-02-29', '2024-03-01'],
+            'EUR'
+        )
+        assert [round(value, 6) for value in converted] == [100.0, 100.0, 100.0, 100.0]
+        # Weekends use the last rate before them, cross rates go through EUR
+        converted = history.convert([110.0], ['USD'], ['2024-03-09'], 'GBP')
+        assert round(converted[0], 6) == round(110.0 / 1.10 * 0.85, 6)
+
+def test_missing_rates_fall_back_to_current_rate():
+    with tempfile.TemporaryDirectory() as directory:
+        history = _history(directory)
+        original = fx_history_module.get_exchange_rate
+        fx_history_module.get_exchange_rate = lambda from_currency, to_currency: 2.0
+        try:
+            # Before the first rate, too long after the last one, and unparseable dates
+            converted = history.convert([1.0, 1.0, 1.0], ['USD'] * 3, ['2020-01-01', '2024-06-01', 'unknown'], 'EUR')
+        finally:
+            fx_history_module.get_exchange_rate = original
+        assert converted.tolist() == [2.0, 2.0, 2.0]
+
+def test_missing_rates_without_current_rate_are_nan():
+    with tempfile.TemporaryDirectory() as directory:
+        history = _history(directory)
+        original = fx_history_module.get_exchange_rate
+        fx_history_module.get_exchange_rate = lambda from_currency, to_currency: None
+        try:
+            converted = history.convert([1.0, 108.0], ['JPY', 'USD'], ['2024-03-01', '2024-03-01'], 'EUR')
+        finally:
+            fx_history_module.get_exchange_rate = original
+        # Never a silent 1.0 for a currency without any rate
+        assert converted[0] != converted[0]
+        assert round(converted[1], 6) == 100.0
+
+if __name__ == "__main__":
+    test_trade_date_rates()
+    test_missing_rates_fall_back_to_current_rate()
+    test_missing_rates_without_current_rate_are_nan()
+    print("FX history tests passed")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test the token buckets and how the batch quote path uses them with its breaker
+"""
+import tempfile
+
+import services.finance_api as finance_api
+from services.circuit_breaker import CLOSED, HALF_OPEN, get_breaker
+from services.rate_limiter import FileTokenBucket, MemoryTokenBucket
+
+def test_memory_bucket():
+    bucket = MemoryTokenBucket('test', rate=1000, burst=3)
+    assert [bucket.acquire() for _ in range(4)] == [True, True, True, False]
+    # Waiting for a token within the timeout succeeds
+    assert bucket.acquire(timeout=0.1)
+    assert bucket.stats()['throttled'] == 1
+
+def test_file_bucket_is_shared():
+    with tempfile.TemporaryDirectory() as state_dir:
+        first = FileTokenBucket('shared', rate=0.001, burst=2, state_dir=state_dir)
+        second = FileTokenBucket('shared', rate=0.001, burst=2, state_dir=state_dir)
+        assert first.acquire()
+        assert second.acquire()
+        assert not first.acquire()
+        assert not second.acquire()
+
+def test_empty_batch_bucket_keeps_half_open_probe():
+    class Provider:
+        name = 'testprov'
+        def get_prices(self, symbols):
+            return {symbol: 10.0 for symbol in symbols}
+
+    breaker = get_breaker('testprov_batch')
+    breaker.state = HALF_OPEN
+    breaker._probe_in_flight = False
+    original = (finance_api.get_batch_provider, finance_api.acquire)
+    finance_api.get_batch_provider = lambda: Provider()
+    try:
+        # No token: the probe must not be reserved
+        finance_api.acquire = lambda name, timeout=0.0: False
+        assert finance_api.fetch_quote_batch(['AAPL']) == {}
+        assert breaker.state == HALF_OPEN and not breaker._probe_in_flight
+        # With a token the probe runs and closes the breaker
+        finance_api.acquire = lambda name, timeout=0.0: True
+        assert finance_api.fetch_quote_batch(['AAPL']) == {'AAPL': 10.0}
+        assert breaker.state == CLOSED
+    finally:
+        finance_api.get_batch_provider, finance_api.acquire = original
+
+if __name__ == "__main__":
+    test_memory_bucket()
+    test_file_bucket_is_shared()
+    test_empty_batch_bucket_keeps_half_open_probe()
+    print("Rate limiter tests passed")
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Test that search answers reused from a shorter query match a full search
+"""
+import services.finance_api as finance_api
+from services.search_cache import SearchCache
+
+def _tickers(results):
+    return [result['ticker'] for result in results]
+
+def _search(cache: SearchCache, query: str):
+    return cache.search(query, finance_api._search_stocks)
+
+def test_prefix_reuse_matches_full_search():
+    cache = SearchCache()
+    for query in ['a', 'ap', 'app', 'appl', 'apple']:
+        _search(cache, query)
+    assert cache.stats()['prefix_hits'] > 0
+    for query in ['app', 'appl', 'apple']:
+        assert _tickers(_search(cache, query)) == _tickers(finance_api._search_stocks(query)[0])
+
+def test_short_query_is_not_reused_for_substrings():
+    cache = SearchCache()
+    # "ac" is too short for the substring pass, so "ack" must search again to find e.g. BLK
+    _search(cache, 'ac')
+    full = _tickers(finance_api._search_stocks('ack')[0])
+    assert 'BLK' in full
+    assert _tickers(_search(cache, 'ack')) == full
+    assert cache.stats()['prefix_hits'] == 0
+
+if __name__ == "__main__":
+    test_prefix_reuse_matches_full_search()
+    test_short_query_is_not_reused_for_substrings()
+    print("Search cache tests passed")
@@ -70,7 +70,8 @@ const InvestmentCard = ({ investment }) => {
     }
   }
 
-  const formatCurrency = (amount, currency = 'EUR') => {
+  // Summaries are in the user's reporting currency
+  const formatCurrency = (amount, currency = investment.currency || 'EUR') => {
     return new Intl.NumberFormat('en-US', {
       style: 'currency',
       currency: currency,
@@ -129,7 +130,9 @@ const InvestmentCard = ({ investment }) => {
         <div className="bg-red-50 border border-red-200 rounded-lg p-3 mb-4 flex items-start">
           <AlertCircle className="w-4 h-4 text-red-500 mr-2 mt-0.5 flex-shrink-0" />
           <div className="text-red-700 text-sm">
-            {investment.error || 'Unable to fetch current price'}
+            {investment.error || (investment.fx_unavailable
+              ? `No exchange rate to ${investment.currency || 'EUR'} available`
+              : 'Unable to fetch current price')}
           </div>
         </div>
       )}
@@ -143,7 +146,7 @@ const InvestmentCard = ({ investment }) => {
         
         <div className="flex justify-between">
           <span className="text-gray-600">Average Price:</span>
-          <span className="font-medium">{formatCurrency(investment.average_price)}</span>
+          <span className="font-medium">{investment.average_price === null ? 'n/a' : formatCurrency(investment.average_price)}</span>
         </div>
 
         {investment.total_costs > 0 && (
@@ -159,11 +162,21 @@ const InvestmentCard = ({ investment }) => {
            <span className="text-gray-600">Current Price:</span>
            <span className="font-medium">
              {formatCurrency(investment.current_price)}
-             {investment.original_price && investment.original_currency && investment.original_currency !== 'EUR' && (
+             {investment.original_price && investment.original_currency && investment.original_currency !== (investment.currency || 'EUR') && (
                <span className="text-xs text-gray-500 ml-1">
                  ({formatCurrency(investment.original_price, investment.original_currency)})
                </span>
              )}
+             {['mock', 'local'].includes(investment.price_source) && (
+               <span className="text-xs text-amber-600 ml-1" title="No provider had a price, this one is simulated">
+                 (demo price)
+               </span>
+             )}
+             {investment.stale && investment.as_of && (
+               <span className="text-xs text-amber-600 ml-1" title="Last known price, a fresh quote was not available in time">
+                 (as of {new Date(investment.as_of).toLocaleString()})
+               </span>
+             )}
            </span>
          </div>
 
@@ -218,7 +231,7 @@ const InvestmentCard = ({ investment }) => {
                      <div className="flex items-center justify-between">
                        <div>
                          <span className="font-medium">{purchase.amount} shares</span>
-                         <span className="text-gray-500 ml-2">at {formatCurrency(purchase.price_per_share)}</span>
+                         <span className="text-gray-500 ml-2">at {formatCurrency(purchase.price_per_share, investment.original_currency || 'EUR')}</span>
                        </div>
                        <div className="flex space-x-1">
                          <button
@@ -240,7 +253,7 @@ const InvestmentCard = ({ investment }) => {
                      <div className="text-right mt-1">
                        <div className="text-gray-500">{formatDate(purchase.date)}</div>
                        {purchase.costs > 0 && (
-                         <div className="text-xs text-gray-400">+{formatCurrency(purchase.costs)} fees</div>
+                         <div className="text-xs text-gray-400">+{formatCurrency(purchase.costs, 'EUR')} fees</div>
                        )}
                      </div>
                    </div>
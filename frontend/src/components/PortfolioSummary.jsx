@@ -1,10 +1,10 @@
 import { TrendingUp, TrendingDown, DollarSign, PieChart, Receipt } from 'lucide-react'
 
-const PortfolioSummary = ({ totalInvested, totalCost, totalCosts, totalCurrentValue, totalProfit, investmentCount }) => {
+const PortfolioSummary = ({ totalInvested, totalCost, totalCosts, totalCurrentValue, totalProfit, investmentCount, currency = 'EUR' }) => {
   const formatCurrency = (amount) => {
     return new Intl.NumberFormat('en-US', {
       style: 'currency',
-      currency: 'EUR',
+      currency: currency,
       minimumFractionDigits: 2
     }).format(amount)
   }
@@ -63,6 +63,47 @@ export const InvestmentProvider = ({ children }) => {
     }
   }
 
+  // Live prices: the server pushes only the positions whose price changed. It values
+  // them with the shares and cost it loaded on connect, so reconnect when those change
+  const streamPositions = investments
+    .map(inv => `${inv.ticker.toUpperCase().trim()}:${inv.total_amount}:${inv.average_price}:${inv.total_costs}`)
+    .sort()
+    .join(',')
+
+  useEffect(() => {
+    const token = localStorage.getItem('token')
+    if (!isAuthenticated || !token || !streamPositions || typeof EventSource === 'undefined') {
+      return
+    }
+
+    const source = new EventSource(`${API_BASE_URL}/stream/prices?token=${encodeURIComponent(token)}`)
+    const applyDeltas = (event) => {
+      const deltas = JSON.parse(event.data)
+      if (!deltas.length) return
+      const byTicker = Object.fromEntries(deltas.map(delta => [delta.t, delta]))
+      setInvestments(prev => prev.map(inv => {
+        const delta = byTicker[inv.ticker.toUpperCase().trim()]
+        if (!delta) return inv
+        return {
+          ...inv,
+          current_price: delta.p,
+          original_price: delta.op,
+          original_currency: delta.c,
+          total_value: delta.v,
+          total_profit: delta.pl,
+          profit_percentage: delta.pp,
+          stale: !!delta.s,
+          price_source: delta.src,
+          as_of: new Date(delta.ts * 1000).toISOString()
+        }
+      }))
+    }
+    source.addEventListener('snapshot', applyDeltas)
+    source.addEventListener('delta', applyDeltas)
+
+    return () => source.close()
+  }, [isAuthenticated, streamPositions])
+
   const addPurchase = async (purchaseData) => {
     try {
       setError(null)
@@ -3,6 +3,7 @@ import { useNavigate, useSearchParams } from 'react-router-dom'
 import { useInvestments } from '../context/InvestmentContext'
 import { ArrowLeft, Save, AlertCircle } from 'lucide-react'
 import StockSearch from '../components/StockSearch'
+import axios from 'axios'
 
 const AddInvestment = () => {
   const navigate = useNavigate()
@@ -28,6 +29,22 @@ const AddInvestment = () => {
     }
   }, [searchParams])
 
+  // Purchase prices are entered in the currency the instrument trades in
+  const [priceCurrency, setPriceCurrency] = useState(null)
+  useEffect(() => {
+    const ticker = formData.ticker.trim()
+    if (!ticker) {
+      setPriceCurrency(null)
+      return
+    }
+    let cancelled = false
+    const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'
+    axios.get(`${API_BASE_URL}/currency/${encodeURIComponent(ticker)}`)
+      .then(response => { if (!cancelled) setPriceCurrency(response.data.currency) })
+      .catch(error => console.error('Error loading currency:', error))
+    return () => { cancelled = true }
+  }, [formData.ticker])
+
   const handleTickerSelect = (ticker) => {
     setFormData(prev => ({
       ...prev,
@@ -157,7 +174,7 @@ const AddInvestment = () => {
           {/* Price per Share */}
           <div>
             <label htmlFor="price_per_share" className="block text-sm font-medium text-gray-700 mb-2">
-              Price per Share (€) *
+              Price per Share{priceCurrency ? ` (${priceCurrency})` : ''} *
             </label>
             <input
               type="number"
@@ -171,6 +188,9 @@ const AddInvestment = () => {
               className="input-field"
               required
             />
+            <p className="mt-1 text-sm text-gray-500">
+              In the currency the instrument trades in{priceCurrency ? `, ${priceCurrency}` : ''}
+            </p>
           </div>
 
           {/* Purchase Date */}
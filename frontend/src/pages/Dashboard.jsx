@@ -66,6 +66,7 @@ const Dashboard = () => {
         totalCurrentValue={totalCurrentValue}
         totalProfit={totalProfit}
         investmentCount={investments.length}
+        currency={investments[0]?.currency || 'EUR'}
       />
 
       {/* Investments List */}
@@ -10,6 +10,8 @@ const EditPurchase = () => {
   const { getInvestmentDetails, updatePurchase, error, clearError } = useInvestments()
   const [loading, setLoading] = useState(false)
   const [purchase, setPurchase] = useState(null)
+  // Purchase prices are in the currency the instrument trades in
+  const [priceCurrency, setPriceCurrency] = useState(null)
   const [formData, setFormData] = useState({
     amount: '',
     price_per_share: '',
@@ -27,6 +29,7 @@ const EditPurchase = () => {
           const foundPurchase = details.purchases.find(p => p.id === purchaseId)
           if (foundPurchase) {
             setPurchase(foundPurchase)
+            setPriceCurrency(details.original_currency)
             setFormData({
               amount: foundPurchase.amount.toString(),
               price_per_share: foundPurchase.price_per_share.toString(),
@@ -151,7 +154,7 @@ const EditPurchase = () => {
           {/* Price per Share */}
           <div>
             <label htmlFor="price_per_share" className="block text-sm font-medium text-gray-700 mb-2">
-              Price per Share (€) *
+              Price per Share{priceCurrency ? ` (${priceCurrency})` : ''} *
             </label>
             <input
               type="number"
@@ -165,6 +168,12 @@ const EditPurchase = () => {
               className="input-field"
               required
             />
+            {priceCurrency && priceCurrency !== 'EUR' && (
+              <p className="mt-1 text-sm text-gray-500">
+                Prices are now in {priceCurrency}, the currency the instrument trades in. Purchases recorded
+                before this change were entered in EUR; update their price if it was.
+              </p>
+            )}
           </div>
 
           {/* Purchase Date */}
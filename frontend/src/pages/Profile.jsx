@@ -74,7 +74,8 @@ const Profile = () => {
         lastName: response.data.last_name || '',
         email: response.data.email || '',
         phone: response.data.phone || '',
-        country: response.data.country || ''
+        country: response.data.country || '',
+        defaultCurrency: response.data.reporting_currency || 'EUR'
       }))
     } catch (err) {
       console.error('Error fetching user profile:', err)
@@ -97,7 +98,8 @@ const Profile = () => {
          lastName: prev.lastName || parsed.lastName || '',
          email: prev.email || parsed.email || '',
          phone: prev.phone || parsed.phone || '',
-         country: prev.country || parsed.country || ''
+         country: prev.country || parsed.country || '',
+         defaultCurrency: prev.defaultCurrency
       }))
     }
   }, [])
@@ -131,7 +133,8 @@ const Profile = () => {
         last_name: preferences.lastName,
         email: preferences.email,
         phone: preferences.phone,
-        country: preferences.country
+        country: preferences.country,
+        reporting_currency: preferences.defaultCurrency
       }, {
         headers: { Authorization: `Bearer ${token}` }
       })
@@ -7,10 +7,14 @@ CREATE TABLE IF NOT EXISTS public.users (
     email VARCHAR(255) UNIQUE NOT NULL,
     username VARCHAR(255) UNIQUE,
     is_admin BOOLEAN DEFAULT FALSE,
+    reporting_currency VARCHAR(3) DEFAULT 'EUR',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Add columns introduced after the table was first created
+ALTER TABLE public.users ADD COLUMN IF NOT EXISTS reporting_currency VARCHAR(3) DEFAULT 'EUR';
+
 -- Create purchases table
 CREATE TABLE IF NOT EXISTS public.purchases (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),